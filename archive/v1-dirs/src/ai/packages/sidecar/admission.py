@@ -0,0 +1,203 @@
+"""Admission control for sidecar ingest.
+
+Two limits bound the work the sidecar takes on under a burst: requests in
+flight (admitted and not yet answered) and events pending in the writer
+(submitted and not yet written). Past either limit, events are shed and the
+request gets a 429 with Retry-After instead of queueing behind everyone else,
+so the latency of what is admitted stays bounded.
+
+Retry-After grows with the overload: it is the ratio of requests refused to
+requests admitted over the last full second (at least retry_after_s, at most
+max_retry_after_s), so a large burst is spread over the time the sidecar
+needs to take it in rather than coming back all at once.
+
+A request whose body is still to be read (/events/batch) enters first: it
+counts as in flight while the body streams in, so a burst of large batches
+is refused before it is read rather than after.
+
+Low-priority event types are shed first: once in-flight requests or pending
+events pass low_priority_at (a fraction of their limit), low-priority events
+are refused while the others are still admitted.
+
+Ingest latency (admission to response) goes into a fixed-bucket histogram per
+endpoint; metrics() renders everything in the Prometheus text format.
+"""
+
+import bisect, math, os, time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding quantile q (None if empty, inf past the last bucket)"""
+        if not self.count:
+            return None
+        rank, seen = math.ceil(q * self.count), 0
+        for bound, n in zip(self.buckets + (math.inf,), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def samples(self, name: str, labels: str = "") -> List[str]:
+        out, seen = [], 0
+        prefix = labels + "," if labels else ""
+        for bound, n in zip(self.buckets + (math.inf,), self.counts):
+            seen += n
+            le = "+Inf" if bound == math.inf else repr(bound)
+            out.append(f'{name}_bucket{{{prefix}le="{le}"}} {seen}')
+        suffix = f"{{{labels}}}" if labels else ""
+        out.append(f"{name}_sum{suffix} {self.sum}")
+        out.append(f"{name}_count{suffix} {self.count}")
+        return out
+
+def metric(name: str, kind: str, help_text: str, samples: Iterable[Tuple[str, Any]]) -> List[str]:
+    """Prometheus text lines for one metric: samples are (labels, value), labels like 'a="b"' or ''"""
+    out = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    out += [f"{name}{{{labels}}} {value}" if labels else f"{name} {value}" for labels, value in samples]
+    return out
+
+class Admission:
+    def __init__(self, max_in_flight: int = 256, max_pending: int = 20000, low_priority: Iterable[str] = (),
+                 low_priority_at: float = 0.5, retry_after_s: int = 1, max_retry_after_s: int = 30):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_pending = max(1, max_pending)
+        self.low_priority = frozenset(low_priority)
+        self.low_priority_at = min(max(low_priority_at, 0.0), 1.0)
+        self.retry_after_s = max(1, retry_after_s)
+        self.max_retry_after_s = max(self.retry_after_s, max_retry_after_s)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.shed: Dict[Tuple[str, str], int] = {}  # (limit, priority) -> events
+        self.rejected: Dict[str, int] = {}  # limit -> requests answered 429
+        self.latency: Dict[str, Histogram] = {}
+        self._second = 0
+        self._counts = [0, 0]  # requests admitted, refused in the current second
+        self._last_counts = [0, 0]  # ... and in the one before
+
+    @classmethod
+    def from_env(cls) -> "Admission":
+        return cls(
+            max_in_flight=int(os.getenv("SIDECAR_MAX_IN_FLIGHT", "256")),
+            max_pending=int(os.getenv("SIDECAR_MAX_PENDING", "20000")),
+            low_priority=[t.strip() for t in os.getenv("SIDECAR_LOW_PRIORITY_TYPES", "").split(",") if t.strip()],
+            low_priority_at=float(os.getenv("SIDECAR_LOW_PRIORITY_AT", "0.5")),
+            retry_after_s=int(os.getenv("SIDECAR_RETRY_AFTER_S", "1")),
+            max_retry_after_s=int(os.getenv("SIDECAR_RETRY_AFTER_MAX_S", "30")),
+        )
+
+    def _limit(self, pending: int, fraction: float, in_flight: int) -> Optional[str]:
+        if in_flight >= self.max_in_flight * fraction:
+            return "in_flight"
+        if pending >= self.max_pending * fraction:
+            return "pending"
+        return None
+
+    def _count(self, admitted: bool) -> None:
+        second = int(time.monotonic())
+        if second != self._second:
+            self._last_counts = self._counts if second == self._second + 1 else [0, 0]
+            self._second, self._counts = second, [0, 0]
+        self._counts[0 if admitted else 1] += 1
+
+    def enter(self) -> Optional[str]:
+        """Count a request in flight before its body is read; the limit that refused it, if any
+
+        An entered request stays in flight until done(), whatever admit() then decides.
+        """
+        if self.in_flight >= self.max_in_flight:
+            self._count(False)
+            self.rejected["in_flight"] = self.rejected.get("in_flight", 0) + 1
+            return "in_flight"
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return None
+
+    def admit(self, types: Sequence[str], pending: int, entered: bool = False) -> Tuple[List[bool], Optional[str]]:
+        """Which of a request's events (by type) to accept, and the limit that shed the rest, if any
+
+        A request with any event accepted is in flight until done() is called.
+        """
+        others = self.in_flight - entered
+        limit = self._limit(pending, 1.0, others)
+        if limit is not None:
+            keep = [False] * len(types)
+        else:
+            keep = [True] * len(types)
+            if self.low_priority:
+                low_limit = self._limit(pending, self.low_priority_at, others)
+                if low_limit is not None:
+                    keep = [t not in self.low_priority for t in types]
+                    if not all(keep):
+                        limit = low_limit
+        for type_, kept in zip(types, keep):
+            if not kept:
+                key = (limit, "low" if type_ in self.low_priority else "normal")
+                self.shed[key] = self.shed.get(key, 0) + 1
+        self._count(any(keep))
+        if any(keep):
+            if not entered:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.admitted += sum(keep)
+        else:
+            self.rejected[limit] = self.rejected.get(limit, 0) + 1
+        return keep, limit
+
+    def retry_after(self) -> int:
+        """Seconds a refused client should wait: refused/admitted over the last full second, clamped"""
+        admitted, refused = self._last_counts
+        return min(self.max_retry_after_s, max(self.retry_after_s, math.ceil(refused / max(admitted, 1))))
+
+    def done(self, endpoint: str, seconds: Optional[float]) -> None:
+        """An admitted (or entered) request has been answered after `seconds`; None leaves
+        it out of the latency histogram (an entered request that wrote nothing)"""
+        self.in_flight -= 1
+        if seconds is not None:
+            self.latency.setdefault(endpoint, Histogram()).observe(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_pending": self.max_pending,
+            "retry_after_s": self.retry_after(),
+            "low_priority": sorted(self.low_priority),
+            "admitted": self.admitted,
+            "shed": {f"{limit}:{priority}": n for (limit, priority), n in sorted(self.shed.items())},
+            "rejected": dict(self.rejected),
+            "latency": {endpoint: {"count": h.count, "p50": h.quantile(0.5), "p99": h.quantile(0.99)}
+                        for endpoint, h in self.latency.items()},
+        }
+
+    def metrics(self, pending: int) -> List[str]:
+        out = metric("sidecar_ingest_in_flight", "gauge", "Ingest requests admitted and not yet answered",
+                     [("", self.in_flight)])
+        out += metric("sidecar_ingest_pending_events", "gauge", "Events submitted to the writer and not yet written",
+                      [("", pending)])
+        out += metric("sidecar_ingest_admitted_events_total", "counter", "Events admitted for ingest",
+                      [("", self.admitted)])
+        out += metric("sidecar_ingest_shed_events_total", "counter", "Events refused by admission control",
+                      [(f'limit="{limit}",priority="{priority}"', n)
+                       for (limit, priority), n in sorted(self.shed.items())])
+        out += metric("sidecar_ingest_rejected_requests_total", "counter", "Ingest requests answered with 429",
+                      [(f'limit="{limit}"', n) for limit, n in sorted(self.rejected.items())])
+        out += ["# HELP sidecar_ingest_latency_seconds Time from admission to response",
+                "# TYPE sidecar_ingest_latency_seconds histogram"]
+        for endpoint, histogram in sorted(self.latency.items()):
+            out += histogram.samples("sidecar_ingest_latency_seconds", f'endpoint="{endpoint}"')
+        return out
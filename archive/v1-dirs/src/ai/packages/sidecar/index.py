@@ -0,0 +1,165 @@
+"""SQLite index over the segmented sidecar log, for /events/query.
+
+Each event gets a row with its type, tags.process_id, tags.unique_id and ts,
+plus its position (seq, offset) in the log; the event itself stays in the
+segment files. sync() indexes whatever was appended since the last sync, from
+a watermark stored in the same transaction as the rows, so a restart resumes
+where it stopped and a deleted index file is simply rebuilt from the segments.
+Rows carry their stream, so one index serves the streams of all workers; a
+batch commits only if its stream's watermark has not moved since the batch
+was read, so workers syncing the same stream never index an event twice.
+
+Results are ordered by (ts, id) and paged with an opaque cursor holding the
+last row's (ts, id), so every page is one index range scan whatever the size
+of the log.
+"""
+
+import base64, json, sqlite3, threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .segments import SegmentLog, line_ts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    stream TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    type TEXT,
+    process_id TEXT,
+    unique_id TEXT
+);
+CREATE INDEX IF NOT EXISTS events_by_ts ON events (ts, id);
+CREATE INDEX IF NOT EXISTS events_by_type ON events (type, ts, id);
+CREATE INDEX IF NOT EXISTS events_by_process_id ON events (process_id, ts, id) WHERE process_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS events_by_unique_id ON events (unique_id, ts, id) WHERE unique_id IS NOT NULL;
+CREATE TABLE IF NOT EXISTS watermark (
+    stream TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+"""
+
+SYNC_BATCH = 5000
+MAX_LIMIT = 1000
+
+def _text(value: Any) -> Optional[str]:
+    return value if isinstance(value, str) else None
+
+def _row(stream: str, seq: int, offset: int, line: bytes) -> Tuple:
+    try:
+        event = json.loads(line)
+    except ValueError:
+        event = None
+    if not isinstance(event, dict):
+        return (stream, seq, offset, line_ts(line) or 0, None, None, None)
+    tags = event.get("tags") if isinstance(event.get("tags"), dict) else {}
+    ts = event.get("ts")
+    return (stream, seq, offset, int(ts) if isinstance(ts, (int, float)) else 0,
+            _text(event.get("type")), _text(tags.get("process_id")), _text(tags.get("unique_id")))
+
+def encode_cursor(ts: int, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts}:{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        ts, row_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        return int(ts), int(row_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+class EventIndex:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def watermark(self, stream: str) -> Tuple[int, int]:
+        with self._lock:
+            row = self._db.execute("SELECT seq, offset FROM watermark WHERE stream = ?", (stream,)).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def sync(self, log: SegmentLog) -> int:
+        """Index events appended to `log` (a SegmentLog or StreamReader) since the last sync; returns how many"""
+        with self._sync_lock:
+            start = self.watermark(log.stream)
+            rows: List[Tuple] = []
+            added = 0
+            for seq, offset, line in log.lines_from(*start):
+                rows.append(_row(log.stream, seq, offset, line))
+                if len(rows) >= SYNC_BATCH:
+                    mark = (seq, offset + len(line) + 1)
+                    if not self._insert(log.stream, rows, start, mark):
+                        return added
+                    added += len(rows)
+                    rows, start = [], mark
+            if rows and self._insert(log.stream, rows, start, (seq, offset + len(line) + 1)):
+                added += len(rows)
+            return added
+
+    def _insert(self, stream: str, rows: List[Tuple], start: Tuple[int, int], mark: Tuple[int, int]) -> bool:
+        """Add rows read from `start` up to `mark`, unless another process got there first"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT seq, offset FROM watermark WHERE stream = ?", (stream,)).fetchone()
+                if (tuple(row) if row else (0, 0)) != start:
+                    self._db.execute("ROLLBACK")
+                    return False
+                self._db.executemany("INSERT INTO events (stream, seq, offset, ts, type, process_id, unique_id) "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._db.execute("INSERT OR REPLACE INTO watermark VALUES (?, ?, ?)", (stream, *mark))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return True
+
+    def query(self, types: Sequence[str] = (), process_id: Optional[str] = None, unique_id: Optional[str] = None,
+              since: Optional[int] = None, until: Optional[int] = None, cursor: Optional[str] = None,
+              limit: int = 100, order: str = "desc") -> Tuple[List[Tuple[str, int, int]], Optional[str]]:
+        """Positions (stream, seq, offset) of matching events, one page, plus the next page's cursor"""
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be asc or desc")
+        limit = max(1, min(limit, MAX_LIMIT))
+        where, params = [], []
+        if types:
+            where.append(f"type IN ({', '.join('?' * len(types))})")
+            params += list(types)
+        for column, value in (("process_id", process_id), ("unique_id", unique_id)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts <= ?")
+            params.append(until)
+        if cursor:
+            where.append(f"(ts, id) {'<' if order == 'desc' else '>'} (?, ?)")
+            params += list(decode_cursor(cursor))
+        direction = "DESC" if order == "desc" else "ASC"
+        sql = "SELECT id, ts, stream, seq, offset FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY ts {direction}, id {direction} LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit + 1)).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return [(stream, seq, offset) for _, _, stream, seq, offset in rows[:limit]], next_cursor
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            events = self._db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        return {"path": str(self.path), "events": events}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
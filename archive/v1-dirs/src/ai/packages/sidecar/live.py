@@ -0,0 +1,198 @@
+"""Live tail of committed sidecar events.
+
+The Broadcaster is an EventWriter listener: every batch this worker writes is
+split into events and offered to each subscriber whose filter matches. A
+subscriber has a bounded queue and never blocks the writer. When its queue is
+full it starts dropping, and once the client has drained what was queued it
+receives a single lag item instead of the missing events. Streams written by
+other workers are not pushed; follow() reads them from the log every poll_s.
+
+Where a client is in the log is a cursor: for each stream, the position
+("seq.offset") of its next line, written "stream:seq.offset,...". Every event
+follow() yields comes with the cursor just past it, and a lag item with the
+cursor to reconnect from. follow() from a cursor replays each stream from its
+position (a stream the cursor lacks, from its start), merged by ts, then
+continues live, skipping live events the replay already produced.
+"""
+
+import asyncio, itertools, json
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from .merged import Cursor, MergedLog, Position
+
+def format_position(position: Position) -> str:
+    return f"{position[0]}.{position[1]}"
+
+def parse_position(text: str) -> Position:
+    try:
+        seq, offset = text.split(".")
+        position = (int(seq), int(offset))
+    except ValueError:
+        raise ValueError(f"Invalid position: {text!r}")
+    if min(position) < 0:
+        raise ValueError(f"Invalid position: {text!r}")
+    return position
+
+def format_cursor(cursor: Cursor) -> str:
+    return ",".join(f"{stream}:{format_position(position)}" for stream, position in sorted(cursor.items()))
+
+def parse_cursor(text: str) -> Cursor:
+    cursor = {}
+    for item in text.split(","):
+        stream, sep, position = item.rpartition(":")
+        if not sep or not stream:
+            raise ValueError(f"Invalid cursor: {text!r}")
+        cursor[stream] = parse_position(position)
+    return cursor
+
+def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) else None
+
+class LiveFilter:
+    """Event types (any of) and tag values (all of) an event must match"""
+
+    def __init__(self, types: Iterable[str] = (), tags: Optional[Dict[str, str]] = None):
+        self.types = frozenset(types)
+        self.tags = dict(tags or {})
+
+    def matches(self, event: Optional[Dict[str, Any]]) -> bool:
+        if event is None:
+            return False
+        if self.types and event.get("type") not in self.types:
+            return False
+        if self.tags:
+            tags = event.get("tags") if isinstance(event.get("tags"), dict) else {}
+            return all(str(tags.get(key)) == value for key, value in self.tags.items())
+        return True
+
+class Subscriber:
+    def __init__(self, live_filter: LiveFilter, max_queue: int):
+        self.filter = live_filter
+        self.max_queue = max(1, max_queue)
+        self.delivered = 0
+        self.dropped_total = 0
+        self._items: deque = deque()
+        self._ready = asyncio.Event()
+        self._dropped = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._items)
+
+    def offer(self, position: Tuple[str, int, int], line: bytes) -> None:
+        if self._dropped or len(self._items) >= self.max_queue:
+            # Keep dropping until the lag item has been sent, so the gap is one contiguous range
+            self._dropped += 1
+            self.dropped_total += 1
+        else:
+            self._items.append((position, line))
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Tuple[str, Any]:
+        """("event", ((stream, seq, offset), line)), ("lag", dropped), or ("ping", None) after `timeout` idle seconds"""
+        while True:
+            if self._items:
+                self.delivered += 1
+                return "event", self._items.popleft()
+            if self._dropped:
+                dropped, self._dropped = self._dropped, 0
+                return "lag", dropped
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return "ping", None
+
+class Broadcaster:
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+
+    def subscribe(self, live_filter: LiveFilter, max_queue: int = 1000) -> Subscriber:
+        subscriber = Subscriber(live_filter, max_queue)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def publish(self, stream: str, seq: int, offset: int, data: bytes) -> None:
+        """EventWriter listener: offer each line of a written batch to matching subscribers"""
+        if not self.subscribers:
+            return
+        subscribers = list(self.subscribers)
+        for line in data[:-1].split(b"\n"):
+            position = (stream, seq, offset)
+            offset += len(line) + 1
+            event = _parse(line)
+            for subscriber in subscribers:
+                if subscriber.filter.matches(event):
+                    subscriber.offer(position, line)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": len(self.subscribers),
+                "queued": sum(s.queued for s in self.subscribers),
+                "dropped": sum(s.dropped_total for s in self.subscribers)}
+
+async def _read(merged: MergedLog, cursor: Cursor, streams: Optional[List[str]], live_filter: LiveFilter,
+                chunk: int) -> AsyncIterator[Tuple[str, Any]]:
+    """Matching events of `streams` (all if None) from `cursor` on, advancing it past each line read"""
+    lines = await asyncio.to_thread(merged.lines_from, dict(cursor), streams)
+    while True:
+        batch = await asyncio.to_thread(lambda: list(itertools.islice(lines, chunk)))
+        if not batch:
+            return
+        for stream, seq, offset, line in batch:
+            cursor[stream] = (seq, offset + len(line) + 1)
+            if live_filter.matches(_parse(line)):
+                yield "event", (dict(cursor), line)
+
+async def follow(merged: MergedLog, broadcaster: Broadcaster, live_filter: LiveFilter,
+                 start: Optional[Cursor] = None, max_queue: int = 1000, ping_s: Optional[float] = None,
+                 poll_s: float = 0.5, replay_chunk: int = 500) -> AsyncIterator[Tuple[str, Any]]:
+    """Matching events from `start` in the log (or from now), then live ones as they are committed.
+
+    Yields ("event", (cursor, line)), ("lag", {"dropped", "from"}) and, after
+    ping_s without anything to send, ("ping", None).
+    """
+    subscriber = broadcaster.subscribe(live_filter, max_queue)
+    try:
+        if start is None:
+            cursor = await asyncio.to_thread(merged.ends)
+        else:
+            cursor = dict(start)
+            async for item in _read(merged, cursor, None, live_filter, replay_chunk):
+                yield item
+        loop = asyncio.get_running_loop()
+        last_sent = next_poll = loop.time()
+        while True:
+            if loop.time() >= next_poll:
+                others = [s for s in await asyncio.to_thread(merged.streams) if s != merged.log.stream]
+                if others:
+                    async for item in _read(merged, cursor, others, live_filter, replay_chunk):
+                        last_sent = loop.time()
+                        yield item
+                next_poll = loop.time() + poll_s
+            if ping_s is not None and loop.time() - last_sent >= ping_s:
+                last_sent = loop.time()
+                yield "ping", None
+            timeout = next_poll - loop.time()
+            if ping_s is not None:
+                timeout = min(timeout, last_sent + ping_s - loop.time())
+            kind, item = await subscriber.get(max(0.0, timeout))
+            if kind == "event":
+                (stream, seq, offset), line = item
+                if (seq, offset) < cursor.get(stream, (0, 0)):
+                    continue
+                cursor[stream] = (seq, offset + len(line) + 1)
+                last_sent = loop.time()
+                yield "event", (dict(cursor), line)
+            elif kind == "lag":
+                last_sent = loop.time()
+                yield "lag", {"dropped": item, "from": format_cursor(cursor)}
+    finally:
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,86 @@
+"""Segment streams shared by several sidecar workers in one log directory.
+
+Each worker process appends to a stream of its own: it claims the first free
+slot (sidecar, sidecar-w1, sidecar-w2, ...) by holding an exclusive lock on
+<stream>.lock for as long as it runs. A worker that dies releases its slot,
+and the next one to claim it takes over its segments.
+
+manifest.json tracks the streams and their rotated segments:
+
+    {"streams": {"sidecar-w1": {"pid": 4242, "active": 7,
+                                "segments": [{"seq": 6, "compressed": true, "lines": ..., "min_ts": ...}, ...]}}}
+
+A worker rewrites only its own entry, under an exclusive lock on
+manifest.lock, and replaces the file atomically. Readers never lock, and read
+the file again only when its stat changes.
+"""
+
+import json, os, tempfile, threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # no flock: a single worker, and a single stream
+    fcntl = None
+
+MANIFEST = "manifest.json"
+
+def stream_name(base: str, slot: int) -> str:
+    return base if slot == 0 else f"{base}-w{slot}"
+
+def claim_stream(directory: Union[str, Path], base: str = "sidecar", max_slots: int = 256) -> Tuple[str, Optional[int]]:
+    """The first stream no other process holds, and the fd of the lock held on it (close it to release)"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        return base, None
+    for slot in range(max_slots):
+        name = stream_name(base, slot)
+        fd = os.open(directory / f"{name}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        return name, fd
+    raise RuntimeError(f"All {max_slots} sidecar streams in {directory} are taken")
+
+class Manifest:
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.path = self.directory / MANIFEST
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[int, int, int]] = None
+        self._streams: Dict[str, Dict[str, Any]] = {}
+
+    def read(self) -> Dict[str, Dict[str, Any]]:
+        """Stream name -> entry, as of the last write"""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return {}
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if key != self._key:
+                with open(self.path, "rb") as f:
+                    self._streams = json.loads(f.read())["streams"]
+                self._key = key
+            return self._streams
+
+    def update(self, stream: str, entry: Dict[str, Any]) -> None:
+        """Replace one stream's entry"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.directory / "manifest.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                with open(self.path, "rb") as f:
+                    streams = json.loads(f.read())["streams"]
+            except FileNotFoundError:
+                streams = {}
+            streams[stream] = entry
+            fd, tmp = tempfile.mkstemp(prefix=f".{MANIFEST}.", suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"streams": streams}, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
@@ -0,0 +1,98 @@
+"""One view over the segment streams of every sidecar worker.
+
+MergedLog holds the local worker's SegmentLog and a StreamReader for each
+other stream in the manifest. Reads that return events from several streams
+merge them k ways by ts: each stream is already in write order, so the merge
+is lazy and never sorts more than one line per stream at a time.
+"""
+
+import heapq
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .manifest import Manifest
+from .segments import SegmentLog, StreamReader, line_ts
+
+Position = Tuple[int, int]
+Cursor = Dict[str, Position]  # stream -> position
+
+def _ts(line: bytes) -> int:
+    ts = line_ts(line)
+    return ts if ts is not None else 0
+
+class MergedLog:
+    def __init__(self, log: SegmentLog, manifest: Manifest):
+        self.log = log
+        self.manifest = manifest
+        self._readers: Dict[str, StreamReader] = {}
+
+    def logs(self) -> List[Any]:
+        """The local SegmentLog, then a StreamReader for every other stream"""
+        logs: List[Any] = [self.log]
+        for stream in sorted(self.manifest.read()):
+            if stream != self.log.stream:
+                reader = self._readers.get(stream)
+                if reader is None:
+                    reader = self._readers.setdefault(stream, StreamReader(
+                        self.log.directory, stream, self.manifest, self.log.block_bytes))
+                logs.append(reader)
+        return logs
+
+    def streams(self) -> List[str]:
+        return [log.stream for log in self.logs()]
+
+    def get(self, stream: str) -> Optional[Any]:
+        return next((log for log in self.logs() if log.stream == stream), None)
+
+    def line_count(self) -> int:
+        return sum(log.line_count() for log in self.logs())
+
+    def ends(self) -> Cursor:
+        """Where each stream's next line will be written"""
+        return {log.stream: log.end() for log in self.logs()}
+
+    def tail(self, limit: int) -> List[bytes]:
+        """The last `limit` lines of all streams, oldest first"""
+        if limit <= 0:
+            return []
+        tails = [log.tail(limit) for log in self.logs()]
+        if len(tails) == 1:
+            return tails[0]
+        return list(heapq.merge(*tails, key=_ts))[-limit:]
+
+    def scan(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[bytes]:
+        """Lines of all streams in ts order, restricted to since <= ts <= until when either is given"""
+        return heapq.merge(*(log.scan(since, until) for log in self.logs()), key=_ts)
+
+    def lines_from(self, cursor: Cursor,
+                   streams: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, int, int, bytes]]:
+        """(stream, seq, offset, line) from each stream's position in `cursor` on, in ts order.
+
+        A stream missing from `cursor` is read from its start; `streams` limits which are read.
+        """
+        def lines(log) -> Iterator[Tuple[str, int, int, bytes]]:
+            for seq, offset, line in log.lines_from(*cursor.get(log.stream, (0, 0))):
+                yield log.stream, seq, offset, line
+
+        wanted = None if streams is None else set(streams)
+        logs = [log for log in self.logs() if wanted is None or log.stream in wanted]
+        return heapq.merge(*(lines(log) for log in logs), key=lambda item: _ts(item[3]))
+
+    def read_lines(self, positions: Iterable[Tuple[str, int, int]]) -> List[Optional[bytes]]:
+        """The lines at each (stream, seq, offset), None where there is none"""
+        positions = list(positions)
+        by_stream: Dict[str, List[int]] = {}
+        for i, (stream, _, _) in enumerate(positions):
+            by_stream.setdefault(stream, []).append(i)
+        lines: List[Optional[bytes]] = [None] * len(positions)
+        for stream, indexes in by_stream.items():
+            log = self.get(stream)
+            if log is not None:
+                for i, line in zip(indexes, log.read_lines([positions[i][1:] for i in indexes])):
+                    lines[i] = line
+        return lines
+
+    def stats(self) -> Dict[str, Any]:
+        logs = self.logs()
+        stats = [log.stats() for log in logs]
+        return {"directory": str(self.log.directory), "streams": [log.stream for log in logs],
+                **{key: sum(s[key] for s in stats) for key in ("segments", "lines", "bytes", "stored_bytes")}}
@@ -0,0 +1,238 @@
+"""Per-type, per-minute rollups of sidecar events with duration sketches.
+
+Each minute keeps, per event type, a count and a DDSketch of payload
+durations (the first of duration_fields present in the payload). DDSketch
+buckets values on a log scale with relative accuracy alpha, so sketches merge
+by adding bucket counts: a window's percentiles come from merging its minutes,
+with cost bound by the window length, not by how many events it saw.
+
+Like EventIndex, Rollups follows the log from a watermark. Its state is saved
+(rollups.json) whenever the watermark moves into a new segment, i.e. each time
+a segment is sealed, and on close; a restart replays only what came after.
+Minutes older than retention_minutes (by the wall clock) are dropped. ts is
+client-supplied, so events more than max_future_s ahead of the clock are
+ignored rather than opening minutes retention would be measured from.
+"""
+
+import json, math, os, threading, time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .segments import SegmentLog
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+class DDSketch:
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        value = max(0.0, float(value))
+        if value < 1e-9:
+            self.zeros += 1
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different alpha")
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q, within alpha relative error (None if empty)"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return min(max(2 * self.gamma ** key / (self.gamma + 1), self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        out = {"count": self.count, "mean": self.sum / self.count if self.count else None,
+               "min": self.min if self.count else None, "max": self.max if self.count else None}
+        for q in QUANTILES:
+            out[f"p{round(q * 100)}"] = self.quantile(q)
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"alpha": self.alpha, "bins": {str(k): n for k, n in self.bins.items()}, "zeros": self.zeros,
+                "count": self.count, "sum": self.sum, "min": self.min if self.count else None,
+                "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DDSketch":
+        sketch = cls(data["alpha"])
+        sketch.bins = {int(k): n for k, n in data["bins"].items()}
+        sketch.zeros, sketch.count, sketch.sum = data["zeros"], data["count"], data["sum"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+class Rollups:
+    def __init__(self, path: Union[str, Path], retention_minutes: int = 7 * 24 * 60,
+                 duration_fields: Sequence[str] = ("duration_ms",), alpha: float = 0.01,
+                 max_future_s: float = 300, clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.retention_minutes = retention_minutes
+        self.duration_fields = tuple(duration_fields)
+        self.alpha = alpha
+        self.max_future_s = max_future_s
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.minutes: Dict[int, Dict[str, List[Any]]] = {}  # minute -> type -> [count, sketch or None]
+        self.totals: Dict[str, int] = {}
+        self.watermarks: Dict[str, Tuple[int, int]] = {}
+        self._saved_seq: Dict[str, int] = {}
+        self._load()
+
+    @classmethod
+    def from_env(cls, path: Path) -> "Rollups":
+        return cls(
+            path,
+            retention_minutes=int(os.getenv("SIDECAR_ROLLUP_RETENTION_MIN", str(7 * 24 * 60))),
+            duration_fields=[f.strip() for f in os.getenv("SIDECAR_DURATION_FIELDS", "duration_ms").split(",")
+                             if f.strip()],
+        )
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text())
+            if data.get("alpha") != self.alpha:
+                return  # sketches would not merge; rebuild from the log
+            totals = dict(data["totals"])
+            watermarks = {stream: tuple(mark) for stream, mark in data["watermarks"].items()}
+            minutes = {int(minute): {type_: [count, DDSketch.from_dict(sketch) if sketch else None]
+                                     for type_, (count, sketch) in cells.items()}
+                       for minute, cells in data["minutes"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return  # unreadable or incomplete: rebuild from the log
+        self.totals, self.watermarks, self.minutes = totals, watermarks, minutes
+        self._saved_seq = {stream: mark[0] for stream, mark in watermarks.items()}
+        self._prune()
+
+    def save(self) -> None:
+        with self._lock:
+            data = {"alpha": self.alpha, "totals": dict(self.totals),
+                    "watermarks": {stream: list(mark) for stream, mark in self.watermarks.items()},
+                    "minutes": {str(minute): {type_: [count, sketch.to_dict() if sketch else None]
+                                              for type_, (count, sketch) in cells.items()}
+                                for minute, cells in self.minutes.items()}}
+            self._saved_seq = {stream: mark[0] for stream, mark in self.watermarks.items()}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp, self.path)
+
+    def _duration(self, payload: Any) -> Optional[float]:
+        if isinstance(payload, dict):
+            for field in self.duration_fields:
+                value = payload.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    return value
+        return None
+
+    def add(self, event: Dict[str, Any], horizon: Optional[float] = None) -> None:
+        """Count one event; ignored if its ts is past `horizon` (default: max_future_s from now)"""
+        ts = event.get("ts")
+        type_ = event.get("type")
+        if not isinstance(ts, (int, float)) or not isinstance(type_, str):
+            return
+        if ts > (self.clock() + self.max_future_s if horizon is None else horizon):
+            return
+        minute = int(ts) // 60 * 60
+        cell = self.minutes.setdefault(minute, {}).setdefault(type_, [0, None])
+        cell[0] += 1
+        duration = self._duration(event.get("payload"))
+        if duration is not None:
+            if cell[1] is None:
+                cell[1] = DDSketch(self.alpha)
+            cell[1].add(duration)
+        self.totals[type_] = self.totals.get(type_, 0) + 1
+
+    def _prune(self) -> None:
+        if self.minutes:
+            cutoff = int(self.clock()) // 60 * 60 - self.retention_minutes * 60
+            for minute in [m for m in self.minutes if m <= cutoff]:
+                del self.minutes[minute]
+
+    def sync(self, log: SegmentLog) -> int:
+        """Fold in events appended since the last sync; saves when a new segment has been reached"""
+        with self._sync_lock:
+            seq, offset = self.watermarks.get(log.stream, (0, 0))
+            added = 0
+            events: List[Dict[str, Any]] = []
+            mark = None
+            for seq, offset, line in log.lines_from(seq, offset):
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    event = None
+                if isinstance(event, dict):
+                    events.append(event)
+                mark = (seq, offset + len(line) + 1)
+                if len(events) >= 5000:
+                    added += self._apply(log.stream, events, mark)
+                    events = []
+            if mark is not None:
+                added += self._apply(log.stream, events, mark)
+            if self.watermarks.get(log.stream, (0, 0))[0] > self._saved_seq.get(log.stream, 0):
+                self.save()
+            return added
+
+    def _apply(self, stream: str, events: Iterable[Dict[str, Any]], mark: Tuple[int, int]) -> int:
+        count = 0
+        horizon = self.clock() + self.max_future_s
+        with self._lock:
+            for event in events:
+                self.add(event, horizon)
+                count += 1
+            self.watermarks[stream] = mark
+            self._prune()
+        return count
+
+    def stats(self, minutes: int = 60, types: Sequence[str] = (), now: Optional[float] = None) -> Dict[str, Any]:
+        """Per-type counts per minute and merged duration percentiles over the last `minutes`"""
+        minutes = max(1, min(minutes, self.retention_minutes))
+        end = int(self.clock() if now is None else now) // 60 * 60
+        start = end - (minutes - 1) * 60
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for minute in range(start, end + 60, 60):
+                for type_, (count, sketch) in self.minutes.get(minute, {}).items():
+                    if types and type_ not in types:
+                        continue
+                    entry = out.setdefault(type_, {"count": 0, "per_minute": [], "sketch": None,
+                                                   "total": self.totals.get(type_, 0)})
+                    entry["count"] += count
+                    entry["per_minute"].append([minute, count])
+                    if sketch is not None:
+                        entry["sketch"] = (entry["sketch"] or DDSketch(self.alpha)).merge(sketch)
+        for entry in out.values():
+            sketch = entry.pop("sketch")
+            entry["duration"] = sketch.summary() if sketch is not None else None
+        return {"from": start, "to": end + 59, "minutes": minutes, "types": out}
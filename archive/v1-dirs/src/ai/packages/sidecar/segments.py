@@ -0,0 +1,493 @@
+"""Segmented sidecar event log.
+
+Events go to numbered segment files in one directory:
+
+    sidecar-00000007.ndjson      active segment, plain NDJSON, appended to
+    sidecar-00000006.ndjson.gz   sealed segment
+    sidecar-00000006.idx         its sparse index (JSON)
+
+The active segment rotates once it reaches max_bytes or max_age_s. A sealed
+segment is compressed in the background, one gzip member per index block, so
+the whole file still reads as ordinary gzip and each block can be decompressed
+on its own. Every ~block_bytes of NDJSON the index records the block's offset,
+compressed offset, min/max ts and line count. Readers skip whole segments and
+blocks outside a ts range, and read the log's end without touching its start.
+
+Until compression finishes a rotated segment stays readable as plain NDJSON;
+after a crash, plain segments other than the newest are sealed again on start.
+
+With a manifest, SegmentLog records its rotated segments there, and other
+processes read the stream through a StreamReader: sealed segments from their
+.idx, the plain ones indexed incrementally as they grow.
+"""
+
+import abc, bisect, gzip, json, logging, os, re, threading, time, zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .manifest import Manifest
+from .tail import tail_lines
+
+BLOCK_BYTES = 1 << 16
+_TS_LAST = re.compile(rb'"ts":\s*(-?\d+)\s*\}\s*$')
+
+logger = logging.getLogger(__name__)
+
+def line_ts(line: bytes) -> Optional[int]:
+    """Top-level "ts" of an event line (None if it has none).
+
+    model_dump_json() puts ts last, so this is usually a regex on the line end.
+    """
+    m = _TS_LAST.search(line)
+    if m is not None:
+        return int(m.group(1))
+    try:
+        ts = json.loads(line).get("ts")
+    except (ValueError, AttributeError):
+        return None
+    return int(ts) if isinstance(ts, (int, float)) and not isinstance(ts, bool) else None
+
+class Block(NamedTuple):
+    offset: int
+    zoffset: int  # -1 until the segment is compressed
+    min_ts: Optional[int]
+    max_ts: Optional[int]
+    lines: int
+
+class Segment:
+    """Immutable view of one segment; the active one is re-snapshotted on each read"""
+    __slots__ = ("seq", "path", "compressed", "size", "stored_size", "lines", "blocks", "min_ts", "max_ts")
+
+    def __init__(self, seq: int, path: Path, compressed: bool, size: int, stored_size: int, blocks: List[Block]):
+        self.seq, self.path, self.compressed = seq, path, compressed
+        self.size, self.stored_size, self.blocks = size, stored_size, blocks
+        self.lines = sum(b.lines for b in blocks)
+        stamps = [b.min_ts for b in blocks if b.min_ts is not None] + [b.max_ts for b in blocks if b.max_ts is not None]
+        self.min_ts = min(stamps) if stamps else None
+        self.max_ts = max(stamps) if stamps else None
+
+    def overlaps(self, since: Optional[int], until: Optional[int]) -> bool:
+        return _overlaps(self.min_ts, self.max_ts, since, until)
+
+    def info(self) -> Dict[str, Any]:
+        return {"seq": self.seq, "file": self.path.name, "compressed": self.compressed, "lines": self.lines,
+                "bytes": self.size, "stored_bytes": self.stored_size, "blocks": len(self.blocks),
+                "min_ts": self.min_ts, "max_ts": self.max_ts}
+
+def _overlaps(lo: Optional[int], hi: Optional[int], since: Optional[int], until: Optional[int]) -> bool:
+    if since is None and until is None:
+        return True
+    if lo is None:
+        return False
+    return (since is None or hi >= since) and (until is None or lo <= until)
+
+class _Indexer:
+    """Builds a segment's blocks as lines are appended"""
+
+    def __init__(self, block_bytes: int):
+        self.block_bytes = block_bytes
+        self.blocks: List[Block] = []
+        self.offset = 0
+        self.lines = 0
+        self._start = 0
+        self._min = self._max = None
+        self._lines = 0
+
+    def add(self, data: bytes) -> None:
+        """Index complete lines (data ends with a newline)"""
+        for line in data[:-1].split(b"\n"):
+            ts = line_ts(line) if line.strip() else None
+            if ts is not None:
+                self._min = ts if self._min is None else min(self._min, ts)
+                self._max = ts if self._max is None else max(self._max, ts)
+            self._lines += 1
+            self.lines += 1
+            self.offset += len(line) + 1
+            if self.offset - self._start >= self.block_bytes:
+                self._close()
+
+    def _close(self) -> None:
+        self.blocks.append(Block(self._start, -1, self._min, self._max, self._lines))
+        self._start, self._min, self._max, self._lines = self.offset, None, None, 0
+
+    def snapshot(self) -> List[Block]:
+        if self._lines:
+            return self.blocks + [Block(self._start, -1, self._min, self._max, self._lines)]
+        return list(self.blocks)
+
+def _index_lines(f, indexer: _Indexer) -> bool:
+    """Index the complete lines from f's position to EOF; True if a partial line is left over"""
+    rest = b""
+    while True:
+        chunk = f.read(1 << 20)
+        if not chunk:
+            break
+        data = rest + chunk
+        end = data.rfind(b"\n") + 1
+        if end:
+            indexer.add(data[:end])
+        rest = data[end:]
+    return bool(rest)
+
+class _SegmentFiles(abc.ABC):
+    """Reads over one stream's segments; subclasses say what the segments are"""
+
+    directory: Path
+    stream: str
+
+    @abc.abstractmethod
+    def segments(self) -> List[Segment]:
+        """All segments, oldest first, the active one last"""
+
+    def line_count(self) -> int:
+        return sum(s.lines for s in self.segments())
+
+    def end(self) -> Tuple[int, int]:
+        """The position the next line will be written at, as far as this view knows"""
+        segments = self.segments()
+        return (segments[-1].seq, segments[-1].size) if segments else (0, 0)
+
+    def _path(self, seq: int, suffix: str) -> Path:
+        return self.directory / f"{self.stream}-{seq:08d}{suffix}"
+
+    def _load_index(self, seq: int) -> Segment:
+        meta = json.loads(self._path(seq, ".idx").read_text())
+        return Segment(seq, self._path(seq, ".ndjson.gz"), True, meta["size"], meta["stored_size"],
+                       [Block(*row) for row in meta["blocks"]])
+
+    @staticmethod
+    def _block_end(segment: Segment, i: int) -> int:
+        return segment.blocks[i + 1].offset if i + 1 < len(segment.blocks) else segment.size
+
+    def _current(self, seq: int) -> Segment:
+        return next(s for s in self.segments() if s.seq == seq)
+
+    def read_block(self, segment: Segment, i: int) -> bytes:
+        """Uncompressed NDJSON of one block"""
+        try:
+            return self._read_block(segment, i)
+        except FileNotFoundError:
+            if segment.compressed:
+                raise
+            return self._read_block(self._current(segment.seq), i)  # sealed while we were reading
+
+    def _read_block(self, segment: Segment, i: int) -> bytes:
+        block = segment.blocks[i]
+        with open(segment.path, "rb") as f:
+            if not segment.compressed:
+                f.seek(block.offset)
+                return f.read(self._block_end(segment, i) - block.offset)
+            end = segment.blocks[i + 1].zoffset if i + 1 < len(segment.blocks) else segment.stored_size
+            f.seek(block.zoffset)
+            return zlib.decompress(f.read(end - block.zoffset), 31)
+
+    def tail(self, limit: int) -> List[bytes]:
+        """The last `limit` lines across segments, oldest first"""
+        lines: List[bytes] = []
+        for segment in reversed(self.segments()):
+            need = limit - len(lines)
+            if need <= 0:
+                break
+            if not segment.compressed:
+                try:
+                    lines = tail_lines(segment.path, need) + lines
+                    continue
+                except FileNotFoundError:
+                    segment = self._current(segment.seq)
+            for i in range(len(segment.blocks) - 1, -1, -1):
+                block = [line for line in self.read_block(segment, i).split(b"\n") if line.strip()]
+                lines = block[-(limit - len(lines)):] + lines
+                if len(lines) >= limit:
+                    break
+        return lines
+
+    def scan(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[bytes]:
+        """Lines in write order, restricted to since <= ts <= until when either is given"""
+        bounded = since is not None or until is not None
+        for segment in self.segments():
+            if not segment.overlaps(since, until):
+                continue
+            for i, block in enumerate(segment.blocks):
+                if not _overlaps(block.min_ts, block.max_ts, since, until):
+                    continue
+                for line in self.read_block(segment, i).split(b"\n"):
+                    if not line.strip():
+                        continue
+                    if bounded:
+                        ts = line_ts(line)
+                        if ts is None or (since is not None and ts < since) or (until is not None and ts > until):
+                            continue
+                    yield line
+
+    @staticmethod
+    def _block_at(segment: Segment, offset: int) -> int:
+        return bisect.bisect_right([b.offset for b in segment.blocks], offset) - 1
+
+    def lines_from(self, seq: int, offset: int) -> Iterator[Tuple[int, int, bytes]]:
+        """(seq, offset, line) for every line at or after position (seq, offset), in write order"""
+        for segment in self.segments():
+            if segment.seq < seq or (segment.seq == seq and offset >= segment.size):
+                continue
+            start = offset if segment.seq == seq else 0
+            for i in range(max(0, self._block_at(segment, start)), len(segment.blocks)):
+                pos = segment.blocks[i].offset
+                for line in self.read_block(segment, i).split(b"\n")[:-1]:
+                    if pos >= start and line.strip():
+                        yield segment.seq, pos, line
+                    pos += len(line) + 1
+
+    def read_lines(self, positions: Iterable[Tuple[int, int]]) -> List[Optional[bytes]]:
+        """The lines starting at each (seq, offset), decompressing each block at most once"""
+        segments = {s.seq: s for s in self.segments()}
+        blocks: Dict[Tuple[int, int], bytes] = {}
+        lines: List[Optional[bytes]] = []
+        for seq, offset in positions:
+            segment = segments.get(seq)
+            i = self._block_at(segment, offset) if segment is not None and offset < segment.size else -1
+            if i < 0:
+                lines.append(None)
+                continue
+            if (seq, i) not in blocks:
+                blocks[(seq, i)] = self.read_block(segment, i)
+            data = blocks[(seq, i)]
+            start = offset - segment.blocks[i].offset
+            lines.append(data[start:data.index(b"\n", start)])
+        return lines
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {"directory": str(self.directory), "segments": len(segments),
+                "lines": sum(s.lines for s in segments), "bytes": sum(s.size for s in segments),
+                "stored_bytes": sum(s.stored_size for s in segments)}
+
+class SegmentLog(_SegmentFiles):
+    def __init__(self, directory: Union[str, Path], stream: str = "sidecar", max_bytes: int = 64 << 20,
+                 max_age_s: float = 3600, block_bytes: int = BLOCK_BYTES, level: int = 6,
+                 legacy: Optional[Path] = None, manifest: Optional[Manifest] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.block_bytes = block_bytes
+        self.level = level
+        self.manifest = manifest
+        self._lock = threading.Lock()
+        self._sealer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sidecar-seal")
+        self._segments: List[Segment] = []  # rotated: compressed, or plain until sealed
+        self._fd: Optional[int] = None
+        self._recover(legacy)
+
+    @classmethod
+    def from_env(cls, directory: Path, stream: str = "sidecar", legacy: Optional[Path] = None,
+                 manifest: Optional[Manifest] = None) -> "SegmentLog":
+        return cls(
+            directory,
+            stream=stream,
+            max_bytes=int(float(os.getenv("SIDECAR_SEGMENT_MB", "64")) * (1 << 20)),
+            max_age_s=float(os.getenv("SIDECAR_SEGMENT_MAX_AGE_S", "3600")),
+            level=int(os.getenv("SIDECAR_COMPRESS_LEVEL", "6")),
+            legacy=legacy,
+            manifest=manifest,
+        )
+
+    def _recover(self, legacy: Optional[Path]) -> None:
+        pattern = re.compile(rf"{re.escape(self.stream)}-(\d{{8}})(\.ndjson|\.ndjson\.gz|\.idx)")
+        found: Dict[int, set] = {}
+        for path in self.directory.iterdir():
+            m = pattern.fullmatch(path.name)
+            if m:
+                found.setdefault(int(m.group(1)), set()).add(m.group(2))
+        if not found and legacy is not None and legacy.exists():
+            # Adopt the old single-file log as the first segment
+            os.replace(legacy, self._path(0, ".ndjson"))
+            found[0] = {".ndjson"}
+
+        plain: List[Segment] = []
+        for seq in sorted(found):
+            kinds = found[seq]
+            if ".idx" in kinds and ".ndjson.gz" in kinds:
+                self._segments.append(self._load_index(seq))
+                if ".ndjson" in kinds:
+                    self._path(seq, ".ndjson").unlink()
+            elif ".ndjson" in kinds:
+                segment = self._index_plain(seq)
+                self._segments.append(segment)
+                plain.append(segment)
+
+        self._seq = self._segments[-1].seq + 1 if self._segments else 0
+        self._indexer = _Indexer(self.block_bytes)
+        if plain and plain[-1] is self._segments[-1]:
+            # The newest plain segment carries on as the active one
+            active = self._segments.pop()
+            plain.pop()
+            self._seq = active.seq
+            self._indexer.blocks = list(active.blocks)
+            self._indexer.offset = self._indexer._start = active.size
+            self._indexer.lines = active.lines
+        self._started = time.monotonic()
+        self._publish()
+        for segment in plain:
+            self._sealer.submit(self._seal, segment)
+
+    def _publish(self, closed: bool = False) -> None:
+        """Record the rotated segments in the manifest (called holding the lock, or before any append)"""
+        if self.manifest is None:
+            return
+        try:
+            self.manifest.update(self.stream, {"pid": None if closed else os.getpid(), "active": self._seq,
+                                               "segments": [s.info() for s in self._segments]})
+        except OSError:
+            # Other workers see this stream as it was until the next update; the log itself is fine
+            logger.exception("Failed to update sidecar manifest")
+
+    def _index_plain(self, seq: int) -> Segment:
+        path = self._path(seq, ".ndjson")
+        indexer = _Indexer(self.block_bytes)
+        with open(path, "rb") as f:
+            torn = _index_lines(f, indexer)
+        if torn:
+            os.truncate(path, indexer.offset)  # drop a torn final write
+        return Segment(seq, path, False, indexer.offset, indexer.offset, indexer.snapshot())
+
+    def append(self, data: bytes) -> Tuple[int, int]:
+        """Append complete NDJSON lines to the active segment, rotating first if it is full or old.
+
+        Returns the (seq, offset) at which the data starts.
+        """
+        with self._lock:
+            size = self._indexer.offset
+            if not data:
+                return self._seq, size
+            if size and (size + len(data) > self.max_bytes or time.monotonic() - self._started >= self.max_age_s):
+                self._rotate()
+            if self._fd is None:
+                self._fd = os.open(self._path(self._seq, ".ndjson"), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._started = time.monotonic() if not size else self._started
+            position = (self._seq, self._indexer.offset)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+            self._indexer.add(data)
+            return position
+
+    def fsync(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+
+    def _rotate(self) -> None:
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        size = self._indexer.offset
+        segment = Segment(self._seq, self._path(self._seq, ".ndjson"), False, size, size, self._indexer.snapshot())
+        self._segments.append(segment)
+        self._sealer.submit(self._seal, segment)
+        self._seq += 1
+        self._indexer = _Indexer(self.block_bytes)
+        self._started = time.monotonic()
+        self._publish()
+
+    def _seal(self, segment: Segment) -> None:
+        gz = self._path(segment.seq, ".ndjson.gz")
+        tmp = gz.with_name(gz.name + ".tmp")
+        blocks: List[Block] = []
+        with open(segment.path, "rb") as src, open(tmp, "wb") as dst:
+            for i, block in enumerate(segment.blocks):
+                src.seek(block.offset)
+                data = src.read(self._block_end(segment, i) - block.offset)
+                blocks.append(block._replace(zoffset=dst.tell()))
+                dst.write(gzip.compress(data, self.level, mtime=0))
+            stored_size = dst.tell()
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp, gz)
+        idx = self._path(segment.seq, ".idx")
+        idx_tmp = idx.with_name(idx.name + ".tmp")
+        idx_tmp.write_text(json.dumps({"seq": segment.seq, "size": segment.size, "stored_size": stored_size,
+                                       "blocks": blocks}))
+        os.replace(idx_tmp, idx)
+        sealed = Segment(segment.seq, gz, True, segment.size, stored_size, blocks)
+        with self._lock:
+            self._segments = [sealed if s.seq == segment.seq else s for s in self._segments]
+            self._publish()
+        segment.path.unlink()
+
+    def segments(self) -> List[Segment]:
+        """All segments, oldest first, the active one last"""
+        with self._lock:
+            segments = list(self._segments)
+            size = self._indexer.offset
+            if size:
+                path = self._path(self._seq, ".ndjson")
+                segments.append(Segment(self._seq, path, False, size, size, self._indexer.snapshot()))
+        return segments
+
+    def line_count(self) -> int:
+        with self._lock:
+            return sum(s.lines for s in self._segments) + self._indexer.lines
+
+    def end(self) -> Tuple[int, int]:
+        with self._lock:
+            return self._seq, self._indexer.offset
+
+    def close(self) -> None:
+        """Finish pending compression and close the active segment"""
+        self._sealer.shutdown(wait=True)
+        with self._lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+            self._publish(closed=True)
+
+class StreamReader(_SegmentFiles):
+    """Read-only view of a stream another process appends to, as its manifest entry describes it"""
+
+    def __init__(self, directory: Union[str, Path], stream: str, manifest: Manifest, block_bytes: int = BLOCK_BYTES):
+        self.directory = Path(directory)
+        self.stream = stream
+        self.manifest = manifest
+        self.block_bytes = block_bytes
+        self._lock = threading.Lock()
+        self._sealed: Dict[int, Segment] = {}
+        self._plain: Dict[int, _Indexer] = {}
+
+    def segments(self) -> List[Segment]:
+        entry = self.manifest.read().get(self.stream)
+        if entry is None:
+            return []
+        seqs = [(info["seq"], info["compressed"]) for info in entry["segments"]] + [(entry["active"], False)]
+        segments = []
+        with self._lock:
+            for seq, compressed in seqs:
+                segment = self._sealed.get(seq)
+                if segment is None and compressed:
+                    segment = self._sealed[seq] = self._load_index(seq)
+                elif segment is None:
+                    segment = self._follow(seq)
+                if segment is not None and segment.size:
+                    segments.append(segment)
+            for seq in [seq for seq in self._plain if seq in self._sealed]:
+                del self._plain[seq]
+        return segments
+
+    def _follow(self, seq: int) -> Optional[Segment]:
+        """A plain segment, indexing whatever has been appended to it since the last call"""
+        path = self._path(seq, ".ndjson")
+        indexer = self._plain.get(seq)
+        try:
+            with open(path, "rb") as f:
+                if indexer is None or os.fstat(f.fileno()).st_size < indexer.offset:
+                    indexer = self._plain[seq] = _Indexer(self.block_bytes)  # new, or truncated by recovery
+                f.seek(indexer.offset)
+                _index_lines(f, indexer)
+        except FileNotFoundError:
+            if not self._path(seq, ".idx").exists():
+                return None  # the active segment has no file yet
+            segment = self._sealed[seq] = self._load_index(seq)  # sealed since the manifest was read
+            return segment
+        return Segment(seq, path, False, indexer.offset, indexer.offset, indexer.snapshot())
@@ -0,0 +1,43 @@
+"""Reading the end of an NDJSON log without scanning it.
+
+tail_lines() seeks to EOF and reads fixed-size blocks backwards until it has
+the requested number of complete lines, so its cost depends on `limit` and the
+line length, not on the size of the file.
+"""
+
+import os
+from pathlib import Path
+from typing import List, Union
+
+BLOCK_SIZE = 1 << 16
+
+def tail_lines(path: Union[str, Path], limit: int, block_size: int = BLOCK_SIZE) -> List[bytes]:
+    """The last `limit` complete, non-blank lines of a file, oldest first, without newlines.
+
+    A trailing line with no newline yet (a write in progress) is skipped.
+    """
+    if limit <= 0:
+        return []
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        chunks: List[bytes] = []
+        newlines = 0
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            chunk = f.read(size)
+            chunks.append(chunk)
+            newlines += chunk.count(b"\n")
+            if newlines > limit:
+                lines = _complete_lines(chunks, pos)
+                if len(lines) >= limit:
+                    return lines[-limit:]
+        return _complete_lines(chunks, pos)[-limit:]
+
+def _complete_lines(chunks: List[bytes], pos: int) -> List[bytes]:
+    pieces = b"".join(reversed(chunks)).split(b"\n")
+    pieces.pop()  # empty after the final newline, or a partial line
+    if pos > 0:
+        pieces = pieces[1:]  # may start mid-line
+    return [piece for piece in pieces if piece.strip()]
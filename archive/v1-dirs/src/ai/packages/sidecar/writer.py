@@ -0,0 +1,209 @@
+"""Group-commit NDJSON writer for the sidecar event log.
+
+One background task appends to the SegmentLog. Handlers hand it encoded lines through
+a bounded queue; it writes whatever has accumulated (up to flush_events lines,
+or after waiting flush_ms for more) with a single write() in a worker thread,
+then applies the fsync policy:
+
+    none      never fsync; the OS flushes the page cache when it likes
+    interval  fsync at most every fsync_interval_ms (default); when no write
+              follows, the writer fsyncs on its own once the interval is up
+    always    fsync every batch before acknowledging it
+
+Acknowledgement (ack):
+
+    written   submit() returns once the event's batch has been written to the
+              file (and fsynced, under "always"). A crash of this process
+              cannot lose it; an OS crash can, unless fsync is "always".
+    queued    submit() returns as soon as the event is queued. Lowest latency;
+              events still in the queue are lost if the process dies.
+
+pending counts events submitted and not yet written (queued or being
+written); admission control sheds load on it.
+
+After each batch is written, listeners are called on the event loop with the
+batch's stream, position in it and bytes: listener(stream, seq, offset, data).
+"""
+
+import asyncio, logging, os, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .segments import SegmentLog
+
+FSYNC_POLICIES = ("none", "interval", "always")
+ACK_MODES = ("written", "queued")
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+class EventWriter:
+    def __init__(self, log: SegmentLog, flush_events: int = 256, flush_ms: float = 5,
+                 fsync: str = "interval", fsync_interval_ms: float = 1000,
+                 max_queue: int = 10000, ack: str = "written"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        if ack not in ACK_MODES:
+            raise ValueError(f"ack must be one of {ACK_MODES}")
+        self.log = log
+        self.flush_events = max(1, flush_events)
+        self.flush_s = flush_ms / 1000
+        self.fsync = fsync
+        self.fsync_interval_s = fsync_interval_ms / 1000
+        self.max_queue = max_queue
+        self.ack = ack
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self.pending = 0
+        self.written = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.listeners: List[Callable[[str, int, int, bytes], None]] = []
+
+    @classmethod
+    def from_env(cls, log: SegmentLog) -> "EventWriter":
+        return cls(
+            log,
+            flush_events=int(os.getenv("SIDECAR_FLUSH_EVENTS", "256")),
+            flush_ms=float(os.getenv("SIDECAR_FLUSH_MS", "5")),
+            fsync=os.getenv("SIDECAR_FSYNC", "interval"),
+            fsync_interval_ms=float(os.getenv("SIDECAR_FSYNC_INTERVAL_MS", "1000")),
+            max_queue=int(os.getenv("SIDECAR_QUEUE_MAX", "10000")),
+            ack=os.getenv("SIDECAR_ACK", "written"),
+        )
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and self._loop is loop and not self._task.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(self.max_queue)
+        self.pending = 0
+        self._task = loop.create_task(self._run())
+
+    async def submit(self, line: bytes) -> None:
+        """Queue one NDJSON line (newline included); waits while the queue is full"""
+        await self.submit_many([line])
+
+    async def submit_many(self, lines: List[bytes]) -> None:
+        """Queue lines to be written together, in order, in the same batch"""
+        self._ensure_started()
+        done = asyncio.get_running_loop().create_future() if self.ack == "written" else None
+        self.pending += len(lines)
+        try:
+            await self._queue.put((lines, done))
+        except BaseException:
+            self.pending -= len(lines)
+            raise
+        if done is not None:
+            await done
+
+    def _sync(self) -> None:
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self.log.fsync()
+        self.fsyncs += 1
+
+    def _write(self, data: bytes) -> Tuple[int, int]:
+        position = self.log.append(data)
+        self._dirty = True
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval_s):
+            self._sync()
+        return position
+
+    def _sync_due(self) -> Optional[float]:
+        """Seconds until unsynced data is due its "interval" fsync, or None if nothing is"""
+        if self.fsync != "interval" or not self._dirty:
+            return None
+        return max(0.0, self._last_fsync + self.fsync_interval_s - time.monotonic())
+
+    async def _next_batch(self) -> Tuple[List[Tuple[List[bytes], Optional[asyncio.Future]]], bool]:
+        """Lines queued within flush_ms of the first one (at most ~flush_events), and whether to stop.
+        An empty batch means the writer sat idle until an fsync was due."""
+        queue = self._queue
+        batch, count = [], 0
+        due = self._sync_due()
+        if due is None:
+            item = await queue.get()
+        else:
+            try:
+                item = await asyncio.wait_for(queue.get(), due)
+            except asyncio.TimeoutError:
+                return batch, False
+        deadline = time.monotonic() + self.flush_s
+        while True:
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            count += len(item[0])
+            if count >= self.flush_events:
+                return batch, False
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        return batch, False
+
+    async def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = await self._next_batch()
+            if not batch:
+                if not stop and self._dirty:
+                    try:
+                        await asyncio.to_thread(self._sync)
+                    except Exception:
+                        logger.exception("Sidecar writer fsync failed")
+                continue
+            lines = [line for item_lines, _ in batch for line in item_lines]
+            data = b"".join(lines)
+            try:
+                seq, offset = await asyncio.to_thread(self._write, data)
+                error = None
+            except Exception as e:
+                error = e
+            else:
+                self.written += len(lines)
+                self.batches += 1
+                for listener in self.listeners:
+                    try:
+                        listener(self.log.stream, seq, offset, data)
+                    except Exception:
+                        logger.exception("Sidecar writer listener failed")
+            self.pending -= len(lines)
+            for _, done in batch:
+                if done is None or done.done():
+                    continue
+                if error is not None:
+                    done.set_exception(error)
+                else:
+                    done.set_result(None)
+
+    async def close(self) -> None:
+        """Write out everything queued, fsync and stop the writer task (the log stays open)"""
+        if self._task is not None and self._loop is asyncio.get_running_loop() and not self._task.done():
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+        await asyncio.to_thread(self.log.fsync)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "pending": self.pending,
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch": round(self.written / self.batches, 1) if self.batches else 0,
+            "fsyncs": self.fsyncs,
+            "fsync": self.fsync,
+            "ack": self.ack,
+        }
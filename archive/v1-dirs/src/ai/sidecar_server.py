@@ -1,18 +1,41 @@
 """Sidecar Server for IMO Creator event logging"""
 import os
 import json
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import time
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pathlib import Path
-from typing import Dict, Any
+from pydantic import TypeAdapter, ValidationError
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 
 try:
     from .models import SidecarEvent
+    from .packages.sidecar.admission import Admission, metric
+    from .packages.sidecar.index import EventIndex
+    from .packages.sidecar.live import Broadcaster, LiveFilter, follow, format_cursor, parse_cursor
+    from .packages.sidecar.manifest import Manifest, claim_stream
+    from .packages.sidecar.merged import MergedLog
+    from .packages.sidecar.rollups import Rollups
+    from .packages.sidecar.segments import SegmentLog
+    from .packages.sidecar.writer import EventWriter
 except ImportError:
     from ctb.ai.models import SidecarEvent
+    from ctb.ai.packages.sidecar.admission import Admission, metric
+    from ctb.ai.packages.sidecar.index import EventIndex
+    from ctb.ai.packages.sidecar.live import Broadcaster, LiveFilter, follow, format_cursor, parse_cursor
+    from ctb.ai.packages.sidecar.manifest import Manifest, claim_stream
+    from ctb.ai.packages.sidecar.merged import MergedLog
+    from ctb.ai.packages.sidecar.rollups import Rollups
+    from ctb.ai.packages.sidecar.segments import SegmentLog
+    from ctb.ai.packages.sidecar.writer import EventWriter
 
 # Environment variables provided by Doppler (no .env files)
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="IMO Creator Sidecar Server", description="Event logging and telemetry server")
 
 # CORS configuration
@@ -27,23 +50,153 @@ app.add_middleware(
 
 BASE_DIR = Path(__file__).parent.parent
 LOGS_DIR = BASE_DIR / "logs"
-SIDECAR_LOG_FILE = LOGS_DIR / "sidecar.ndjson"
+SIDECAR_LOG_DIR = LOGS_DIR / "sidecar"
+SIDECAR_LOG_FILE = LOGS_DIR / "sidecar.ndjson"  # pre-segment log, adopted as the first segment
 
 # Ensure logs directory exists
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Segmented log (SIDECAR_SEGMENT_* / SIDECAR_COMPRESS_LEVEL) and the group-commit
+# writer appending to it (SIDECAR_FLUSH_* / SIDECAR_FSYNC* / SIDECAR_ACK). Each worker
+# process claims a stream of its own in SIDECAR_LOG_DIR; reads merge all of them.
+_log: Optional[SegmentLog] = None
+_claim: Optional[int] = None
+_merged: Optional[MergedLog] = None
+_writer: Optional[EventWriter] = None
+
+# Live tail subscribers, fed by the writer and polling other workers' streams
+# (SIDECAR_LIVE_QUEUE / SIDECAR_LIVE_PING_S / SIDECAR_LIVE_POLL_MS)
+LIVE_QUEUE = int(os.getenv("SIDECAR_LIVE_QUEUE", "1000"))
+LIVE_PING_S = float(os.getenv("SIDECAR_LIVE_PING_S", "15"))
+LIVE_POLL_S = int(os.getenv("SIDECAR_LIVE_POLL_MS", "500")) / 1000
+broadcaster = Broadcaster()
+
+# Ingest admission control (SIDECAR_MAX_IN_FLIGHT / SIDECAR_MAX_PENDING / SIDECAR_LOW_PRIORITY_*
+# / SIDECAR_RETRY_AFTER_*): over a limit, /events and /events/batch answer 429
+admission = Admission.from_env()
+
+# Query index and rollups over the log (SIDECAR_ROLLUP_RETENTION_MIN / SIDECAR_DURATION_FIELDS),
+# each caught up when read and every SIDECAR_INDEX_SYNC_S
+INDEX_SYNC_S = float(os.getenv("SIDECAR_INDEX_SYNC_S", "2"))
+_index: Optional[EventIndex] = None
+_rollups: Optional[Rollups] = None
+_index_task: Optional[asyncio.Task] = None
+
+def _release_claim():
+    global _claim
+    if _claim is not None:
+        os.close(_claim)
+        _claim = None
+
+def get_log() -> SegmentLog:
+    global _log, _claim
+    if _log is None:
+        _release_claim()
+        stream, _claim = claim_stream(SIDECAR_LOG_DIR)
+        # Only the first stream adopts the pre-segment log
+        _log = SegmentLog.from_env(SIDECAR_LOG_DIR, stream=stream,
+                                   legacy=SIDECAR_LOG_FILE if stream == "sidecar" else None,
+                                   manifest=Manifest(SIDECAR_LOG_DIR))
+    return _log
+
+def get_logs() -> MergedLog:
+    """This worker's log merged with every other worker's stream"""
+    global _merged
+    log = get_log()
+    if _merged is None or _merged.log is not log:
+        _merged = MergedLog(log, log.manifest or Manifest(SIDECAR_LOG_DIR))
+    return _merged
+
+def get_writer() -> EventWriter:
+    global _writer
+    log = get_log()
+    if _writer is None or _writer.log is not log:
+        _writer = EventWriter.from_env(log)
+        _writer.listeners.append(broadcaster.publish)
+    return _writer
+
+def get_index() -> EventIndex:
+    global _index
+    if _index is None:
+        _index = EventIndex(SIDECAR_LOG_DIR / "index.sqlite3")
+    return _index
+
+def get_rollups() -> Rollups:
+    global _rollups
+    if _rollups is None:
+        stream = get_log().stream
+        _rollups = Rollups.from_env(SIDECAR_LOG_DIR / ("rollups.json" if stream == "sidecar" else f"rollups-{stream}.json"))
+    return _rollups
+
+async def sync_index(all_streams: bool = False) -> int:
+    """Index this worker's new events, or every stream's when all_streams"""
+    logs = get_logs().logs() if all_streams else [get_log()]  # creates SIDECAR_LOG_DIR, where the index lives
+    index = get_index()
+    return sum([await asyncio.to_thread(index.sync, log) for log in logs])
+
+async def sync_rollups(all_streams: bool = False) -> int:
+    logs = get_logs().logs() if all_streams else [get_log()]
+    rollups = get_rollups()
+    return sum([await asyncio.to_thread(rollups.sync, log) for log in logs])
+
+async def _sync_index_forever():
+    # Each worker keeps its own stream indexed; readers catch up on the others
+    while True:
+        try:
+            await sync_index()
+            await sync_rollups()
+        except Exception:
+            logger.exception("Sidecar index sync failed")
+        await asyncio.sleep(INDEX_SYNC_S)
+
+@app.on_event("startup")
+async def start_index_sync():
+    global _index_task
+    _index_task = asyncio.get_running_loop().create_task(_sync_index_forever())
+
+@app.on_event("shutdown")
+async def close_writer():
+    global _log, _merged, _writer, _index, _rollups, _index_task
+    if _index_task is not None:
+        _index_task.cancel()
+        _index_task = None
+    if _writer is not None:
+        # Drop the writer (and its listeners) with the log it appends to
+        await _writer.close()
+        _writer = None
+    if _index is not None:
+        await sync_index()
+        _index.close()
+        _index = None
+    if _rollups is not None:
+        await sync_rollups()
+        await asyncio.to_thread(_rollups.save)
+        _rollups = None
+    if _log is not None:
+        await asyncio.to_thread(_log.close)
+        _log = _merged = None
+    _release_claim()
+
+def _overloaded(limit: str) -> HTTPException:
+    return HTTPException(status_code=429, detail=f"Sidecar is overloaded ({limit} limit reached); retry later",
+                         headers={"Retry-After": str(admission.retry_after())})
+
 @app.post("/events")
 async def log_event(event: SidecarEvent):
     """
     Accept and log sidecar events to NDJSON file
+
+    With SIDECAR_ACK=written (default) the response is sent once the event's
+    batch is in the file; with SIDECAR_ACK=queued, once it is queued. Over the
+    admission limits the event is refused with 429 and Retry-After.
     """
+    started = time.perf_counter()
+    writer = get_writer()
+    keep, limit = admission.admit([event.type], writer.pending)
+    if not keep[0]:
+        raise _overloaded(limit)
     try:
-        # Convert event to JSON line
-        event_json = event.model_dump_json()
-        
-        # Append to NDJSON file
-        with open(SIDECAR_LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(event_json + "\n")
+        await writer.submit(event.model_dump_json().encode("utf-8") + b"\n")
         
         return {
             "status": "logged",
@@ -53,6 +206,142 @@ async def log_event(event: SidecarEvent):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to log event: {str(e)}")
+    finally:
+        admission.done("events", time.perf_counter() - started)
+
+# Bulk ingest: a JSON array, or NDJSON streamed line by line
+BATCH_MAX_EVENTS = int(os.getenv("SIDECAR_BATCH_MAX_EVENTS", "10000"))
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+_VALIDATE_CHUNK = 1000
+_event_list = TypeAdapter(List[SidecarEvent])
+
+def _error_text(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'event'}: {e['msg']}" for e in error.errors())
+
+def validate_lines(lines: List[Tuple[int, bytes]]) -> Tuple[List[SidecarEvent], List[Dict[str, Any]]]:
+    """Validate numbered NDJSON lines as one list; only if that fails, one by one for per-line errors"""
+    try:
+        events = _event_list.validate_json(b"[" + b",".join(line for _, line in lines) + b"]")
+        if len(events) == len(lines):
+            return events, []
+    except ValidationError:
+        pass
+    events, errors = [], []
+    for n, line in lines:
+        try:
+            events.append(SidecarEvent.model_validate_json(line))
+        except ValidationError as e:
+            errors.append({"line": n, "error": _error_text(e)})
+    return events, errors
+
+def _too_many() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_EVENTS} events")
+
+def validate_array(body: bytes) -> Tuple[List[SidecarEvent], List[Dict[str, Any]]]:
+    """Validate a JSON array of events; per-item errors carry the item's index.
+    Arrays over BATCH_MAX_EVENTS are refused before any item is validated."""
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Body is not JSON: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of events, or NDJSON")
+    if len(items) > BATCH_MAX_EVENTS:
+        raise _too_many()
+    try:
+        return _event_list.validate_python(items), []
+    except ValidationError:
+        pass
+    events, errors = [], []
+    for i, item in enumerate(items):
+        try:
+            events.append(SidecarEvent.model_validate(item))
+        except ValidationError as e:
+            errors.append({"index": i, "error": _error_text(e)})
+    return events, errors
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """Non-blank lines of a streamed body with their 1-based line numbers"""
+    partial: List[bytes] = []  # chunks of a line not yet ended; only new chunks are split
+    n = 0
+    async for chunk in request.stream():
+        if b"\n" not in chunk:
+            partial.append(chunk)
+            continue
+        first, *lines, rest = chunk.split(b"\n")
+        partial.append(first)
+        lines.insert(0, b"".join(partial))
+        partial = [rest]
+        for line in lines:
+            n += 1
+            if line.strip():
+                yield n, line
+    rest = b"".join(partial)
+    if rest.strip():
+        yield n + 1, rest
+
+@app.post("/events/batch")
+async def log_events_batch(request: Request):
+    """
+    Accept many events in one request and log them as one group commit
+
+    The body is a JSON array of events, or NDJSON (Content-Type
+    application/x-ndjson) read as it streams in. Invalid events are reported
+    in "errors" by index (array) or line number (NDJSON); the valid ones are
+    still logged. Nothing valid at all is a 422. Under load, low-priority
+    events are shed and counted in "shed"; if nothing is admitted, 429.
+    """
+    started = time.perf_counter()
+    # In flight from here: the body is only read once the request is admitted
+    limit = admission.enter()
+    if limit is not None:
+        raise _overloaded(limit)
+    written = False
+    try:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in NDJSON_TYPES:
+            events, errors, pending = [], [], []
+            async for n, line in _ndjson_lines(request):
+                pending.append((n, line))
+                if len(events) + len(errors) + len(pending) > BATCH_MAX_EVENTS:
+                    raise _too_many()
+                if len(pending) >= _VALIDATE_CHUNK:
+                    valid, invalid = validate_lines(pending)
+                    events += valid
+                    errors += invalid
+                    pending = []
+            if pending:
+                valid, invalid = validate_lines(pending)
+                events += valid
+                errors += invalid
+        else:
+            events, errors = validate_array(await request.body())
+
+        if errors and not events:
+            return JSONResponse(status_code=422, content={"status": "rejected", "accepted": 0,
+                                                          "rejected": len(errors), "errors": errors})
+        shed = 0
+        if events:
+            writer = get_writer()
+            keep, limit = admission.admit([event.type for event in events], writer.pending, entered=True)
+            if not any(keep):
+                raise _overloaded(limit)
+            shed = keep.count(False)
+            events = [event for event, kept in zip(events, keep) if kept]
+            written = True
+            try:
+                await writer.submit_many([event.model_dump_json().encode("utf-8") + b"\n" for event in events])
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to log events: {str(e)}")
+    finally:
+        admission.done("batch", time.perf_counter() - started if written else None)
+    return {
+        "status": "partial" if errors or shed else "logged",
+        "accepted": len(events),
+        "rejected": len(errors),
+        "shed": shed,
+        "errors": errors
+    }
 
 @app.get("/")
 async def root():
@@ -60,8 +349,11 @@ async def root():
     return {
         "service": "IMO Creator Sidecar Server",
         "version": "1.0.0",
-        "endpoints": ["/events", "/events/recent"],
-        "log_file": str(SIDECAR_LOG_FILE),
+        "endpoints": ["/events", "/events/batch", "/events/recent", "/events/query", "/events/stats", "/events/live", "/events/segments", "/metrics"],
+        "log": get_logs().stats(),
+        "writer": get_writer().stats(),
+        "live": broadcaster.stats(),
+        "admission": admission.stats(),
         "status": "ok"
     }
 
@@ -69,33 +361,134 @@ async def root():
 async def get_recent_events(limit: int = 10):
     """Get recent events from the log file"""
     try:
-        if not SIDECAR_LOG_FILE.exists():
-            return {"events": [], "total": 0}
-        
-        # Read last N lines from NDJSON file
-        with open(SIDECAR_LOG_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        # Get last N lines and parse as JSON
-        recent_lines = lines[-limit:] if len(lines) > limit else lines
+        logs = get_logs()
+        # Read only the last N lines of each stream, backwards from the end of its newest
+        # segments, and merge them by ts
+        recent_lines = await asyncio.to_thread(logs.tail, limit)
+        total_logged = await asyncio.to_thread(logs.line_count)
         events = []
         
         for line in recent_lines:
             try:
-                event_data = json.loads(line.strip())
+                event_data = json.loads(line)
                 events.append(event_data)
-            except json.JSONDecodeError:
+            except (json.JSONDecodeError, UnicodeDecodeError):
                 continue
         
         return {
             "events": events,
             "total": len(events),
-            "total_logged": len(lines)
+            "total_logged": total_logged
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read events: {str(e)}")
 
+@app.get("/events/query")
+async def query_events(
+    type: List[str] = Query(default=[]),
+    process_id: Optional[str] = None,
+    unique_id: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    order: str = "desc",
+):
+    """
+    Find events by type (repeatable), tags.process_id, tags.unique_id and ts range
+
+    Newest first by default (order=asc for oldest first); pass next_cursor back
+    as cursor for the following page.
+    """
+    await sync_index(all_streams=True)
+    try:
+        positions, next_cursor = get_index().query(type, process_id, unique_id, since, until, cursor, limit, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    lines = await asyncio.to_thread(get_logs().read_lines, positions)
+    events = [json.loads(line) for line in lines if line is not None]
+    return {"events": events, "count": len(events), "next_cursor": next_cursor}
+
+@app.get("/events/stats")
+async def event_stats(minutes: int = 60, type: List[str] = Query(default=[])):
+    """
+    Event counts per type per minute, and payload duration percentiles
+    (p50/p90/p99), over the last `minutes`
+    """
+    await sync_rollups(all_streams=True)
+    return await asyncio.to_thread(get_rollups().stats, minutes, type)
+
+@app.get("/events/live")
+async def live_events(
+    request: Request,
+    type: List[str] = Query(default=[]),
+    tag: List[str] = Query(default=[]),
+    start: Optional[str] = Query(default=None, alias="from"),
+):
+    """
+    Server-sent events for each committed event matching the filters
+
+    Filters: type (repeatable, any of) and tag=key=value (repeatable, all of).
+    Each event's SSE id is the cursor just past it: the position of the next
+    line in every worker's stream, as stream:seq.offset,... Reconnecting with
+    Last-Event-ID resumes after that event; from=<cursor> starts at a cursor,
+    replaying every stream from its position (streams it lacks, from their
+    start). A slow client gets an "event: lag" message with the number of
+    events dropped and the cursor to resume from, instead of slowing ingestion.
+    """
+    tags = {}
+    for item in tag:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise HTTPException(status_code=400, detail=f"tag must be key=value, got {item!r}")
+        tags[key] = value
+    try:
+        cursor = None
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id:
+            cursor = parse_cursor(last_event_id)
+        elif start is not None:
+            cursor = parse_cursor(start)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        async for kind, item in follow(get_logs(), broadcaster, LiveFilter(type, tags), cursor,
+                                       LIVE_QUEUE, LIVE_PING_S, LIVE_POLL_S):
+            if kind == "event":
+                yield f"id: {format_cursor(item[0])}\nevent: event\ndata: {item[1].decode('utf-8')}\n\n"
+            elif kind == "lag":
+                yield f"event: lag\ndata: {json.dumps(item)}\n\n"
+            else:
+                yield ": ping\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/events/segments")
+async def list_segments():
+    """Segments of every stream of the event log, oldest first, with their ts ranges and sizes"""
+    logs = get_logs()
+    return await asyncio.to_thread(lambda: {
+        **logs.stats(),
+        "segments": [{"stream": log.stream, **segment.info()} for log in logs.logs() for segment in log.segments()],
+    })
+
+@app.get("/metrics")
+async def metrics():
+    """Ingest, writer and live tail metrics in the Prometheus text format"""
+    writer = get_writer()
+    live = broadcaster.stats()
+    lines = admission.metrics(writer.pending)
+    lines += metric("sidecar_writer_events_total", "counter", "Events written to the log", [("", writer.written)])
+    lines += metric("sidecar_writer_batches_total", "counter", "Group commits written", [("", writer.batches)])
+    lines += metric("sidecar_writer_fsyncs_total", "counter", "fsyncs of the log", [("", writer.fsyncs)])
+    lines += metric("sidecar_live_subscribers", "gauge", "Open /events/live streams", [("", live["subscribers"])])
+    lines += metric("sidecar_live_dropped_events_total", "counter", "Events dropped for slow live subscribers",
+                    [("", live["dropped"])])
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Benchmark blueprint scoring: subprocess per call vs in-process ScoreCache.
+
+Usage:
+    python src/sys/benchmarks/bench_blueprint_score.py [iterations]
+"""
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+
+from src.ui.src.server.blueprints.scoring import ScoreCache
+from src.ui.src.server.blueprints.tools import load_tool
+
+TOOLS_DIR = ROOT / "src" / "sys" / "tools"
+EXAMPLE_MANIFEST = ROOT.parents[1] / "docs" / "blueprints" / "example" / "manifest.yaml"
+
+def _timed(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # blueprint_score.py resolves docs/ relative to its own parent, so run a copy
+        tmp = Path(tmp)
+        (tmp / "tools").mkdir()
+        shutil.copy(TOOLS_DIR / "blueprint_score.py", tmp / "tools" / "blueprint_score.py")
+        blueprint_dir = tmp / "docs" / "blueprints" / "example"
+        blueprint_dir.mkdir(parents=True)
+        manifest_path = blueprint_dir / "manifest.yaml"
+        shutil.copy(EXAMPLE_MANIFEST, manifest_path)
+
+        def via_subprocess():
+            subprocess.run([sys.executable, str(tmp / "tools" / "blueprint_score.py"), "example"],
+                           capture_output=True, check=True)
+            (blueprint_dir / "progress.json").read_text()
+
+        cache = ScoreCache(load_tool(TOOLS_DIR, "blueprint_score").score_manifest)
+
+        def cold():
+            cache._entries.clear()
+            cache.score_path("example", manifest_path)
+
+        def warm():
+            cache.score_path("example", manifest_path)
+
+        results = [
+            ("subprocess", _timed(via_subprocess, iterations)),
+            ("in-process (miss)", _timed(cold, iterations * 10)),
+            ("in-process (hit)", _timed(warm, iterations * 100)),
+        ]
+
+    base = results[0][1]
+    for label, per_call in results:
+        print(f"{label:<20} {per_call * 1e6:>12.1f} us/call  {base / per_call:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""Benchmark doctrine unique_id minting: the old sha256-seeded generator vs
+IdAllocator.mint() and mint_many().
+
+Usage:
+    python src/sys/benchmarks/bench_id_allocator.py [count]
+"""
+import base64
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+
+from src.ui.src.server.blueprints.ids import IdAllocator, _compact_ts
+
+def seeded_id(ts_ms: int) -> str:
+    """The previous generate_unique_id(): deterministic per (app, millisecond)"""
+    seed = f"shq|03|imo|imo-creator|{ts_ms}"
+    suffix = base64.b32encode(hashlib.sha256(seed.encode("utf-8")).digest()[:10]).decode("utf-8").rstrip("=")
+    return f"shq-03-imo-{_compact_ts(ts_ms)}-{suffix}"
+
+def report(name: str, count: int, seconds: float, ids) -> None:
+    print(f"{name:<18} {count / seconds:12,.0f} ids/s   distinct {len(set(ids)):>9,} of {count:,}")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ts_ms = 1700000000000
+    allocator = IdAllocator()
+
+    n = min(count, 200_000)
+    start = time.perf_counter()
+    ids = [seeded_id(ts_ms) for _ in range(n)]
+    report("seeded (old)", n, time.perf_counter() - start, ids)
+
+    start = time.perf_counter()
+    ids = [allocator.mint(ts_ms) for _ in range(n)]
+    report("mint()", n, time.perf_counter() - start, ids)
+
+    start = time.perf_counter()
+    ids = allocator.mint_many(count, ts_ms)
+    report("mint_many(n)", count, time.perf_counter() - start, ids)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Load test /llm against a local stub provider.
+
+Starts a threaded HTTP stub that answers like the Anthropic messages API after
+a fixed delay, then fires N concurrent /llm requests through the ASGI app. With
+the pooled async client the wall time stays close to one provider round trip;
+the blocking baseline (one requests.post per call, as the handler used to do on
+the event loop) grows linearly with N.
+
+Usage:
+    python src/sys/benchmarks/bench_llm_concurrency.py [concurrency] [latency_ms]
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "src" / "ui"))
+
+def make_stub(latency_s: float):
+    class StubProvider(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("content-length", 0)))
+            time.sleep(latency_s)
+            body = json.dumps({"content": [{"type": "text", "text": "stub"}]}).encode()
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class StubServer(ThreadingHTTPServer):
+        request_queue_size = 256
+
+    server = StubServer(("127.0.0.1", 0), StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def fire(app, n: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as c:
+        return await asyncio.gather(*[c.post("/llm", json={"prompt": f"p{i}", "provider": "anthropic"}) for i in range(n)])
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency_s = (int(sys.argv[2]) if len(sys.argv) > 2 else 200) / 1000
+
+    server = make_stub(latency_s)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["ANTHROPIC_BASE_URL"] = url
+    os.environ["ANTHROPIC_API_KEY"] = "sk-bench"
+
+    from src.server.main import app
+
+    start = time.perf_counter()
+    for _ in range(concurrency):
+        requests.post(f"{url}/v1/messages", json={}, timeout=30)
+    blocking = time.perf_counter() - start
+
+    start = time.perf_counter()
+    responses = asyncio.run(fire(app, concurrency))
+    pooled = time.perf_counter() - start
+    server.shutdown()
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    print(f"concurrency={concurrency} provider_latency={latency_s * 1000:.0f}ms ok={ok}/{concurrency}")
+    print(f"blocking (serialized)  {blocking:8.3f}s")
+    print(f"pooled async           {pooled:8.3f}s  ({blocking / pooled:.1f}x)")
+
+if __name__ == "__main__":
+    main()
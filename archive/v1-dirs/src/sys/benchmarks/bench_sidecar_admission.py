@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Load test for sidecar admission control: bursts of concurrent POST /events
+from more and more clients (half of the events low-priority app.start, as when
+a CI fleet starts up), with no limits vs the admission limits. Refused clients
+wait Retry-After (with jitter) and send the event again. Reports ingest latency
+of the accepted requests, how many 429s each priority got, and the total time.
+
+Usage:
+    python src/sys/benchmarks/bench_sidecar_admission.py [events] [max_in_flight]
+"""
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar.admission import Admission
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+async def burst(client: httpx.AsyncClient, count: int, concurrency: int):
+    """Latencies of accepted requests, and how many times low/normal priority events were refused"""
+    events = [{"type": "app.start" if i % 2 else "stage.completed", "payload": {"i": i}, "ts": 1700000000 + i}
+              for i in range(count)]
+    latencies, shed = [], {"app.start": 0, "stage.completed": 0}
+
+    async def worker(mine):
+        for event in mine:
+            while True:
+                start = time.perf_counter()
+                r = await client.post("/events", json=event)
+                if r.status_code != 429:
+                    break
+                shed[event["type"]] += 1
+                await asyncio.sleep(float(r.headers["retry-after"]) * random.uniform(0.5, 1.5))
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker(events[i::concurrency]) for i in range(concurrency)))
+    return latencies, shed
+
+async def run(admission: Admission, count: int, concurrency: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        sidecar.SIDECAR_LOG_FILE = Path(tmp) / "sidecar.ndjson"
+        sidecar.SIDECAR_LOG_DIR = Path(tmp) / "sidecar"
+        sidecar.admission = admission
+        transport = httpx.ASGITransport(app=sidecar.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://sidecar", timeout=None) as client:
+            start = time.perf_counter()
+            latencies, shed = await burst(client, count, concurrency)
+            total = time.perf_counter() - start
+        await sidecar.close_writer()
+        sidecar._writer = None
+    return latencies, shed, total
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    max_in_flight = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    print(f"{count:,} events per burst")
+    print(f"{'clients':>7} {'':<14} {'429 low':>9} {'429 normal':>11} {'p50':>9} {'p99':>9} {'max':>9} {'total':>8}")
+    for concurrency in (250, 1000, 4000):
+        cases = [("no limits", Admission(max_in_flight=10 ** 9, max_pending=10 ** 9)),
+                 (f"in-flight {max_in_flight}", Admission(max_in_flight=max_in_flight, low_priority=["app.start"]))]
+        for name, admission in cases:
+            latencies, shed, total = await run(admission, count, concurrency)
+            print(f"{concurrency:>7,} {name:<14} {shed['app.start']:>9,} {shed['stage.completed']:>11,} "
+                  f"{percentile(latencies, 0.5) * 1000:7.1f}ms {percentile(latencies, 0.99) * 1000:7.1f}ms "
+                  f"{max(latencies) * 1000:7.1f}ms {total:7.1f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Benchmark sidecar ingest in-process (ASGI, no network): one POST /events
+per event vs POST /events/batch with a JSON array and with NDJSON.
+
+Usage:
+    python src/sys/benchmarks/bench_sidecar_ingest.py [events] [batch_size] [concurrency]
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+
+import src.ai.sidecar_server as sidecar
+
+def make_events(count: int):
+    return [{"type": "stage.completed", "payload": {"i": i, "duration_ms": i % 500},
+             "tags": {"process_id": f"PRC-{i % 97}"}, "ts": 1700000000 + i} for i in range(count)]
+
+async def run(client: httpx.AsyncClient, requests, concurrency: int) -> float:
+    queue = list(reversed(requests))
+
+    async def worker():
+        while queue:
+            kwargs = queue.pop()
+            r = await client.post(**kwargs)
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    events = make_events(count)
+    batches = [events[i:i + batch_size] for i in range(0, count, batch_size)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sidecar.SIDECAR_LOG_FILE = Path(tmp) / "sidecar.ndjson"
+        sidecar.SIDECAR_LOG_DIR = Path(tmp) / "sidecar"
+        transport = httpx.ASGITransport(app=sidecar.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://sidecar") as client:
+            cases = [
+                ("single POST /events", [{"url": "/events", "json": e} for e in events]),
+                (f"batch array x{batch_size}", [{"url": "/events/batch", "json": b} for b in batches]),
+                (f"batch NDJSON x{batch_size}", [{"url": "/events/batch",
+                                                   "content": "\n".join(json.dumps(e) for e in b),
+                                                   "headers": {"Content-Type": "application/x-ndjson"}}
+                                                  for b in batches]),
+            ]
+            for name, requests in cases:
+                seconds = await run(client, requests, concurrency)
+                print(f"{name:<22} {count / seconds:10,.0f} events/s  ({len(requests):,} requests)")
+        await sidecar.close_writer()
+        print(f"logged {sidecar.get_log().line_count():,} events")
+        sidecar.get_log().close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
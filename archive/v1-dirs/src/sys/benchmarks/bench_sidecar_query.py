@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Benchmark EventIndex queries (index lookup + reading the events from
+segments) as the sidecar log grows, to show page latency stays flat.
+
+Usage:
+    python src/sys/benchmarks/bench_sidecar_query.py [max_events]
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+
+from src.ai.packages.sidecar.index import EventIndex
+from src.ai.packages.sidecar.segments import SegmentLog
+
+TYPES = ["app.start", "heir.check", "action.invoked", "stage.completed", "llm.call"]
+
+def events(start: int, count: int) -> bytes:
+    return b"".join(json.dumps({"type": TYPES[i % len(TYPES)], "payload": {"i": i, "duration_ms": i % 900},
+                                "tags": {"process_id": f"PRC-{i % 1000}", "unique_id": f"U-{i % 5000}"},
+                                "ts": 1700000000 + i // 10}).encode() + b"\n"
+                    for i in range(start, start + count))
+
+def page_ms(log: SegmentLog, index: EventIndex, repeat: int = 20, **filters) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        positions, _ = index.query(limit=100, **filters)
+        log.read_lines([(seq, offset) for _, seq, offset in positions])
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    max_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = SegmentLog(Path(tmp) / "segments", max_bytes=16 << 20)
+        index = EventIndex(Path(tmp) / "index.sqlite3")
+        total, size = 0, 62_500
+        print(f"{'events':>10} {'sync/s':>10} {'type':>9} {'process':>9} {'unique+ts':>10} {'ts 60s':>9}")
+        while total < max_events:
+            target = min(max_events, max(size, total * 4))
+            while total < target:
+                count = min(10_000, target - total)
+                log.append(events(total, count))
+                total += count
+            start = time.perf_counter()
+            added = index.sync(log)
+            sync_rate = added / (time.perf_counter() - start)
+            mid = 1700000000 + total // 20
+            print(f"{total:>10,} {sync_rate:>10,.0f} "
+                  f"{page_ms(log, index, types=['heir.check']):7.2f}ms "
+                  f"{page_ms(log, index, process_id='PRC-42'):7.2f}ms "
+                  f"{page_ms(log, index, unique_id='U-77', until=mid):8.2f}ms "
+                  f"{page_ms(log, index, since=mid, until=mid + 59):7.2f}ms")
+        index.close()
+        log.close()
+
+if __name__ == "__main__":
+    main()
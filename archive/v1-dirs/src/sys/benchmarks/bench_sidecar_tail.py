@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Benchmark sidecar log reads as the log grows: readlines() over one big file
+(the old /events/recent) vs SegmentLog.tail() and a one-minute ts-range scan
+over rotated, compressed segments, plus total_logged and disk use.
+
+The log is grown in place, doubling from 16 MiB up to max_mib (default 4096),
+so the temp directory needs that much free disk (less once segments are sealed).
+
+Usage:
+    python src/sys/benchmarks/bench_sidecar_tail.py [max_mib] [readlines_max_mib]
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+
+from src.ai.packages.sidecar.segments import SegmentLog
+from src.ai.packages.sidecar.writer import EventWriter
+
+def event_block(start: int, mib: int):
+    """~mib MiB of events with ts increasing by one per event, and the next start"""
+    lines, size, i = [], 0, start
+    while size < mib << 20:
+        line = json.dumps({"type": "stage.completed", "payload": {"i": i, "note": "x" * (i % 200)},
+                           "tags": {"process_id": f"PRC-{i % 97}"}, "ts": 1700000000 + i}) + "\n"
+        lines.append(line)
+        size += len(line)
+        i += 1
+    return "".join(lines).encode(), i
+
+def best_ms(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def readlines_tail(path: Path, limit: int):
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    return lines[-limit:], len(lines)
+
+def main():
+    max_mib = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    readlines_max_mib = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+
+    with tempfile.TemporaryDirectory() as tmp:
+        single = Path(tmp) / "sidecar.ndjson"
+        log = SegmentLog(Path(tmp) / "segments")
+        writer = EventWriter(log, fsync="none")
+        size_mib, next_i = 0, 0
+        print(f"{'log size':>10} {'readlines':>12} {'tail 10':>10} {'tail 1000':>10} {'range 60s':>10} "
+              f"{'total_logged':>13} {'on disk':>9}")
+        while size_mib < max_mib:
+            target = max(16, size_mib * 2)
+            while size_mib < target:
+                block, next_i = event_block(next_i, 16)
+                asyncio.run(writer.submit_many([block]))
+                if target <= readlines_max_mib:
+                    with open(single, "ab") as f:
+                        f.write(block)
+                size_mib += 16
+            log._sealer.submit(lambda: None).result()  # let background compression catch up
+
+            old = f"{best_ms(lambda: readlines_tail(single, 10), 1):10.1f}ms" if size_mib <= readlines_max_mib else "skipped".rjust(12)
+            tail10 = best_ms(lambda: log.tail(10))
+            tail1000 = best_ms(lambda: log.tail(1000))
+            since = 1700000000 + next_i // 2
+            window = best_ms(lambda: sum(1 for _ in log.scan(since, since + 59)))
+            count = best_ms(log.line_count)
+            stats = log.stats()
+            print(f"{size_mib:>6} MiB {old} {tail10:8.3f}ms {tail1000:8.3f}ms {window:8.3f}ms {count:11.4f}ms "
+                  f"{stats['stored_bytes'] / 2**20:6.0f}MiB  ({log.line_count():,} lines)")
+        asyncio.run(writer.close())
+        log.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Benchmark SSOT version hashing: peak memory and time for canonicalize() + sha256
+vs the streaming canonical_hash() on multi-MB SSOTs.
+
+Usage:
+    python src/sys/benchmarks/bench_ssot_hash.py [size_mb ...]
+"""
+import hashlib
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+
+from src.ui.src.server.blueprints.versioning import canonical_hash, canonicalize
+
+def build_ssot(size_mb: float) -> dict:
+    """Three buckets of stages whose field payloads add up to roughly size_mb"""
+    stages = max(1, int(size_mb * 16))
+    payload = "p" * (1 << 16)  # one 64 KiB field per stage
+    return {
+        "meta": {"app_name": "bench", "stage": "overview", "_created_at_ms": 0},
+        "doctrine": {"unique_id": "bench-1", "schema_version": "HEIR/1.0"},
+        "buckets": {
+            bucket: {"stages": [{"key": f"{bucket}-{i}", "required_fields": ["payload"],
+                                 "fields": {"payload": payload, "notes": f"stage {i}"}}
+                                for i in range(stages // 3 or 1)]}
+            for bucket in ("input", "middle", "output")
+        },
+    }
+
+def flat_hash(ssot: dict) -> str:
+    return hashlib.sha256(canonicalize(ssot).encode("utf-8")).hexdigest()
+
+def measure(fn, ssot):
+    tracemalloc.start()
+    start = time.perf_counter()
+    digest = fn(ssot)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return digest, elapsed, peak
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [1, 8, 32]
+    for size_mb in sizes:
+        ssot = build_ssot(size_mb)
+        flat_digest, flat_s, flat_peak = measure(flat_hash, ssot)
+        stream_digest, stream_s, stream_peak = measure(canonical_hash, ssot)
+        assert flat_digest == stream_digest
+        print(f"{size_mb:>6.1f} MB  canonicalize: {flat_s * 1000:8.1f} ms  peak {flat_peak / 2**20:7.2f} MiB   "
+              f"streaming: {stream_s * 1000:8.1f} ms  peak {stream_peak / 2**20:7.2f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Benchmark the content-addressed SSOT store: save, dedupe, fetch-by-hash and
+history listing throughput over thousands of versions.
+
+Usage:
+    python src/sys/benchmarks/bench_ssot_store.py [versions] [documents]
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT))
+
+from src.ui.src.server.blueprints.ssot_store import SSOTStore
+from src.ui.src.server.blueprints.versioning import stamp_version_hash
+
+def make_version(doc: int, revision: int) -> dict:
+    return stamp_version_hash({
+        "meta": {"app_name": f"app-{doc}", "stage": "build", "_created_at_ms": 1700000000000},
+        "doctrine": {"unique_id": f"shq-03-imo-{doc:04d}", "process_id": f"shq.03.imo.V1.{doc:04d}.build",
+                     "schema_version": "HEIR/1.0"},
+        "buckets": {bucket: {"stages": [{"key": f"{bucket}-{i}", "fields": {"rev": revision if i == 0 else 0,
+                                                                             "notes": "lorem ipsum " * 20}}
+                                        for i in range(12)]}
+                    for bucket in ("input", "middle", "output")},
+    })
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:10.0f}/s  ({seconds * 1000 / count:.3f} ms each)"
+
+def main():
+    versions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    documents = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    payloads = [make_version(i % documents, i // documents) for i in range(versions)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SSOTStore(tmp)
+
+        start = time.perf_counter()
+        for ssot in payloads:
+            store.put(ssot)
+        print(f"save (new)        {rate(versions, time.perf_counter() - start)}")
+
+        # Re-saving each document's current version: blob exists, no new history row
+        unchanged = payloads[-documents:] * (versions // documents)
+        start = time.perf_counter()
+        for ssot in unchanged:
+            store.put(ssot)
+        print(f"save (unchanged)  {rate(len(unchanged), time.perf_counter() - start)}")
+
+        hashes = [ssot["doctrine"]["blueprint_version_hash"] for ssot in payloads]
+        random.Random(0).shuffle(hashes)
+        start = time.perf_counter()
+        for version_hash in hashes:
+            store.get(version_hash)
+        print(f"fetch by hash     {rate(versions, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        for i in range(1000):
+            store.history(unique_id=f"shq-03-imo-{i % documents:04d}", limit=20)
+        print(f"history (20)      {rate(1000, time.perf_counter() - start)}")
+
+        stats = store.stats()
+        print(f"stored {stats['blobs']} blobs / {stats['versions']} versions: "
+              f"{stats['bytes'] / 2**20:.1f} MiB JSON -> {stats['stored_bytes'] / 2**20:.1f} MiB on disk")
+        store.close()
+
+if __name__ == "__main__":
+    main()
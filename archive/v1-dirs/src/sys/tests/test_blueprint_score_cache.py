@@ -0,0 +1,76 @@
+"""Tests for in-process blueprint scoring and the manifest-hash cache"""
+import json
+from pathlib import Path
+
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.blueprints.scoring import ScoreCache
+
+TOOLS_DIR = Path(__file__).parent.parent / "tools"
+
+MANIFEST = {
+    "process": "demo",
+    "buckets": {
+        "input": {"stages": [{"key": "intake", "title": "Intake", "required_fields": ["source"], "fields": {"source": "api"}}]},
+        "middle": {"stages": [{"key": "enrich", "title": "Enrich", "required_fields": ["rules"], "fields": {}}]},
+        "output": {"stages": []},
+    },
+}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump(MANIFEST))
+    monkeypatch.setattr(main, "BLUEPRINTS_DIR", tmp_path)
+    monkeypatch.setattr(main, "TOOLS_DIR", TOOLS_DIR)
+    monkeypatch.setattr(main, "_score_cache", None)
+    return TestClient(main.app)
+
+def test_score_miss_then_hit(client, tmp_path):
+    r1 = client.post("/blueprints/demo/score")
+    assert r1.status_code == 200
+    assert r1.headers["X-Score-Cache"] == "miss"
+    assert r1.json()["overall"] == {"done": 1, "total": 2, "percent": 50}
+    assert json.loads((tmp_path / "demo" / "progress.json").read_text()) == r1.json()
+
+    r2 = client.post("/blueprints/demo/score")
+    assert r2.headers["X-Score-Cache"] == "hit"
+    assert r2.json() == r1.json()
+
+def test_score_rescored_when_manifest_changes(client, tmp_path):
+    client.post("/blueprints/demo/score")
+    edited = json.loads(json.dumps(MANIFEST))
+    edited["buckets"]["middle"]["stages"][0]["fields"]["rules"] = "v1"
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump(edited))
+
+    r = client.post("/blueprints/demo/score")
+    assert r.headers["X-Score-Cache"] == "miss"
+    assert r.json()["overall"]["percent"] == 100
+
+def test_score_hit_restores_deleted_progress(client, tmp_path):
+    r1 = client.post("/blueprints/demo/score")
+    (tmp_path / "demo" / "progress.json").unlink()
+
+    r2 = client.post("/blueprints/demo/score")
+    assert r2.headers["X-Score-Cache"] == "hit"
+    assert json.loads((tmp_path / "demo" / "progress.json").read_text()) == r1.json()
+
+def test_score_missing_manifest(client):
+    r = client.post("/blueprints/nope/score")
+    assert r.status_code == 404
+
+def test_score_cache_lru_eviction():
+    calls = []
+    cache = ScoreCache(lambda m, slug: calls.append(slug) or {"slug": slug}, max_entries=2)
+    for slug in ("a", "b", "a", "c", "a", "b"):
+        cache.score_bytes(slug, b"process: x\n")
+    # "b" was evicted when "c" arrived, "a" stayed hot
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.stats()["entries"] == 2
+
+def test_default_tools_dir_holds_the_scorer():
+    assert main.TOOLS_DIR.resolve() == TOOLS_DIR.resolve()
+    assert (main.TOOLS_DIR / "blueprint_score.py").exists()
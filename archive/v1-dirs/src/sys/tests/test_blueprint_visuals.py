@@ -0,0 +1,69 @@
+"""Tests for in-process Mermaid rendering, disk sync and ETag/304 handling"""
+from pathlib import Path
+
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+
+TOOLS_DIR = Path(__file__).parent.parent / "tools"
+
+MANIFEST = {
+    "process": "demo",
+    "buckets": {
+        "input": {"stages": [{"key": "intake", "title": "Intake", "kind": "api", "required_fields": ["source"], "fields": {"source": "api"}}]},
+        "middle": {"stages": [{"key": "enrich", "title": "Enrich", "kind": "fn", "required_fields": ["rules"], "fields": {}}]},
+        "output": {"stages": []},
+    },
+}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump(MANIFEST))
+    monkeypatch.setattr(main, "BLUEPRINTS_DIR", tmp_path)
+    monkeypatch.setattr(main, "TOOLS_DIR", TOOLS_DIR)
+    monkeypatch.setattr(main, "_score_cache", None)
+    monkeypatch.setattr(main, "_visual_cache", None)
+    return TestClient(main.app)
+
+def test_visuals_written_once(client, tmp_path):
+    r1 = client.post("/blueprints/demo/visuals")
+    assert r1.status_code == 200
+    data = r1.json()
+    assert sorted(data["written"]) == ["ladder_input.mmd", "ladder_middle.mmd", "ladder_output.mmd", "tree_overview.mmd"]
+    assert (tmp_path / "demo" / "ladder_middle.mmd").read_text() == data["diagrams"]["ladder_middle.mmd"]
+    assert ":::todo" in data["diagrams"]["ladder_middle.mmd"]
+
+    r2 = client.post("/blueprints/demo/visuals")
+    assert r2.json()["written"] == []
+    assert r2.json()["etags"] == data["etags"]
+
+def test_only_changed_bucket_rewritten(client, tmp_path):
+    client.post("/blueprints/demo/visuals")
+    edited = yaml.safe_load(yaml.safe_dump(MANIFEST))
+    edited["buckets"]["middle"]["stages"][0]["fields"]["rules"] = "v1"
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump(edited))
+
+    r = client.post("/blueprints/demo/visuals")
+    assert sorted(r.json()["written"]) == ["ladder_middle.mmd", "tree_overview.mmd"]
+
+def test_get_visual_etag_304(client):
+    r1 = client.get("/blueprints/demo/visuals/tree_overview.mmd")
+    assert r1.status_code == 200
+    assert r1.text.startswith("flowchart LR")
+    etag = r1.headers["ETag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+
+    r2 = client.get("/blueprints/demo/visuals/tree_overview", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    assert r2.headers["ETag"] == etag
+
+def test_get_visual_unknown(client):
+    assert client.get("/blueprints/demo/visuals/ladder_nope.mmd").status_code == 404
+    assert client.get("/blueprints/missing/visuals/tree_overview.mmd").status_code == 404
+
+def test_get_visual_writes_nothing(client, tmp_path):
+    assert client.get("/blueprints/demo/visuals/ladder_middle.mmd").status_code == 200
+    assert sorted(p.name for p in (tmp_path / "demo").iterdir()) == ["manifest.yaml"]
@@ -0,0 +1,39 @@
+"""Tests for the doctrine unique_id allocator"""
+import re
+import threading
+
+from src.server.blueprints.ids import IdAllocator, ensure_ids, generate_unique_id
+
+UNIQUE_ID = re.compile(r"shq-03-imo-\d{8}-\d{6}-[A-Z2-7]{16}")
+
+def test_same_millisecond_saves_get_distinct_ids():
+    ssot = {"meta": {"app_name": "IMO", "_created_at_ms": 1700000000000}}
+    first, second = generate_unique_id(ssot), generate_unique_id(ssot)
+    assert first != second
+    assert UNIQUE_ID.fullmatch(first) and first.startswith("shq-03-imo-20231114-221320-")
+    assert ensure_ids(ssot)["doctrine"]["unique_id"] != ensure_ids(ssot)["doctrine"]["unique_id"]
+
+def test_no_collisions_in_one_million_ids_per_second():
+    allocator = IdAllocator()
+    ids = allocator.mint_many(1_000_000, ts_ms=1700000000000)
+    assert len(set(ids)) == len(ids) == 1_000_000
+    assert all(UNIQUE_ID.fullmatch(i) for i in ids[:1000])
+
+def test_concurrent_minting_is_unique():
+    allocator = IdAllocator()
+    minted = []
+
+    def worker():
+        batch = [allocator.mint(1700000000000) for _ in range(2000)] + allocator.mint_many(5000, 1700000000000)
+        minted.extend(batch)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(minted)) == len(minted) == 8 * 7000
+
+def test_allocators_differ_by_process_entropy():
+    a, b = IdAllocator(), IdAllocator()
+    assert a.mint(1700000000000)[:-8] != b.mint(1700000000000)[:-8]
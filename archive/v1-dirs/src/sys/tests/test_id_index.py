@@ -0,0 +1,63 @@
+"""Tests for parsing and indexing PRC/RUN/STG/ART identifiers"""
+import json
+from datetime import datetime
+
+import pytest
+
+from src.sys.tools.ids import IdIndex, artifact_id, parse_id, process_id, run_id, stage_id
+
+PID = process_id("demo", "1.2.0", "seed", datetime(2025, 1, 2))
+RID = run_id(PID, datetime(2025, 1, 3, 4, 5, 6))
+SID = stage_id(PID, "input", "intake")
+AID = artifact_id(SID, "fingerprint")
+
+def test_parse_round_trips_fields():
+    run, stage, artifact = parse_id(RID), parse_id(SID), parse_id(AID)
+    assert [parse_id(i).kind for i in (PID, RID, SID, AID)] == ["PRC", "RUN", "STG", "ART"]
+    assert {p.process_id for p in (parse_id(PID), run, stage, artifact)} == {PID}
+    assert (run.slug, run.semver, run.date, run.run_date) == ("DEMO", "1.2.0", "20250102", "20250103")
+    assert (artifact.bucket, artifact.stage_key, artifact.stage_id) == ("INPUT", "intake", SID)
+    assert artifact.short == AID.rsplit("::", 1)[1]
+
+@pytest.mark.parametrize("raw", ["", "XYZ::a", "PRC::A::v1", "RUN::PRC::A::v1::2025::x::y", f"ART::{PID}::a::b::c::d::e"])
+def test_parse_rejects_malformed(raw):
+    with pytest.raises(ValueError):
+        parse_id(raw)
+
+def test_index_lookups_without_scanning(tmp_path):
+    other = process_id("other", "2.0.0", "seed", datetime(2025, 2, 1))
+    log = tmp_path / "sidecar.ndjson"
+    log.write_text("\n".join(json.dumps({"type": "stage", "tags": {"artifact": a, "run": r}}) for a, r in [
+        (AID, RID),
+        (artifact_id(stage_id(other, "middle", "enrich"), "fp"), run_id(other, datetime(2025, 2, 2))),
+    ]) + "\nnot json at all\n")
+
+    index = IdIndex()
+    assert index.load_ndjson(log) == 8  # each ART/RUN also registers its stage and process
+    assert index.add_many([AID, "garbage"]) == 0
+
+    assert [p.raw for p in index.processes(slug="demo")] == [PID]
+    assert [p.raw for p in index.processes(date="20250201")] == [other]
+    assert [r.raw for r in index.runs(date="20250103")] == [RID]
+    assert [r.raw for r in index.runs(process_id=PID)] == [RID]
+    assert [s.raw for s in index.stages(bucket="input")] == [SID]
+    assert [s.process_id for s in index.stages(stage_key="enrich")] == [other]
+    assert [a.raw for a in index.artifacts(stage_id=SID)] == [AID]
+    assert len(index.artifacts()) == 2 and index.artifacts(process_id=PID)[0].raw == AID
+    assert index.get(SID).bucket == "INPUT"
+
+def test_reverse_lookups_and_sealed_segments(tmp_path, monkeypatch):
+    from src.ai.packages.sidecar.segments import SegmentLog
+    log = SegmentLog(tmp_path, max_bytes=256, block_bytes=128)
+    for i in range(20):
+        aid = artifact_id(stage_id(PID, "output", f"k{i % 2}"), f"fp{i}")
+        log.append(json.dumps({"type": "stage", "tags": {"artifact": aid}, "ts": i}).encode() + b"\n")
+    log.close()
+    assert any(s.compressed for s in log.segments())
+
+    index = IdIndex()
+    assert index.load_ndjson(log) == 23
+    monkeypatch.setattr(index, "_nodes", None)  # no tree walk without a process_id
+    assert {s.stage_key for s in index.stages(stage_key="k1", bucket="output")} == {"k1"}
+    assert index.stages(stage_key="k1", bucket="input") == []
+    assert len(index.artifacts()) == 20
@@ -0,0 +1,93 @@
+"""Tests for the /llm/batch fan-out endpoint"""
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.infra.llm import LLMClient
+from src.server.infra.llm_cache import LLMResponseCache
+from src.server.infra.singleflight import SingleFlight
+
+client = TestClient(main.app)
+
+def ndjson(text):
+    return [json.loads(line) for line in text.strip().split("\n")]
+
+@pytest.fixture
+def provider():
+    state = {"active": 0, "peak": 0}
+
+    async def handler(request):
+        body = json.loads(request.content)
+        prompt = body["messages"][-1]["content"]
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        # later prompts finish first so completion order differs from input order
+        await asyncio.sleep(0.05 * (5 - int(prompt[-1])) if prompt[-1].isdigit() else 0)
+        state["active"] -= 1
+        if prompt == "fail":
+            return httpx.Response(500, json={"error": {"message": "boom"}})
+        return httpx.Response(200, json={"choices": [{"message": {"content": prompt.upper()}}]})
+
+    with patch.object(main, "_llm_client", LLMClient(transport=httpx.MockTransport(handler))), \
+         patch.object(main, "_llm_cache", LLMResponseCache(ttl=0, disk_dir="")), \
+         patch.object(main, "llm_flight", SingleFlight()), \
+         patch.dict("os.environ", {"OPENAI_API_KEY": "sk-test", "LLM_BATCH_CONCURRENCY": "2"}, clear=True):
+        yield state
+
+def test_batch_json_array_completion_order(provider):
+    r = client.post("/llm/batch", json=[{"prompt": f"p{i}"} for i in range(5)])
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = ndjson(r.text)
+    items, summary = lines[:-1], lines[-1]
+    assert summary == {"done": True, "total": 5, "failed": 0}
+    assert sorted(i["index"] for i in items) == [0, 1, 2, 3, 4]
+    assert {i["index"]: i["result"]["text"] for i in items}[3] == "P3"
+    assert [i["index"] for i in items] != [0, 1, 2, 3, 4]
+    assert provider["peak"] <= 2
+
+def test_batch_partial_failures(provider):
+    r = client.post("/llm/batch", json={"requests": [{"prompt": "ok"}, {"prompt": "fail"}, {}, "nope"]})
+    lines = ndjson(r.text)
+    by_index = {l["index"]: l for l in lines[:-1]}
+    assert by_index[0]["status"] == 200
+    assert by_index[1]["status"] == 502 and "boom" in by_index[1]["error"]
+    assert by_index[2]["status"] == 400 and by_index[2]["error"] == "Prompt is required"
+    assert by_index[3]["status"] == 400
+    assert lines[-1] == {"done": True, "total": 4, "failed": 3}
+
+def test_batch_ndjson_body(provider):
+    body = b'{"prompt": "a1"}\n\nnot json\n{"prompt": "a2"}'
+    r = client.post("/llm/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+    lines = ndjson(r.text)
+    by_index = {l["index"]: l for l in lines[:-1]}
+    assert by_index[0]["result"]["text"] == "A1"
+    assert by_index[1]["status"] == 400 and "Invalid JSON" in by_index[1]["error"]
+    assert by_index[2]["result"]["text"] == "A2"
+
+def test_batch_ndjson_line_split_across_chunks(provider):
+    body = b'{"prompt": "b1", "system": "' + b"x" * 20000 + b'"}\n{"prompt": "b2"}'
+
+    def chunks():
+        for start in range(0, len(body), 7):
+            yield body[start:start + 7]
+
+    r = client.post("/llm/batch", content=chunks(), headers={"Content-Type": "application/x-ndjson"})
+    by_index = {l["index"]: l for l in ndjson(r.text)[:-1]}
+    assert [by_index[i]["result"]["text"] for i in (0, 1)] == ["B1", "B2"]
+
+def test_batch_rejects_non_array(provider):
+    assert client.post("/llm/batch", json={"prompt": "x"}).status_code == 400
+
+def test_batch_over_limit_rejected_before_dispatch(provider):
+    with patch.dict("os.environ", {"LLM_BATCH_MAX_ITEMS": "2"}):
+        assert client.post("/llm/batch", json=[{"prompt": f"p{i}"} for i in range(3)]).status_code == 413
+        body = b"".join(b'{"prompt": "p%d"}\n' % i for i in range(3))
+        r = client.post("/llm/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+        assert r.status_code == 413
+    assert provider["peak"] == 0
@@ -0,0 +1,82 @@
+"""Tests for the /llm response cache"""
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.infra.llm import LLMClient
+from src.server.infra.llm_cache import LLMResponseCache, request_key
+
+client = TestClient(main.app)
+
+@pytest.fixture
+def provider_calls(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"content": [{"text": f"answer {len(calls)}"}]})
+
+    with patch.object(main, "_llm_client", LLMClient(transport=httpx.MockTransport(handler))), \
+         patch.object(main, "_llm_cache", LLMResponseCache(disk_dir=str(tmp_path))), \
+         patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-ant-test"}, clear=True):
+        yield calls
+
+def test_repeat_request_served_from_cache(provider_calls):
+    body = {"prompt": "validate", "system": "be strict", "max_tokens": 64}
+    r1 = client.post("/llm", json=body)
+    r2 = client.post("/llm", json=body)
+    assert r1.headers["X-LLM-Cache"] == "miss"
+    assert r2.headers["X-LLM-Cache"] == "hit"
+    assert r2.headers["X-LLM-Cache-Tier"] == "memory"
+    assert r1.json() == r2.json() == {"text": "answer 1", "model": "claude-3-5-sonnet-20240620", "provider": "anthropic"}
+    assert len(provider_calls) == 1
+
+def test_default_model_and_explicit_model_share_key(provider_calls):
+    client.post("/llm", json={"prompt": "p"})
+    r = client.post("/llm", json={"prompt": "p", "model": "claude-3-5-sonnet-20240620"})
+    assert r.headers["X-LLM-Cache"] == "hit"
+
+def test_bypass_refreshes_entry(provider_calls):
+    client.post("/llm", json={"prompt": "p"})
+    r = client.post("/llm", json={"prompt": "p", "cache": False})
+    assert r.headers["X-LLM-Cache"] == "bypass"
+    assert r.json()["text"] == "answer 2"
+    r = client.post("/llm", json={"prompt": "p"}, headers={"Cache-Control": "no-cache"})
+    assert r.json()["text"] == "answer 3"
+    assert client.post("/llm", json={"prompt": "p"}).json()["text"] == "answer 3"
+
+def test_errors_not_cached(tmp_path):
+    handler = lambda request: httpx.Response(500, json={"error": {"message": "boom"}})
+    with patch.object(main, "_llm_client", LLMClient(transport=httpx.MockTransport(handler))), \
+         patch.object(main, "_llm_cache", LLMResponseCache(disk_dir="")), \
+         patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-ant-test"}, clear=True):
+        assert client.post("/llm", json={"prompt": "p"}).status_code == 502
+        assert main._llm_cache.stats()["entries"] == 0
+
+def test_lru_byte_bound_and_ttl():
+    cache = LLMResponseCache(max_bytes=100, ttl=60, disk_dir="")
+    asyncio.run(cache.put("a", {"text": "x" * 30}))
+    asyncio.run(cache.put("b", {"text": "y" * 30}))
+    assert asyncio.run(cache.get("a")) is not None  # a is now most recent
+    asyncio.run(cache.put("c", {"text": "z" * 30}))
+    assert asyncio.run(cache.get("b")) is None
+    assert asyncio.run(cache.get("a")) is not None
+    assert cache.bytes <= 100 and cache.evictions == 1
+
+    with patch("src.server.infra.llm_cache.time.time", return_value=time.time() + 120):
+        assert asyncio.run(cache.get("a")) is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    key = request_key("openai", "gpt-4o-mini", None, "p", False, 1024)
+    asyncio.run(LLMResponseCache(disk_dir=str(tmp_path)).put(key, {"text": "persisted"}))
+
+    fresh = LLMResponseCache(disk_dir=str(tmp_path))
+    data, tier = asyncio.run(fresh.get(key))
+    assert tier == "disk"
+    assert b"persisted" in data
+    assert asyncio.run(fresh.get(key))[1] == "memory"
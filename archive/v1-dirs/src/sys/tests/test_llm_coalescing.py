@@ -0,0 +1,62 @@
+"""Tests for single-flight coalescing of identical /llm requests"""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import src.server.main as main
+from src.server.infra.llm import LLMClient
+from src.server.infra.llm_cache import LLMResponseCache
+from src.server.infra.singleflight import SingleFlight
+
+def run_concurrently(bodies):
+    async def go():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await asyncio.gather(*[c.post("/llm", json=b) for b in bodies])
+    return asyncio.run(go())
+
+@pytest.fixture
+def provider():
+    state = {"calls": 0, "status": 200}
+
+    async def handler(request):
+        state["calls"] += 1
+        await asyncio.sleep(0.1)
+        if state["status"] != 200:
+            return httpx.Response(state["status"], json={"error": {"message": "upstream down"}})
+        return httpx.Response(200, json={"content": [{"text": f"answer {state['calls']}"}]})
+
+    with patch.object(main, "_llm_client", LLMClient(transport=httpx.MockTransport(handler))), \
+         patch.object(main, "_llm_cache", LLMResponseCache(ttl=0, disk_dir="")), \
+         patch.object(main, "llm_flight", SingleFlight()), \
+         patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-ant-test"}, clear=True):
+        yield state
+
+def test_identical_requests_share_one_call(provider):
+    responses = run_concurrently([{"prompt": "same"}] * 5)
+    assert provider["calls"] == 1
+    assert {r.json()["text"] for r in responses} == {"answer 1"}
+    assert sum(r.headers.get("X-LLM-Coalesced") == "true" for r in responses) == 4
+    assert main.llm_flight.stats() == {"calls": 1, "coalesced": 4, "inflight": 0}
+
+def test_provider_inference_resolves_to_same_key(provider):
+    # explicit provider, model-name inference and the single-key default all land on anthropic/default model
+    bodies = [
+        {"prompt": "same", "provider": "anthropic"},
+        {"prompt": "same", "model": "claude-3-5-sonnet-20240620"},
+        {"prompt": "same"},
+    ]
+    run_concurrently(bodies)
+    assert provider["calls"] == 1
+
+def test_distinct_requests_not_coalesced(provider):
+    run_concurrently([{"prompt": "a"}, {"prompt": "b"}, {"prompt": "a", "max_tokens": 10}])
+    assert provider["calls"] == 3
+
+def test_error_shared_by_all_waiters(provider):
+    provider["status"] = 500
+    responses = run_concurrently([{"prompt": "same"}] * 3)
+    assert provider["calls"] == 1
+    assert all(r.status_code == 502 and "upstream down" in r.json()["error"] for r in responses)
@@ -11,12 +11,27 @@ checksum: f2f8a187
 """Tests for concurrent provider LLM endpoint functionality"""
 import pytest
 import json
-from unittest.mock import patch, Mock
+import httpx
+from contextlib import contextmanager
+from unittest.mock import patch
 from fastapi.testclient import TestClient
+import src.server.main as main
 from src.server.main import app
+from src.server.infra.llm import LLMClient
+from src.server.infra.llm_cache import LLMResponseCache
+from src.server.infra.llm_routing import LatencyRouter
 
 client = TestClient(app)
 
+@contextmanager
+def mock_provider(status_code, payload):
+    """Route provider calls through an httpx mock transport, with caching and routing history reset"""
+    transport = httpx.MockTransport(lambda request: httpx.Response(status_code, json=payload))
+    with patch.object(main, "_llm_client", LLMClient(transport=transport)), \
+         patch.object(main, "_llm_cache", LLMResponseCache(ttl=0, disk_dir="")), \
+         patch.object(main, "llm_router", LatencyRouter()):
+        yield
+
 def test_llm_endpoint_missing_prompt():
     """Test LLM endpoint with missing prompt"""
     response = client.post("/llm", json={})
@@ -94,18 +109,11 @@ def test_provider_selection_validation():
         assert response.status_code == 400
         assert "OpenAI API key not configured" in response.json()["error"]
 
-@patch('requests.post')
-def test_llm_endpoint_anthropic_success(mock_post):
+def test_llm_endpoint_anthropic_success():
     """Test successful Anthropic API call"""
     # Mock successful Anthropic response
-    mock_response = Mock()
-    mock_response.ok = True
-    mock_response.json.return_value = {
-        "content": [{"text": "Test response"}]
-    }
-    mock_post.return_value = mock_response
-    
-    with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'sk-ant-test'}):
+    with mock_provider(200, {"content": [{"text": "Test response"}]}), \
+         patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'sk-ant-test'}):
         response = client.post("/llm", json={
             "prompt": "test prompt",
             "system": "test system"
@@ -117,21 +125,18 @@ def test_llm_endpoint_anthropic_success(mock_post):
         assert data["provider"] == "anthropic"
         assert "model" in data
 
-@patch('requests.post')
-def test_llm_endpoint_anthropic_json_mode(mock_post):
+def test_llm_endpoint_anthropic_json_mode():
     """Test Anthropic API call with JSON mode"""
     # Mock tool use response
-    mock_response = Mock()
-    mock_response.ok = True
-    mock_response.json.return_value = {
+    tool_use = {
         "content": [{
             "type": "tool_use",
             "input": {"response": {"test": "data"}}
         }]
     }
-    mock_post.return_value = mock_response
     
-    with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'sk-ant-test'}):
+    with mock_provider(200, tool_use), \
+         patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'sk-ant-test'}):
         response = client.post("/llm", json={
             "prompt": "test prompt",
             "json": True
@@ -142,20 +147,17 @@ def test_llm_endpoint_anthropic_json_mode(mock_post):
         assert data["json"] == {"test": "data"}
         assert data["provider"] == "anthropic"
 
-@patch('requests.post')
-def test_llm_endpoint_openai_success(mock_post):
+def test_llm_endpoint_openai_success():
     """Test successful OpenAI API call"""
     # Mock successful OpenAI response
-    mock_response = Mock()
-    mock_response.ok = True
-    mock_response.json.return_value = {
+    completion = {
         "choices": [{
             "message": {"content": "Test response"}
         }]
     }
-    mock_post.return_value = mock_response
     
-    with patch.dict('os.environ', {'OPENAI_API_KEY': 'sk-test', 'LLM_PROVIDER': 'openai'}):
+    with mock_provider(200, completion), \
+         patch.dict('os.environ', {'OPENAI_API_KEY': 'sk-test', 'LLM_PROVIDER': 'openai'}):
         response = client.post("/llm", json={
             "prompt": "test prompt"
         })
@@ -165,21 +167,57 @@ def test_llm_endpoint_openai_success(mock_post):
         assert data["text"] == "Test response"
         assert data["provider"] == "openai"
 
-@patch('requests.post')
-def test_llm_endpoint_api_error(mock_post):
+def test_llm_endpoint_api_error():
     """Test API error handling"""
     # Mock API error
-    mock_response = Mock()
-    mock_response.ok = False
-    mock_response.json.return_value = {
-        "error": {"message": "API Error"}
-    }
-    mock_post.return_value = mock_response
-    
-    with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'sk-ant-test'}):
+    with mock_provider(400, {"error": {"message": "API Error"}}), \
+         patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'sk-ant-test'}):
         response = client.post("/llm", json={
             "prompt": "test prompt"
         })
         
         assert response.status_code == 502
-        assert "API Error" in response.json()["error"]
\ No newline at end of file
+        assert "API Error" in response.json()["error"]
+
+def test_llm_endpoint_concurrent_requests_do_not_serialize():
+    """Slow provider calls overlap instead of blocking the event loop"""
+    import asyncio
+    import time
+
+    async def slow_provider(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"content": [{"text": "ok"}]})
+
+    async def fire(n):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await asyncio.gather(*[c.post("/llm", json={"prompt": f"p{i}"}) for i in range(n)])
+
+    with patch.object(main, "_llm_client", LLMClient(transport=httpx.MockTransport(slow_provider))), \
+         patch.object(main, "_llm_cache", LLMResponseCache(ttl=0, disk_dir="")), \
+         patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'sk-ant-test'}, clear=True):
+        start = time.perf_counter()
+        responses = asyncio.run(fire(10))
+        elapsed = time.perf_counter() - start
+
+    assert all(r.status_code == 200 for r in responses)
+    assert elapsed < 1.0  # 10 x 0.2s would take 2s if serialized
+
+def test_llm_client_closes_pools_of_previous_loop():
+    """A pool built on a loop that is gone is closed when a new loop takes over"""
+    import asyncio
+
+    llm = LLMClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={})))
+
+    async def pool():
+        return llm.client("openai")
+
+    async def replace_and_close():
+        fresh = llm.client("openai")
+        await llm.aclose()
+        return fresh
+
+    first = asyncio.run(pool())
+    fresh = asyncio.run(replace_and_close())
+    assert fresh is not first
+    assert first.is_closed and fresh.is_closed
@@ -0,0 +1,121 @@
+"""Tests for latency-aware provider routing and hedged /llm requests"""
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.infra.llm import LLMClient
+from src.server.infra.llm_cache import LLMResponseCache
+from src.server.infra.llm_routing import LatencyRouter
+from src.server.infra.singleflight import SingleFlight
+
+client = TestClient(main.app)
+
+A = ("anthropic", "claude-3-5-sonnet-20240620")
+O = ("openai", "gpt-4o-mini")
+
+def test_router_keeps_static_choice_until_measured():
+    router = LatencyRouter(alpha=0.5, margin=0.2)
+    assert router.choose([O, A]) == O
+    router.record(*A, 100, ok=True)
+    assert router.choose([O, A]) == O  # default unmeasured: no reason to move
+    router.record(*O, 110, ok=True)
+    assert router.choose([O, A]) == O  # within margin
+    router.record(*O, 500, ok=True)
+    assert router.choose([O, A]) == A
+
+def test_router_skips_unhealthy_until_cooldown():
+    router = LatencyRouter(alpha=1.0, error_threshold=0.5, cooldown=60)
+    router.record(*O, 10, ok=False)
+    assert not router.healthy(*O)
+    assert router.choose([O, A]) == A
+    with patch("src.server.infra.llm_routing.time.monotonic", return_value=time.monotonic() + 61):
+        assert router.healthy(*O)
+
+def test_hedge_delay_tracks_p95():
+    router = LatencyRouter()
+    router.hedge_default_ms = 1500
+    assert router.hedge_delay(*A) == 1.5
+    for ms in range(1, 101):
+        router.record(*A, ms, ok=True)
+    assert router.hedge_delay(*A) == pytest.approx(0.096)
+
+@pytest.fixture
+def providers():
+    state = {"delay": {"anthropic": 0.0, "openai": 0.0}, "calls": [], "cancelled": []}
+
+    async def handler(request):
+        provider = "anthropic" if request.url.path == "/v1/messages" else "openai"
+        state["calls"].append(provider)
+        try:
+            await asyncio.sleep(state["delay"][provider])
+        except asyncio.CancelledError:
+            state["cancelled"].append(provider)
+            raise
+        if provider == "anthropic":
+            return httpx.Response(200, json={"content": [{"text": "from anthropic"}]})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "from openai"}}]})
+
+    with patch.object(main, "_llm_client", LLMClient(transport=httpx.MockTransport(handler))), \
+         patch.object(main, "_llm_cache", LLMResponseCache(ttl=0, disk_dir="")), \
+         patch.object(main, "llm_flight", SingleFlight()), \
+         patch.object(main, "llm_router", LatencyRouter(alpha=1.0)), \
+         patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-ant", "OPENAI_API_KEY": "sk-oai",
+                                   "LLM_DEFAULT_PROVIDER": "openai"}, clear=True):
+        yield state
+
+def test_unpinned_request_routes_to_faster_provider(providers):
+    assert client.post("/llm", json={"prompt": "x"}).json()["provider"] == "openai"
+    main.llm_router.record(*O, 900, ok=True)
+    main.llm_router.record(*A, 100, ok=True)
+    assert client.post("/llm", json={"prompt": "y"}).json()["provider"] == "anthropic"
+    # pinned by provider or model: static selection wins
+    assert client.post("/llm", json={"prompt": "z", "provider": "openai"}).json()["provider"] == "openai"
+    assert client.post("/llm", json={"prompt": "z", "model": "gpt-4o-mini"}).json()["provider"] == "openai"
+
+def test_hedge_fires_after_delay_and_cancels_loser(providers):
+    providers["delay"]["openai"] = 1.0
+    main.llm_router.hedge_default_ms = 50
+    start = time.perf_counter()
+    r = client.post("/llm", json={"prompt": "x", "hedge": True})
+    assert time.perf_counter() - start < 0.8
+    assert r.json()["provider"] == "anthropic"
+    assert providers["calls"] == ["openai", "anthropic"]
+    assert main.llm_router.hedges == {"fired": 1, "won": 1}
+
+def test_hedge_win_cached_under_answering_provider(providers):
+    main.llm_router.hedge_default_ms = 50
+    main._llm_cache.ttl = 60
+
+    async def scenario():
+        providers["delay"]["openai"] = 0.5
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            hedged = asyncio.ensure_future(c.post("/llm", json={"prompt": "x", "hedge": True}))
+            await asyncio.sleep(0.01)
+            pinned = await c.post("/llm", json={"prompt": "x", "provider": "openai"})
+            return await hedged, pinned
+
+    hedged, pinned = asyncio.run(scenario())
+    assert hedged.json()["provider"] == "anthropic"
+    assert pinned.json()["provider"] == "openai"
+    providers["calls"].clear()
+    assert client.post("/llm", json={"prompt": "x", "provider": "anthropic"}).headers["X-LLM-Cache"] == "hit"
+    assert client.post("/llm", json={"prompt": "x", "provider": "openai"}).json()["text"] == "from openai"
+
+def test_hedge_not_fired_when_primary_fast(providers):
+    main.llm_router.hedge_default_ms = 500
+    r = client.post("/llm", json={"prompt": "x", "hedge": True})
+    assert r.json()["provider"] == "openai"
+    assert providers["calls"] == ["openai"]
+
+def test_routing_introspection(providers):
+    client.post("/llm", json={"prompt": "x"})
+    data = client.get("/llm/routing").json()
+    route = data["routes"]["openai/gpt-4o-mini"]
+    assert route["count"] == 1 and route["healthy"] is True
+    assert set(data["config"]) >= {"alpha", "error_threshold", "margin", "cooldown_s"}
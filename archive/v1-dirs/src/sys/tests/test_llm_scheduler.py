@@ -0,0 +1,153 @@
+"""Tests for token-bucket admission and priority lanes in front of /llm"""
+import asyncio
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.infra.llm import LLMClient
+from src.server.infra.llm_cache import LLMResponseCache
+from src.server.infra.llm_routing import LatencyRouter
+from src.server.infra.llm_scheduler import LLMScheduler, ProviderScheduler, RateLimited, TokenBucket
+from src.server.infra.singleflight import SingleFlight
+
+TOOLS_DIR = Path(__file__).parent.parent / "tools"
+
+def test_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=10, capacity=5)
+    now = bucket.updated
+    bucket.take(5, now)
+    assert bucket.wait(1, now) == pytest.approx(0.1)
+    assert bucket.wait(1, now + 0.11) == 0
+    assert bucket.wait(50, now + 10) == 0  # capped at capacity, never waits forever
+
+def test_interactive_lane_served_before_batch():
+    async def scenario():
+        scheduler = ProviderScheduler(rpm=600)  # 10 requests/s, burst of 600
+        scheduler.requests.tokens = 0
+        order = []
+
+        async def request(name, lane):
+            await scheduler.acquire(1, lane)
+            order.append(name)
+
+        batch = [asyncio.ensure_future(request(f"b{i}", "batch")) for i in range(2)]
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(request("i0", "interactive"))
+        await asyncio.gather(*batch, interactive)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["i0", "b0", "b1"]
+    assert stats["admitted"] == {"interactive": 1, "batch": 2}
+
+def test_full_queue_and_deadline_are_rejected_up_front():
+    async def scenario():
+        scheduler = ProviderScheduler(rpm=60, max_queue=1)  # 1 request/s
+        scheduler.requests.tokens = 0
+        waiting = asyncio.ensure_future(scheduler.acquire(1, "batch"))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimited):
+            await scheduler.acquire(1, "batch")
+        start = time.monotonic()
+        with pytest.raises(RateLimited) as error:
+            await scheduler.acquire(1, "interactive", deadline=time.monotonic() + 0.2)
+        assert time.monotonic() - start < 0.1
+        assert error.value.retry_after > 0.2
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == {"interactive": 1, "batch": 1}
+    assert stats["queued"] == {"interactive": 0, "batch": 0}
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    async def handler(request):
+        return httpx.Response(200, json={"content": [{"text": "ok"}]})
+
+    monkeypatch.setattr(main, "BLUEPRINTS_DIR", tmp_path)
+    monkeypatch.setattr(main, "TOOLS_DIR", TOOLS_DIR)
+    monkeypatch.setattr(main, "_score_cache", None)
+    with patch.object(main, "_llm_client", LLMClient(transport=httpx.MockTransport(handler))), \
+         patch.object(main, "_llm_cache", LLMResponseCache(ttl=0, disk_dir="")), \
+         patch.object(main, "llm_flight", SingleFlight()), \
+         patch.object(main, "llm_router", LatencyRouter()), \
+         patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-ant", "LLM_ANTHROPIC_RPM": "60"}, clear=True), \
+         patch.object(main, "llm_scheduler", LLMScheduler()):
+        yield TestClient(main.app)
+
+def test_llm_returns_429_when_deadline_cannot_be_met(provider):
+    main.llm_scheduler.provider("anthropic").requests.tokens = 0
+    r = provider.post("/llm", json={"prompt": "x", "deadline_ms": 100, "cache": False})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    assert r.json()["retry_after"] > 0.1
+
+    r = provider.post("/llm", json={"prompt": "x", "priority": "urgent"})
+    assert r.status_code == 400
+
+    stats = provider.get("/llm/stats").json()["scheduler"]
+    assert stats["providers"]["anthropic"]["rejected"]["interactive"] == 1
+
+def test_blueprint_budget_from_manifest(provider, tmp_path):
+    manifest = {"process": "demo", "universals": {"limits": {"budget_usd": 0.02}}}
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump(manifest))
+    body = {"prompt": "x", "max_tokens": 1000, "blueprint": "demo", "cache": False}
+
+    assert provider.post("/llm", json=body).status_code == 200
+    assert provider.post("/llm", json=body).status_code == 200
+    r = provider.post("/llm", json=body)
+    assert r.status_code == 429
+    assert "budget" in r.json()["error"]
+
+    batch = provider.post("/llm/batch", json=[body]).text.splitlines()
+    assert '"status": 429' in batch[0]
+
+def test_blueprint_limits_need_no_scorer(provider, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "TOOLS_DIR", tmp_path / "no-tools")
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump({"universals": {"limits": {"qps": 5}}}))
+    assert provider.post("/llm", json={"prompt": "x", "blueprint": "demo"}).status_code == 200
+
+def test_hedged_request_charges_blueprint_once(provider, tmp_path):
+    manifest = {"process": "demo", "universals": {"limits": {"budget_usd": 0.02}}}
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump(manifest))
+
+    async def hedged():
+        call = main.resolve_llm_request({"prompt": "x", "max_tokens": 1000, "provider": "anthropic"})
+        admission = main.admission_for({"blueprint": "demo"}, "interactive")
+        return await main.hedged_complete(call, call, admission)
+
+    # The primary fails at once, so the alternate runs too
+    outcomes = [main.LLMProviderError("down", "anthropic", 503), {"text": "ok", "provider": "anthropic"}]
+    with patch.object(main.LLMClient, "complete", side_effect=outcomes):
+        assert asyncio.run(hedged())["text"] == "ok"
+    # One charge of the 0.02 budget so far: one more request fits, then it is spent
+    body = {"prompt": "y", "max_tokens": 1000, "blueprint": "demo", "cache": False}
+    assert provider.post("/llm", json=body).status_code == 200
+    assert provider.post("/llm", json=body).status_code == 429
+
+def test_bad_blueprint_and_limits_are_400(provider, tmp_path):
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump({"universals": {"limits": {"qps": "fast"}}}))
+    for body in ({"blueprint": "../demo"}, {"blueprint": "demo/x"}, {"blueprint": 5},
+                 {"deadline_ms": "soon"}, {"deadline_ms": -1}, {"blueprint": "demo"}):
+        r = provider.post("/llm", json={"prompt": "x", "cache": False, **body})
+        assert r.status_code == 400, body
+    assert provider.post("/llm", json={"prompt": "x", "deadline_ms": "5000", "cache": False}).status_code == 200
+
+def test_blueprint_limits_parsed_once_per_etag(provider, tmp_path):
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "manifest.yaml").write_text(yaml.safe_dump({"universals": {"limits": {"qps": 5}}}))
+    with patch.object(main.yaml, "safe_load", wraps=yaml.safe_load) as parse:
+        assert main.blueprint_limits("demo") == main.blueprint_limits("demo") == {"qps": 5.0, "budget_usd": None}
+    assert parse.call_count == 1
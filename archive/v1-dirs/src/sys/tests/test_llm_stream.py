@@ -0,0 +1,110 @@
+"""Tests for /llm SSE streaming mode"""
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.infra.llm import LLMClient
+from src.server.infra.llm_cache import LLMResponseCache
+
+client = TestClient(main.app)
+
+def sse_body(events):
+    return "".join(f"data: {json.dumps(e) if not isinstance(e, str) else e}\n\n" for e in events).encode()
+
+def parse_sse(text):
+    frames = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        frames.append((lines["event"], json.loads(lines["data"])))
+    return frames
+
+@pytest.fixture
+def provider():
+    state = {"status": 200, "body": b""}
+
+    def handler(request):
+        state["request"] = json.loads(request.content)
+        return httpx.Response(state["status"], content=state["body"],
+                              headers={"content-type": "text/event-stream"})
+
+    with patch.object(main, "_llm_client", LLMClient(transport=httpx.MockTransport(handler))), \
+         patch.object(main, "_llm_cache", LLMResponseCache(disk_dir="")), \
+         patch.dict("os.environ", {"ANTHROPIC_API_KEY": "sk-ant-test", "OPENAI_API_KEY": "sk-test"}, clear=True):
+        yield state
+
+def test_anthropic_text_stream(provider):
+    provider["body"] = sse_body([
+        {"type": "message_start", "message": {}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "Hel"}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "lo"}},
+        {"type": "message_stop"},
+    ])
+    r = client.post("/llm", json={"prompt": "hi", "provider": "anthropic", "stream": True})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    assert provider["request"]["stream"] is True
+
+    frames = parse_sse(r.text)
+    assert [name for name, _ in frames] == ["start", "delta", "delta", "done"]
+    done = frames[-1][1]
+    assert done["text"] == "Hello" and done["provider"] == "anthropic"
+    assert done["ttft_ms"] is not None
+    assert main.get_llm_client().ttft.summary()["anthropic"]["count"] == 1
+
+def test_openai_json_stream_emits_parsed_object(provider):
+    provider["body"] = sse_body([
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": '{"ok":'}}]},
+        {"choices": [{"delta": {"content": " true}"}}]},
+        "[DONE]",
+    ])
+    r = client.post("/llm", json={"prompt": "hi", "provider": "openai", "json": True, "stream": True})
+    frames = parse_sse(r.text)
+    assert [f[1]["text"] for f in frames if f[0] == "delta"] == ['{"ok":', " true}"]
+    assert frames[-1][1]["json"] == {"ok": True}
+
+def test_anthropic_tool_json_stream(provider):
+    provider["body"] = sse_body([
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "input_json_delta", "partial_json": '{"response": {"a"'}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "input_json_delta", "partial_json": ": 1}}"}},
+    ])
+    r = client.post("/llm", json={"prompt": "hi", "provider": "anthropic", "json": True, "stream": True})
+    assert parse_sse(r.text)[-1][1]["json"] == {"a": 1}
+
+def test_stream_result_cached_and_replayed(provider):
+    provider["body"] = sse_body([{"choices": [{"delta": {"content": "cached"}}]}, "[DONE]"])
+    client.post("/llm", json={"prompt": "again", "provider": "openai", "stream": True})
+    provider["body"] = b""
+
+    r = client.post("/llm", json={"prompt": "again", "provider": "openai", "stream": True})
+    assert r.headers["X-LLM-Cache"] == "hit"
+    assert parse_sse(r.text)[-1][1]["text"] == "cached"
+    assert client.post("/llm", json={"prompt": "again", "provider": "openai"}).json()["text"] == "cached"
+
+def test_stream_upstream_error_is_502(provider):
+    provider["status"] = 429
+    provider["body"] = json.dumps({"error": {"message": "rate limited"}}).encode()
+    r = client.post("/llm", json={"prompt": "hi", "provider": "anthropic", "stream": True})
+    assert r.status_code == 502
+    assert "rate limited" in r.json()["error"]
+
+def test_midstream_error_event(provider):
+    provider["body"] = sse_body([
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "par"}},
+        {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+    ])
+    r = client.post("/llm", json={"prompt": "hi", "provider": "anthropic", "stream": True})
+    frames = parse_sse(r.text)
+    assert frames[-1] == ("error", {"error": "Overloaded", "provider": "anthropic"})
+
+def test_tool_json_without_response_is_error_event(provider):
+    provider["body"] = sse_body([
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "input_json_delta", "partial_json": '{"answer": 1}'}},
+    ])
+    r = client.post("/llm", json={"prompt": "hi", "provider": "anthropic", "json": True, "stream": True})
+    frames = parse_sse(r.text)
+    assert frames[-1] == ("error", {"error": 'Anthropic tool_use result has no "response" field', "provider": "anthropic"})
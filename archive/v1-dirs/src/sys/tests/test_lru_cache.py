@@ -0,0 +1,21 @@
+"""Tests for the shared LRU map behind the in-process caches"""
+from src.server.infra.lru import LRUCache
+
+def test_entry_bound_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 3, "misses": 1}
+
+def test_byte_bound_and_predicate():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"123456")
+    assert len(cache) == 1 and cache.bytes == 6 and cache.evictions == 1
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None and cache.bytes == 6
+    assert cache.get("b", lambda v: v.startswith(b"9")) is None
+    assert len(cache) == 0 and cache.bytes == 0
@@ -0,0 +1,59 @@
+"""Tests for manifest ETag caching and If-Match guarded writes"""
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.blueprints.manifests import ManifestStore
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "manifest.yaml").write_text("process: demo\nversion: 1.0.0\n")
+    monkeypatch.setattr(main, "BLUEPRINTS_DIR", tmp_path)
+    monkeypatch.setattr(main, "manifest_store", ManifestStore())
+    return TestClient(main.app)
+
+def test_get_manifest_etag_and_304(client):
+    r1 = client.get("/blueprints/demo/manifest")
+    assert r1.status_code == 200
+    assert "process: demo" in r1.text
+    etag = r1.headers["ETag"]
+
+    r2 = client.get("/blueprints/demo/manifest", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+
+def test_get_manifest_sees_external_edit(client, tmp_path):
+    etag = client.get("/blueprints/demo/manifest").headers["ETag"]
+    path = tmp_path / "demo" / "manifest.yaml"
+    path.write_text("process: demo\nversion: 2.0.0\n")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    r = client.get("/blueprints/demo/manifest", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert "2.0.0" in r.text
+
+def test_put_manifest_if_match(client, tmp_path):
+    etag = client.get("/blueprints/demo/manifest").headers["ETag"]
+
+    r1 = client.put("/blueprints/demo/manifest", content=b"process: demo\nversion: 1.1.0\n", headers={"If-Match": etag})
+    assert r1.status_code == 200
+    new_etag = r1.headers["ETag"]
+    assert new_etag != etag
+
+    # A second editor still holding the old ETag must not overwrite
+    r2 = client.put("/blueprints/demo/manifest", content=b"process: demo\nversion: 9.9.9\n", headers={"If-Match": etag})
+    assert r2.status_code == 412
+    assert r2.json()["etag"] == new_etag
+    assert "1.1.0" in (tmp_path / "demo" / "manifest.yaml").read_text()
+    assert [p.name for p in (tmp_path / "demo").iterdir()] == ["manifest.yaml"]
+
+def test_put_manifest_unconditional_and_invalid(client):
+    r = client.put("/blueprints/new/manifest", content=b"process: new\n")
+    assert r.status_code == 200
+    assert client.get("/blueprints/new/manifest").text == "process: new\n"
+
+    r = client.put("/blueprints/new/manifest", content=b"process: [unclosed\n")
+    assert r.status_code == 400
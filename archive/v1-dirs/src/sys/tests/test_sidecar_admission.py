@@ -0,0 +1,157 @@
+"""Tests for sidecar ingest admission control"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar import admission as admission_module
+from src.ai.packages.sidecar.admission import Admission, Histogram
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", tmp_path / "sidecar.ndjson")
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    monkeypatch.setattr(sidecar, "_log", None)
+    monkeypatch.setattr(sidecar, "_writer", None)
+    monkeypatch.setattr(sidecar, "_index", None)
+    monkeypatch.setattr(sidecar, "_rollups", None)
+
+    def use(admission):
+        monkeypatch.setattr(sidecar, "admission", admission)
+        return admission
+    return use
+
+def event(i, type_="stage.completed"):
+    return {"type": type_, "payload": {"i": i}, "ts": 1700000000 + i}
+
+def test_limits_and_low_priority():
+    admission = Admission(max_in_flight=4, max_pending=100, low_priority=["app.start"], low_priority_at=0.5)
+    assert admission.admit(["app.start", "x"], 0) == ([True, True], None)
+    assert admission.admit(["app.start", "x"], 60) == ([False, True], "pending")
+    assert admission.admit(["x"], 0) == ([True], None)
+    assert admission.admit(["app.start"], 0) == ([False], "in_flight")  # 3 in flight >= 2
+    assert admission.admit(["x"], 100) == ([False], "pending")
+    assert admission.admit(["x"], 0) == ([True], None)
+    assert admission.admit(["x"], 0) == ([False], "in_flight")
+    admission.done("events", 0.003)
+    assert admission.admit(["x"], 0) == ([True], None)
+    assert admission.in_flight == admission.peak_in_flight == 4
+    assert admission.shed == {("pending", "low"): 1, ("in_flight", "low"): 1, ("pending", "normal"): 1,
+                              ("in_flight", "normal"): 1}
+    assert admission.rejected == {"in_flight": 2, "pending": 1}
+
+def test_retry_after_follows_overload(monkeypatch):
+    now = [100.2]
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: now[0])
+    admission = Admission(max_in_flight=2, retry_after_s=1, max_retry_after_s=5)
+    for _ in range(2 + 7):
+        admission.admit(["x"], 0)  # 2 admitted, 7 refused
+    assert admission.retry_after() == 1  # no full second seen yet
+    now[0] = 101.5
+    admission.admit(["x"], 0)
+    assert admission.retry_after() == 4  # ceil(7 / 2)
+    for _ in range(30):
+        admission.admit(["x"], 0)
+    now[0] = 102.1
+    admission.admit(["x"], 0)
+    assert admission.retry_after() == 5  # 31 refused / 0 admitted, clamped
+    now[0] = 110.0
+    admission.admit(["x"], 0)
+    assert admission.retry_after() == 1  # quiet second(s) in between
+
+def test_histogram_buckets():
+    histogram = Histogram((0.01, 0.1, 1.0))
+    for value in [0.005] * 90 + [0.1] * 9 + [5.0]:
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.01 and histogram.quantile(0.99) == 0.1 and histogram.quantile(1) == float("inf")
+    samples = histogram.samples("x", 'endpoint="events"')
+    assert samples[:4] == ['x_bucket{endpoint="events",le="0.01"} 90', 'x_bucket{endpoint="events",le="0.1"} 99',
+                           'x_bucket{endpoint="events",le="1.0"} 99', 'x_bucket{endpoint="events",le="+Inf"} 100']
+    assert samples[-1] == 'x_count{endpoint="events"} 100'
+
+def test_batch_sheds_low_priority_first(server):
+    server(Admission(low_priority=["app.start"], low_priority_at=0, retry_after_s=3))
+    with TestClient(sidecar.app) as client:
+        r = client.post("/events/batch", json=[event(0, "app.start"), event(1), event(2, "app.start")])
+        assert r.status_code == 200 and r.json()["status"] == "partial"
+        assert (r.json()["accepted"], r.json()["shed"]) == (1, 2)
+
+        r = client.post("/events/batch", json=[event(3, "app.start")])
+        assert r.status_code == 429 and r.headers["retry-after"] == "3"
+        r = client.post("/events", json=event(4, "app.start"))
+        assert r.status_code == 429 and r.headers["retry-after"] == "3"
+        assert client.post("/events", json=event(5)).status_code == 200
+
+        assert [json.loads(line)["payload"]["i"] for line in sidecar.get_log().scan()] == [1, 5]
+        metrics = client.get("/metrics")
+        assert metrics.headers["content-type"].startswith("text/plain")
+        assert 'sidecar_ingest_shed_events_total{limit="in_flight",priority="low"} 4' in metrics.text
+        assert 'sidecar_ingest_rejected_requests_total{limit="in_flight"} 2' in metrics.text
+        assert 'sidecar_ingest_latency_seconds_count{endpoint="events"} 1' in metrics.text
+        assert "sidecar_writer_events_total 2" in metrics.text
+
+def test_burst_keeps_in_flight_bounded(server):
+    admission = server(Admission(max_in_flight=16, max_pending=1000, low_priority=["app.start"]))
+
+    async def run():
+        writer = sidecar.get_writer()
+        write = writer._write
+
+        def slow_write(data):
+            time.sleep(0.01)
+            return write(data)
+        writer._write = slow_write
+        transport = httpx.ASGITransport(app=sidecar.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://sidecar") as client:
+            responses = await asyncio.gather(*(
+                client.post("/events", json=event(i, "app.start" if i % 2 else "stage.completed"))
+                for i in range(300)))
+        await sidecar.close_writer()
+        return responses
+
+    responses = asyncio.run(run())
+    codes = [r.status_code for r in responses]
+    assert set(codes) == {200, 429}
+    assert all(int(r.headers["retry-after"]) >= 1 for r in responses if r.status_code == 429)
+    assert admission.peak_in_flight <= 16
+    assert admission.shed.get(("in_flight", "low"), 0) > admission.shed.get(("in_flight", "normal"), 0)
+    assert admission.admitted == codes.count(200) == admission.latency["events"].count
+    assert admission.in_flight == 0
+
+def test_batch_body_not_read_past_in_flight_limit(server):
+    admission = server(Admission(max_in_flight=1))
+    release, read = asyncio.Event(), []
+
+    async def slow_body():
+        yield (json.dumps(event(0)) + "\n").encode()
+        await release.wait()
+        yield json.dumps(event(1)).encode()
+
+    async def refused_body():
+        read.append(True)
+        yield json.dumps(event(2)).encode()
+
+    async def run():
+        transport = httpx.ASGITransport(app=sidecar.app)
+        headers = {"Content-Type": "application/x-ndjson"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://sidecar") as client:
+            first = asyncio.ensure_future(client.post("/events/batch", content=slow_body(), headers=headers))
+            for _ in range(1000):  # until the first request is in flight, reading its body
+                if admission.in_flight:
+                    break
+                await asyncio.sleep(0.001)
+            second = await client.post("/events/batch", content=refused_body(), headers=headers)
+            release.set()
+            first = await first
+        await sidecar.close_writer()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.status_code == 200 and first.json()["accepted"] == 2
+    assert second.status_code == 429 and not read
+    assert admission.in_flight == 0 and admission.rejected == {"in_flight": 1}
+    assert admission.latency["batch"].count == 1
@@ -0,0 +1,82 @@
+"""Tests for bulk event ingest on /events/batch"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", tmp_path / "sidecar.ndjson")
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    monkeypatch.setattr(sidecar, "_log", None)
+    monkeypatch.setattr(sidecar, "_writer", None)
+    with TestClient(sidecar.app) as client:
+        yield client
+
+def logged(client):
+    return [json.loads(line)["payload"]["i"] for line in sidecar.get_log().scan()]
+
+def event(i):
+    return {"type": "stage", "payload": {"i": i}, "ts": 1700000000 + i}
+
+def test_json_array_is_one_group_commit(client):
+    r = client.post("/events/batch", json=[event(i) for i in range(50)])
+    assert r.status_code == 200 and r.json() == {"status": "logged", "accepted": 50, "rejected": 0, "shed": 0,
+                                                 "errors": []}
+    assert logged(client) == list(range(50))
+    assert sidecar.get_writer().stats()["batches"] == 1
+
+def test_json_array_reports_bad_items_by_index(client):
+    r = client.post("/events/batch", json=[event(0), {"payload": {}}, event(2), "nope"])
+    body = r.json()
+    assert body["status"] == "partial" and body["accepted"] == 2
+    assert [e["index"] for e in body["errors"]] == [1, 3] and "type" in body["errors"][0]["error"]
+    assert logged(client) == [0, 2]
+
+def test_ndjson_streamed_with_line_errors(client):
+    lines = [json.dumps(event(i)) for i in range(2500)]
+    lines[1200] = '{"type": "stage", "payload": []}'
+    lines[1700] = "{not json"
+    body = ("\n".join(lines[:10]) + "\n\n" + "\n".join(lines[10:])).encode()
+
+    def chunks():
+        for start in range(0, len(body), 4096):
+            yield body[start:start + 4096]
+
+    r = client.post("/events/batch", content=chunks(), headers={"Content-Type": "application/x-ndjson"})
+    result = r.json()
+    assert r.status_code == 200 and result["accepted"] == 2498
+    assert [e["line"] for e in result["errors"]] == [1202, 1702]  # 1-based, counting the blank line
+    assert logged(client) == [i for i in range(2500) if i not in (1200, 1700)]
+
+def test_rejects_unusable_batches(client, monkeypatch):
+    assert client.post("/events/batch", json=[{"type": 1}]).status_code == 422
+    assert client.post("/events/batch", json={"type": "x"}).status_code == 400
+    assert client.post("/events/batch", content=b"[{", headers={"Content-Type": "application/json"}).status_code == 400
+    monkeypatch.setattr(sidecar, "BATCH_MAX_EVENTS", 3)
+    assert client.post("/events/batch", json=[event(i) for i in range(4)]).status_code == 413
+    ndjson = "\n".join(json.dumps(event(i)) for i in range(4))
+    assert client.post("/events/batch", content=ndjson, headers={"Content-Type": "application/x-ndjson"}).status_code == 413
+    assert logged(client) == []
+
+def test_oversized_array_refused_before_validation(client, monkeypatch):
+    class NoValidation:
+        def __getattr__(self, name):
+            raise AssertionError("validated an oversized batch")
+    monkeypatch.setattr(sidecar, "BATCH_MAX_EVENTS", 3)
+    monkeypatch.setattr(sidecar, "_event_list", NoValidation())
+    assert client.post("/events/batch", json=[event(i) for i in range(4)]).status_code == 413
+
+def test_ndjson_line_split_across_many_chunks(client):
+    big = json.dumps({**event(1), "payload": {"i": 1, "blob": "x" * 20000}})
+    body = (json.dumps(event(0)) + "\n" + big + "\n\n" + json.dumps(event(2))).encode()
+
+    def chunks():
+        for start in range(0, len(body), 7):
+            yield body[start:start + 7]
+
+    r = client.post("/events/batch", content=chunks(), headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200 and r.json()["accepted"] == 3
+    assert logged(client) == [0, 1, 2]
@@ -0,0 +1,124 @@
+"""Tests for the sidecar live tail"""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar.live import Broadcaster, LiveFilter, follow, format_cursor, parse_cursor, parse_position
+from src.ai.packages.sidecar.manifest import Manifest
+from src.ai.packages.sidecar.merged import MergedLog
+from src.ai.packages.sidecar.segments import SegmentLog
+from src.ai.packages.sidecar.writer import EventWriter
+
+def line(i, type_="app.start", process_id="PRC-1"):
+    return json.dumps({"type": type_, "payload": {"i": i}, "tags": {"process_id": process_id}, "ts": i}).encode() + b"\n"
+
+def ids(items):
+    return [json.loads(item[1])["payload"]["i"] if kind == "event" else kind for kind, item in items]
+
+def merged_log(directory, stream="sidecar", **kwargs):
+    manifest = Manifest(directory)
+    return MergedLog(SegmentLog(directory, stream=stream, manifest=manifest, **kwargs), manifest)
+
+async def take(stream, n):
+    return [await asyncio.wait_for(stream.__anext__(), 2) for _ in range(n)]
+
+def test_filters_and_positions(tmp_path):
+    async def run():
+        merged, broadcaster = merged_log(tmp_path), Broadcaster()
+        writer = EventWriter(merged.log)
+        writer.listeners.append(broadcaster.publish)
+        stream = follow(merged, broadcaster, LiveFilter(["heir.check"], {"process_id": "PRC-2"}))
+        pending = asyncio.ensure_future(take(stream, 2))
+        await asyncio.sleep(0)  # subscribed
+        await writer.submit_many([line(0), line(1, "heir.check", "PRC-2"), line(2, "heir.check"),
+                                  line(3, "heir.check", "PRC-2")])
+        items = await pending
+        assert ids(items) == [1, 3]
+        assert items[0][1][0] == {"sidecar": (0, len(line(0)) + len(line(1, "heir.check", "PRC-2")))}
+        await stream.aclose()
+        assert broadcaster.stats()["subscribers"] == 0
+        await writer.close()
+
+    asyncio.run(run())
+
+def test_slow_subscriber_gets_lag_signal():
+    async def run():
+        broadcaster = Broadcaster()
+        subscriber = broadcaster.subscribe(LiveFilter(), max_queue=3)
+        broadcaster.publish("sidecar", 0, 0, b"".join(line(i) for i in range(10)))
+        items = [await subscriber.get() for _ in range(4)]
+        assert ids(items[:3]) == [0, 1, 2]
+        assert items[3] == ("lag", 7)
+        broadcaster.publish("sidecar", 0, 999, line(10))
+        assert ids([await subscriber.get()]) == [10]
+        assert await subscriber.get(timeout=0.01) == ("ping", None)
+
+    asyncio.run(run())
+
+def test_resume_replays_then_goes_live_without_duplicates(tmp_path):
+    async def run():
+        merged, broadcaster = merged_log(tmp_path, max_bytes=1 << 10), Broadcaster()
+        writer = EventWriter(merged.log)
+        writer.listeners.append(broadcaster.publish)
+        for i in range(40):
+            await writer.submit(line(i))
+        resume = {"sidecar": [(seq, offset) for seq, offset, _ in merged.log.lines_from(0, 0)][25]}
+
+        stream = follow(merged, broadcaster, LiveFilter(), start=resume, replay_chunk=4)
+        replayed = await take(stream, 15)
+        await writer.submit(line(40))
+        assert ids(replayed + await take(stream, 1)) == list(range(25, 41))
+        await stream.aclose()
+        await writer.close()
+        merged.log.close()
+
+    asyncio.run(run())
+
+def test_follows_other_workers_streams(tmp_path):
+    async def run():
+        merged, broadcaster = merged_log(tmp_path), Broadcaster()
+        other = SegmentLog(tmp_path, stream="sidecar-w1", manifest=merged.manifest)
+        writer = EventWriter(merged.log)
+        writer.listeners.append(broadcaster.publish)
+        stream = follow(merged, broadcaster, LiveFilter(), poll_s=0.01)
+        pending = asyncio.ensure_future(take(stream, 3))
+        await asyncio.sleep(0.05)  # subscribed
+        other.append(line(1))
+        await asyncio.sleep(0.05)
+        await writer.submit(line(2))
+        other.append(line(3))
+        items = await pending
+        assert sorted(ids(items)) == [1, 2, 3]
+        await stream.aclose()
+
+        # Resuming from the first event's cursor replays the rest, merged by ts
+        resumed = follow(merged, broadcaster, LiveFilter(), start=items[0][1][0])
+        assert ids(await take(resumed, 2)) == [2, 3]
+        await resumed.aclose()
+        await writer.close()
+        other.close()
+        merged.log.close()
+
+    asyncio.run(run())
+
+@pytest.mark.parametrize("bad", ["3", "a.b", "-1.0"])
+def test_parse_position_rejects(bad):
+    with pytest.raises(ValueError):
+        parse_position(bad)
+
+@pytest.mark.parametrize("bad", ["3.1", ":3.1", "sidecar:3", "sidecar:3.1,"])
+def test_parse_cursor_rejects(bad):
+    with pytest.raises(ValueError):
+        parse_cursor(bad)
+
+def test_endpoint_validation():
+    assert parse_position("3.120") == (3, 120)
+    cursor = {"sidecar": (3, 120), "sidecar-w1": (0, 5)}
+    assert parse_cursor(format_cursor(cursor)) == cursor
+    client = TestClient(sidecar.app)
+    assert client.get("/events/live", params={"tag": "nokey"}).status_code == 400
+    assert client.get("/events/live", params={"from": "x"}).status_code == 400
+    assert client.get("/events/live", headers={"Last-Event-ID": "1"}).status_code == 400
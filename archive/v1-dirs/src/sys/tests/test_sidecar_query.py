@@ -0,0 +1,78 @@
+"""Tests for the sidecar event index and /events/query"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar.index import EventIndex
+from src.ai.packages.sidecar.segments import SegmentLog
+
+TYPES = ("app.start", "heir.check", "action.invoked")
+
+def event(i):
+    return {"type": TYPES[i % 3], "payload": {"i": i},
+            "tags": {"process_id": f"PRC-{i % 5}", "unique_id": f"U-{i % 7}"}, "ts": 1000 + i // 2}
+
+def fill(log, start, n):
+    log.append(b"".join(json.dumps(event(i)).encode() + b"\n" for i in range(start, start + n)))
+
+def fetch(log, index, **filters):
+    positions, cursor = index.query(**filters)
+    return [json.loads(line)["payload"]["i"] for line in log.read_lines([(s, o) for _, s, o in positions])], cursor
+
+def test_filters_over_rotated_segments(tmp_path):
+    log = SegmentLog(tmp_path, max_bytes=4 << 10, block_bytes=512)
+    index = EventIndex(tmp_path / "index.sqlite3")
+    for start in range(0, 600, 50):
+        fill(log, start, 50)
+        index.sync(log)
+    log.close()
+    assert len(log.segments()) > 10 and index.sync(log) == 0
+
+    expected = [i for i in range(600) if i % 3 == 1 and i % 5 == 2 and 1100 <= 1000 + i // 2 <= 1150]
+    got, cursor = fetch(log, index, types=["heir.check"], process_id="PRC-2", since=1100, until=1150, order="asc")
+    assert got == expected and cursor is None
+    assert fetch(log, index, unique_id="U-3", limit=3)[0] == [598, 591, 584]
+    assert fetch(log, index, types=["app.start", "action.invoked"], limit=1000)[0] == \
+        sorted((i for i in range(600) if i % 3 != 1), key=lambda i: (i // 2, i), reverse=True)
+
+def test_cursor_pages_cover_everything_once(tmp_path):
+    log = SegmentLog(tmp_path, max_bytes=4 << 10)
+    index = EventIndex(tmp_path / "index.sqlite3")
+    fill(log, 0, 101)
+    index.sync(log)
+    for order in ("asc", "desc"):
+        seen, cursor = [], None
+        while True:
+            page, cursor = fetch(log, index, cursor=cursor, limit=10, order=order)
+            seen += page
+            if cursor is None:
+                break
+        assert sorted(seen) == list(range(101)) and len(seen) == 101
+    with pytest.raises(ValueError):
+        index.query(cursor="!!!")
+
+def test_index_resumes_and_rebuilds(tmp_path):
+    log = SegmentLog(tmp_path, max_bytes=4 << 10)
+    index = EventIndex(tmp_path / "index.sqlite3")
+    fill(log, 0, 40)
+    assert index.sync(log) == 40
+    index.close()
+    fill(log, 40, 10)
+    assert EventIndex(tmp_path / "index.sqlite3").sync(log) == 10  # picks up from the watermark
+    assert EventIndex(tmp_path / "rebuilt.sqlite3").sync(log) == 50
+
+def test_query_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", tmp_path / "sidecar.ndjson")
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    for name in ("_log", "_writer", "_index"):
+        monkeypatch.setattr(sidecar, name, None)
+    with TestClient(sidecar.app) as client:
+        client.post("/events/batch", json=[event(i) for i in range(30)])
+        first = client.get("/events/query", params={"type": "app.start", "limit": 4}).json()
+        assert [e["payload"]["i"] for e in first["events"]] == [27, 24, 21, 18]
+        second = client.get("/events/query", params={"type": "app.start", "cursor": first["next_cursor"]}).json()
+        assert [e["payload"]["i"] for e in second["events"]] == [15, 12, 9, 6, 3, 0]
+        assert second["next_cursor"] is None
+        assert client.get("/events/query", params={"cursor": "nope"}).status_code == 400
@@ -0,0 +1,87 @@
+"""Tests for sidecar rollups and DDSketch percentiles"""
+import json
+import random
+
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar.rollups import DDSketch, Rollups
+from src.ai.packages.sidecar.segments import SegmentLog
+
+T0 = 1700000040  # start of a minute
+
+def event(i, type_="llm.call", ts=None, duration=None):
+    payload = {"i": i} if duration is None else {"i": i, "duration_ms": duration}
+    return json.dumps({"type": type_, "payload": payload, "tags": {}, "ts": T0 + i if ts is None else ts}).encode() + b"\n"
+
+def test_sketch_quantiles_within_alpha_and_mergeable():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(4, 1.2) for _ in range(20000)] + [0.0] * 50
+    whole, left, right = DDSketch(0.01), DDSketch(0.01), DDSketch(0.01)
+    for i, v in enumerate(values):
+        whole.add(v)
+        (left if i % 2 else right).add(v)
+    merged = DDSketch.from_dict(json.loads(json.dumps(left.to_dict()))).merge(right)
+
+    ordered = sorted(values)
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert abs(whole.quantile(q) - exact) <= 0.0101 * exact
+        assert merged.quantile(q) == whole.quantile(q)
+    assert merged.count == len(values) and merged.max == max(values) and DDSketch().quantile(0.5) is None
+
+def test_per_minute_counts_and_retention(tmp_path):
+    log = SegmentLog(tmp_path)
+    log.append(b"".join(event(i, "a" if i % 4 else "b", duration=i) for i in range(240)))  # 4 minutes
+    rollups = Rollups(tmp_path / "rollups.json", retention_minutes=3, clock=lambda: T0 + 239)
+    assert rollups.sync(log) == 240
+
+    stats = rollups.stats(minutes=2, now=T0 + 239)
+    assert stats["types"]["a"]["per_minute"] == [[T0 + 120, 45], [T0 + 180, 45]]
+    assert stats["types"]["b"]["count"] == 30 and stats["types"]["b"]["total"] == 60
+    assert 233 <= stats["types"]["a"]["duration"]["p99"] <= 239 * 1.01
+    assert sorted(rollups.minutes) == [T0 + 60, T0 + 120, T0 + 180]  # oldest minute dropped
+    assert rollups.stats(minutes=60, types=["b"], now=T0 + 239)["types"].keys() == {"b"}
+
+def test_retention_by_wall_clock_ignores_future_ts(tmp_path):
+    log = SegmentLog(tmp_path)
+    log.append(b"".join(event(i) for i in range(120)) + event(120, ts=T0 + 10 ** 9))
+    rollups = Rollups(tmp_path / "rollups.json", retention_minutes=3, clock=lambda: T0 + 119)
+    assert rollups.sync(log) == 121
+    assert sorted(rollups.minutes) == [T0, T0 + 60] and rollups.totals == {"llm.call": 120}
+    log.close()
+
+def test_incomplete_saved_state_rebuilt_from_log(tmp_path):
+    (tmp_path / "rollups.json").write_text(json.dumps({"alpha": 0.01, "totals": {"llm.call": 7}}))
+    log = SegmentLog(tmp_path)
+    log.append(b"".join(event(i) for i in range(5)))
+    rollups = Rollups(tmp_path / "rollups.json", clock=lambda: T0 + 5)
+    assert rollups.totals == {} and rollups.sync(log) == 5 and rollups.totals == {"llm.call": 5}
+    log.close()
+
+def test_saved_when_segment_seals_and_resumed(tmp_path):
+    log = SegmentLog(tmp_path, max_bytes=2 << 10)
+    rollups = Rollups(tmp_path / "rollups.json")
+    log.append(b"".join(event(i, duration=5) for i in range(10)))
+    rollups.sync(log)
+    assert not (tmp_path / "rollups.json").exists()
+    for i in range(10, 60):
+        log.append(event(i, duration=5))
+    rollups.sync(log)
+    assert json.loads((tmp_path / "rollups.json").read_text())["totals"] == {"llm.call": 60}
+    log.close()
+
+    reopened = Rollups(tmp_path / "rollups.json")
+    assert reopened.sync(log) == 0 and reopened.totals == {"llm.call": 60}
+
+def test_stats_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", tmp_path / "sidecar.ndjson")
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    for name in ("_log", "_writer", "_index", "_rollups"):
+        monkeypatch.setattr(sidecar, name, None)
+    with TestClient(sidecar.app) as client:
+        client.post("/events/batch", json=[{"type": "heir.check", "payload": {"duration_ms": d}} for d in (10, 20, 30)])
+        body = client.get("/events/stats", params={"minutes": 5}).json()
+    check = body["types"]["heir.check"]
+    assert check["count"] == 3 and check["duration"]["max"] == 30 and 19.5 <= check["duration"]["p50"] <= 20.5
+    assert (tmp_path / "sidecar" / "rollups.json").exists()  # saved on shutdown
@@ -0,0 +1,84 @@
+"""Tests for the segmented, compressed sidecar event log"""
+import gzip
+import json
+
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar.segments import SegmentLog, line_ts
+
+def event(i, ts=None):
+    return json.dumps({"type": "t", "payload": {"i": i, "ts": -1}, "tags": {}, "ts": 1000 + i if ts is None else ts},
+                      separators=(",", ":")).encode() + b"\n"
+
+def fill(log, n, per_append=10):
+    for start in range(0, n, per_append):
+        log.append(b"".join(event(i) for i in range(start, min(n, start + per_append))))
+
+def test_line_ts():
+    assert line_ts(event(5)) == 1005
+    assert line_ts(b'{"ts": 7, "type": "x"}') == 7
+    assert line_ts(b'{"payload": {"ts": 7}}') is None
+    assert line_ts(b"garbage") is None
+
+def test_rotates_compresses_and_indexes(tmp_path):
+    log = SegmentLog(tmp_path, max_bytes=8 << 10, block_bytes=1 << 10)
+    fill(log, 1000)
+    log.close()
+
+    segments = log.segments()
+    assert len(segments) > 5 and all(s.compressed for s in segments[:-1])
+    assert all(s.size <= 8 << 10 for s in segments) and sum(s.lines for s in segments) == log.line_count() == 1000
+    sealed = segments[0]
+    assert sealed.stored_size < sealed.size and len(sealed.blocks) > 4
+    assert (tmp_path / "sidecar-00000000.idx").exists() and not (tmp_path / "sidecar-00000000.ndjson").exists()
+    with gzip.open(sealed.path) as f:  # one gzip member per block still reads as plain gzip
+        assert [json.loads(line)["payload"]["i"] for line in f][:3] == [0, 1, 2]
+
+    assert [json.loads(line)["payload"]["i"] for line in log.scan()] == list(range(1000))
+    assert [json.loads(line)["payload"]["i"] for line in log.tail(250)] == list(range(750, 1000))
+    assert [line_ts(line) for line in log.scan(since=1500, until=1504)] == [1500, 1501, 1502, 1503, 1504]
+
+def test_range_reads_skip_other_blocks(tmp_path, monkeypatch):
+    log = SegmentLog(tmp_path, max_bytes=8 << 10, block_bytes=1 << 10)
+    fill(log, 1000)
+    log.close()
+    reads = []
+    read_block = log.read_block
+    monkeypatch.setattr(log, "read_block", lambda segment, i: reads.append((segment.seq, i)) or read_block(segment, i))
+    assert len(list(log.scan(since=1990))) == 10
+    assert len(reads) <= 2
+    reads.clear()
+    assert len(log.tail(5)) == 5 and len(reads) <= 1
+
+def test_recovers_after_restart(tmp_path):
+    log = SegmentLog(tmp_path, max_bytes=8 << 10)
+    fill(log, 300)
+    log.close()
+    with open(log.segments()[-1].path, "ab") as f:
+        f.write(b'{"type":"torn"')  # a write cut short by a crash
+    # Crashed while sealing segment 0: plain file still there, index not yet written
+    (tmp_path / "sidecar-00000000.ndjson").write_bytes(gzip.decompress(log.segments()[0].path.read_bytes()))
+    (tmp_path / "sidecar-00000000.idx").unlink()
+
+    reopened = SegmentLog(tmp_path, max_bytes=8 << 10)
+    reopened.append(event(300))
+    reopened.close()
+    assert [json.loads(line)["payload"]["i"] for line in reopened.scan()] == list(range(301))
+    assert reopened.segments()[0].compressed and reopened.line_count() == 301
+
+def test_rotates_by_age(tmp_path):
+    log = SegmentLog(tmp_path, max_age_s=0)
+    fill(log, 3, per_append=1)
+    log.close()
+    assert [s.lines for s in log.segments()] == [1, 1, 1]
+
+def test_segments_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", tmp_path / "sidecar.ndjson")
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    monkeypatch.setattr(sidecar, "_log", None)
+    monkeypatch.setattr(sidecar, "_writer", None)
+    with TestClient(sidecar.app) as client:
+        client.post("/events", json={"type": "a", "payload": {}, "ts": 5})
+        body = client.get("/events/segments").json()
+    assert body["lines"] == 1 and body["segments"][0]["min_ts"] == 5
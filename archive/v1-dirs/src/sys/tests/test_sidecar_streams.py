@@ -0,0 +1,117 @@
+"""Tests for per-worker sidecar streams, the manifest and merged reads"""
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar.index import EventIndex
+from src.ai.packages.sidecar.manifest import Manifest, claim_stream
+from src.ai.packages.sidecar.merged import MergedLog
+from src.ai.packages.sidecar.segments import SegmentLog
+
+def line(i):
+    return json.dumps({"type": "app.start", "payload": {"i": i}, "ts": 1000 + i}).encode() + b"\n"
+
+def ids(lines):
+    return [json.loads(l)["payload"]["i"] for l in lines]
+
+def two_workers(directory, **kwargs):
+    manifest = Manifest(directory)
+    a = SegmentLog(directory, manifest=manifest, **kwargs)
+    b = SegmentLog(directory, stream="sidecar-w1", manifest=Manifest(directory), **kwargs)
+    return MergedLog(a, manifest), b
+
+def test_claims_a_free_stream(tmp_path):
+    first, fd = claim_stream(tmp_path)
+    second, fd2 = claim_stream(tmp_path)
+    assert (first, second) == ("sidecar", "sidecar-w1")
+    os.close(fd)
+    third, fd3 = claim_stream(tmp_path)  # released by the first worker
+    assert third == "sidecar"
+    os.close(fd2)
+    os.close(fd3)
+
+def test_reads_merge_streams_by_ts(tmp_path):
+    merged, b = two_workers(tmp_path, max_bytes=1 << 10, block_bytes=256)
+    for i in range(0, 120, 2):
+        merged.log.append(line(i))
+        b.append(line(i + 1))
+    b.close()  # seals its rotated segments
+    assert merged.streams() == ["sidecar", "sidecar-w1"]
+    assert merged.manifest.read()["sidecar-w1"]["pid"] is None
+    assert any(s.compressed for s in merged.get("sidecar-w1").segments())
+
+    assert ids(merged.tail(5)) == [115, 116, 117, 118, 119]
+    assert ids(merged.scan(1050, 1054)) == [50, 51, 52, 53, 54]
+    assert merged.line_count() == 120
+    assert merged.stats()["lines"] == 120
+
+    cursor = {"sidecar": merged.log.end()}
+    rest = list(merged.lines_from(cursor))
+    assert [stream for stream, *_ in rest] == ["sidecar-w1"] * 60
+    assert ids(merged.read_lines([rest[3][:3], ("sidecar", 0, 0), ("sidecar-w9", 0, 0)])[:2]) == [7, 0]
+    merged.log.close()
+
+def test_reader_follows_appends(tmp_path):
+    merged, b = two_workers(tmp_path)
+    b.append(line(1))
+    reader = merged.get("sidecar-w1")
+    assert ids(reader.tail(10)) == [1]
+    b.append(line(3) + line(5))
+    assert ids(reader.tail(10)) == [1, 3, 5]
+    assert reader.end() == b.end()
+    b.close()
+    merged.log.close()
+
+def test_workers_index_each_event_once(tmp_path):
+    merged, b = two_workers(tmp_path)
+    for i in range(0, 40, 2):
+        merged.log.append(line(i))
+        b.append(line(i + 1))
+    index, other = EventIndex(tmp_path / "index.sqlite3"), EventIndex(tmp_path / "index.sqlite3")
+    assert index.sync(merged.log) == 20
+    assert other.sync(b) == 20
+    b.append(line(40))
+    assert sum(index.sync(log) for log in merged.logs()) == 1  # the other worker's stream, read from disk
+    assert other.sync(merged.log) == other.sync(b) == 0
+    positions, _ = index.query(limit=100, order="asc")
+    assert ids(merged.read_lines(positions)) == list(range(41))
+    b.close()
+    merged.log.close()
+
+def test_endpoints_read_every_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", tmp_path / "sidecar.ndjson")
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    for name in ("_log", "_writer", "_index", "_rollups"):
+        monkeypatch.setattr(sidecar, name, None)
+    other = SegmentLog(tmp_path / "sidecar", stream="sidecar-w1", manifest=Manifest(tmp_path / "sidecar"))
+    other.append(b"".join(line(i) for i in range(1, 10, 2)))
+    with TestClient(sidecar.app) as client:
+        assert client.post("/events/batch", json=[json.loads(line(i)) for i in range(0, 10, 2)]).status_code == 200
+        assert sidecar.get_log().stream != "sidecar-w1"
+        recent = client.get("/events/recent", params={"limit": 4}).json()
+        assert [e["payload"]["i"] for e in recent["events"]] == [6, 7, 8, 9] and recent["total_logged"] == 10
+        query = client.get("/events/query", params={"limit": 3}).json()
+        assert [e["payload"]["i"] for e in query["events"]] == [9, 8, 7]
+        segments = client.get("/events/segments").json()
+        assert {s["stream"] for s in segments["segments"]} == {sidecar.get_log().stream, "sidecar-w1"}
+        assert client.get("/events/stats").status_code == 200
+        assert sidecar.get_rollups().totals == {"app.start": 10}
+    other.close()
+
+def test_restarted_app_writes_through_a_fresh_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", tmp_path / "sidecar.ndjson")
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    for name in ("_log", "_merged", "_writer", "_index", "_rollups"):
+        monkeypatch.setattr(sidecar, name, None)
+    for start in (0, 3):  # two lifespans of the same process
+        with TestClient(sidecar.app) as client:
+            batch = [json.loads(line(i)) for i in range(start, start + 3)]
+            assert client.post("/events/batch", json=batch).status_code == 200
+            assert sidecar.get_writer().log is sidecar.get_log()
+            assert client.get("/events/recent", params={"limit": 10}).json()["total_logged"] == start + 3
+        assert sidecar._writer is None and sidecar._log is None
+    log = SegmentLog(tmp_path / "sidecar")
+    assert ids(log.scan()) == list(range(6))
+    log.close()
@@ -0,0 +1,38 @@
+"""Tests for the sidecar's reverse tail reader and /events/recent"""
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar.tail import tail_lines
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1 << 16])
+def test_tail_matches_readlines(tmp_path, block_size):
+    rng = random.Random(block_size)
+    path = tmp_path / "log.ndjson"
+    lines = [json.dumps({"i": i, "pad": "x" * rng.randrange(0, 90)}) for i in range(300)]
+    path.write_text("\n".join(lines[:150]) + "\n\n" + "\n".join(lines[150:]) + '\n{"partial":')
+
+    for limit in (0, 1, 10, 299, 300, 1000):
+        expected = [line.encode() for line in lines][-limit:] if limit else []
+        assert tail_lines(path, limit, block_size) == expected
+
+def test_tail_of_empty_file(tmp_path):
+    (tmp_path / "log.ndjson").write_bytes(b"")
+    assert tail_lines(tmp_path / "log.ndjson", 10) == []
+
+def test_recent_events_endpoint(tmp_path, monkeypatch):
+    legacy = tmp_path / "sidecar.ndjson"
+    legacy.write_text("".join(json.dumps({"type": "old", "payload": {"i": i}}) + "\n" for i in range(100)))
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", legacy)
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    monkeypatch.setattr(sidecar, "_log", None)
+    monkeypatch.setattr(sidecar, "_writer", None)
+    with TestClient(sidecar.app) as client:
+        client.post("/events", json={"type": "new", "payload": {"i": 100}})
+        body = client.get("/events/recent", params={"limit": 3}).json()
+    assert [e["payload"]["i"] for e in body["events"]] == [98, 99, 100]
+    assert body["total"] == 3 and body["total_logged"] == 101
+    assert not legacy.exists()  # adopted as the first segment
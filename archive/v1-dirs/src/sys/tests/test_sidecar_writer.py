@@ -0,0 +1,74 @@
+"""Tests for the sidecar's group-commit event writer"""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.ai.sidecar_server as sidecar
+from src.ai.packages.sidecar.segments import SegmentLog
+from src.ai.packages.sidecar.writer import EventWriter
+
+def lines(log):
+    return [json.loads(line) for line in log.scan()]
+
+async def post_many(writer, n):
+    await asyncio.gather(*(writer.submit(json.dumps({"i": i}).encode() + b"\n") for i in range(n)))
+
+def test_concurrent_submits_share_batches(tmp_path):
+    log = SegmentLog(tmp_path)
+    writer = EventWriter(log, flush_events=64, flush_ms=20, fsync="always")
+
+    async def run():
+        await post_many(writer, 200)
+        assert writer.stats()["written"] == 200  # ack=written: every submit returned after its write
+        await writer.close()
+
+    asyncio.run(run())
+    assert sorted(e["i"] for e in lines(log)) == list(range(200))
+    stats = writer.stats()
+    assert stats["batches"] < 20 and stats["fsyncs"] == stats["batches"]
+
+def test_queued_ack_is_flushed_on_close(tmp_path):
+    log = SegmentLog(tmp_path)
+    writer = EventWriter(log, flush_ms=50, fsync="none", ack="queued")
+
+    async def run():
+        await post_many(writer, 50)
+        await writer.submit_many([b'{"i":50}\n', b'{"i":51}\n'])
+        await writer.close()
+
+    asyncio.run(run())
+    assert [e["i"] for e in lines(log)] == list(range(52))
+    assert writer.stats()["fsyncs"] == 0
+
+def test_interval_fsync_when_idle(tmp_path):
+    log = SegmentLog(tmp_path)
+    writer = EventWriter(log, flush_ms=1, fsync="interval", fsync_interval_ms=50)
+
+    async def run():
+        await writer.submit(b'{"i":0}\n')
+        assert writer.stats()["fsyncs"] == 0  # written within the interval
+        await asyncio.sleep(0.2)  # no later write arrives
+        assert writer.stats()["fsyncs"] == 1
+        await asyncio.sleep(0.1)
+        assert writer.stats()["fsyncs"] == 1  # nothing left unsynced
+        await writer.close()
+
+    asyncio.run(run())
+
+def test_rejects_unknown_policy(tmp_path):
+    with pytest.raises(ValueError):
+        EventWriter(SegmentLog(tmp_path), fsync="sometimes")
+
+def test_post_events_goes_through_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_FILE", tmp_path / "sidecar.ndjson")
+    monkeypatch.setattr(sidecar, "SIDECAR_LOG_DIR", tmp_path / "sidecar")
+    monkeypatch.setattr(sidecar, "_log", None)
+    monkeypatch.setattr(sidecar, "_writer", None)
+    with TestClient(sidecar.app) as client:
+        for i in range(5):
+            r = client.post("/events", json={"type": "stage", "payload": {"i": i}, "ts": 1700000000 + i})
+            assert r.status_code == 200 and r.json()["status"] == "logged"
+        assert [e["payload"]["i"] for e in lines(sidecar.get_log())] == list(range(5))
+        assert client.get("/").json()["writer"]["written"] == 5
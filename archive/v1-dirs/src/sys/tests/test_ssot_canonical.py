@@ -0,0 +1,45 @@
+"""Property tests for the streaming canonical-JSON hasher"""
+import hashlib
+import json
+import random
+
+from src.server.blueprints.versioning import (
+    OMIT, _scrub, canonical_hash, canonicalize, iter_canonical, stamp_version_hash,
+)
+
+LEAVES = [0, 1, -7, 2.5, 1e300, 10 ** 30, True, False, None, "", "plain", "quote \" and \\ slash",
+          "snow ☃", "astral 😀", "control \n\t\x00"]
+
+def random_value(rng, depth=0):
+    roll = rng.random()
+    if depth < 5 and roll < 0.3:
+        keys = ["a", "b", "stages", "fields", "é", "😀"] + sorted(OMIT)
+        return {rng.choice(keys) + rng.choice(["", "1", "2"]): random_value(rng, depth + 1)
+                for _ in range(rng.randint(0, 5))}
+    if depth < 5 and roll < 0.5:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 5))]
+    if roll < 0.505:
+        # Longer than one chunk, so it is encoded in slices
+        return rng.choice(["x", "é", "😀", "\"\\"]) * rng.randint(40000, 100000)
+    return rng.choice(LEAVES)
+
+def test_stream_matches_canonicalize():
+    rng = random.Random(12)
+    for _ in range(600):
+        value = random_value(rng)
+        canon = canonicalize(value)
+        assert "".join(iter_canonical(value)) == canon
+        assert canonical_hash(value) == hashlib.sha256(canon.encode("utf-8")).hexdigest()
+
+def test_stream_matches_legacy_separators():
+    rng = random.Random(13)
+    for _ in range(200):
+        value = random_value(rng)
+        assert "".join(iter_canonical(value, (", ", ": "))) == json.dumps(_scrub(value))
+
+def test_stamp_uses_streaming_hash():
+    ssot = {"meta": {"app_name": "x", "_created_at_ms": 1}, "doctrine": {"unique_id": "u"},
+            "stages": [{"fields": {"payload": "p" * 300000}}]}
+    stamped = stamp_version_hash(ssot)
+    assert stamped["doctrine"]["blueprint_version_hash"] == hashlib.sha256(canonicalize(ssot).encode()).hexdigest()
+    assert "blueprint_version_hash" not in ssot["doctrine"]
@@ -0,0 +1,94 @@
+"""Tests for JSON Patch delta saves on /api/ssot/save"""
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.blueprints.jsonpatch import PatchError, apply_patch
+from src.server.blueprints.versioning import VersionCache
+
+SSOT = {
+    "meta": {"app_name": "IMO", "stage": "overview", "_created_at_ms": 1700000000000},
+    "doctrine": {"unique_id": "shq-03-imo-1", "process_id": "p-1", "schema_version": "HEIR/1.0"},
+    "buckets": {"input": {"stages": [{"key": "intake"}]}, "middle": {"stages": []}, "output": {"stages": []}},
+}
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "ssot_versions", VersionCache(8))
+    return TestClient(main.app)
+
+def test_apply_patch_rfc6902_ops():
+    doc = {"a": {"b": [1, 2, 3]}, "c": {"d": True}}
+    original = copy.deepcopy(doc)
+    patched = apply_patch(doc, [
+        {"op": "add", "path": "/a/b/1", "value": 9},
+        {"op": "remove", "path": "/a/b/0"},
+        {"op": "replace", "path": "/a/b/2", "value": 7},
+        {"op": "copy", "from": "/a/b", "path": "/e"},
+        {"op": "move", "from": "/c/d", "path": "/f~1g"},
+        {"op": "add", "path": "/e/-", "value": "end"},
+        {"op": "test", "path": "/f~1g", "value": True},
+    ])
+    assert patched == {"a": {"b": [9, 2, 7]}, "c": {}, "e": [9, 2, 7, "end"], "f/g": True}
+    assert doc == original
+
+def test_apply_patch_shares_untouched_subtrees():
+    doc = {"a": {"x": [1]}, "b": {"y": [2]}}
+    patched = apply_patch(doc, [{"op": "replace", "path": "/a/x/0", "value": 3}])
+    assert patched["b"] is doc["b"]
+    assert patched["a"] is not doc["a"]
+
+@pytest.mark.parametrize("patch", [
+    [{"op": "remove", "path": "/missing"}],
+    [{"op": "add", "path": "/a/b/9", "value": 1}],
+    [{"op": "test", "path": "/a/b/0", "value": True}],  # 1 is not true
+    [{"op": "move", "from": "/a", "path": "/a/b/x"}],
+    [{"op": "frobnicate", "path": "/a"}],
+])
+def test_apply_patch_rejects(patch):
+    with pytest.raises(PatchError):
+        apply_patch({"a": {"b": [1]}}, patch)
+
+def test_delta_save_matches_full_save(client):
+    full = client.post("/api/ssot/save", json={"ssot": SSOT}).json()
+    base_hash = full["ssot"]["doctrine"]["blueprint_version_hash"]
+    patch = [{"op": "add", "path": "/buckets/middle/stages/-", "value": {"key": "enrich"}}]
+
+    r = client.post("/api/ssot/save", json={"unique_id": "shq-03-imo-1", "base_hash": base_hash,
+                                            "patch": patch, "return_ssot": True})
+    assert r.status_code == 200
+    delta = r.json()
+    assert "ssot" in delta and delta["ssot"]["buckets"]["middle"]["stages"] == [{"key": "enrich"}]
+
+    expected = copy.deepcopy(SSOT)
+    expected["buckets"]["middle"]["stages"].append({"key": "enrich"})
+    reference = client.post("/api/ssot/save", json={"ssot": expected}).json()
+    assert delta["blueprint_version_hash"] == reference["ssot"]["doctrine"]["blueprint_version_hash"]
+    changed = {path for path, digest in delta["digests"].items() if full["digests"][path] != digest}
+    assert changed == {"", "/buckets", "/buckets/middle"}
+
+def test_delta_save_conflicts(client):
+    body = {"unique_id": "shq-03-imo-1", "base_hash": "0" * 64, "patch": []}
+    r = client.post("/api/ssot/save", json=body)
+    assert r.status_code == 409 and r.json()["current_hash"] is None
+
+    current = client.post("/api/ssot/save", json={"ssot": SSOT}).json()["ssot"]["doctrine"]["blueprint_version_hash"]
+    r = client.post("/api/ssot/save", json=body)
+    assert r.status_code == 409 and r.json()["current_hash"] == current
+
+    first = client.post("/api/ssot/save", json={**body, "base_hash": current,
+                                                 "patch": [{"op": "replace", "path": "/meta/stage", "value": "build"}]})
+    assert first.status_code == 200
+    stale = client.post("/api/ssot/save", json={**body, "base_hash": current, "patch": []})
+    assert stale.status_code == 409
+    assert stale.json()["current_hash"] == first.json()["blueprint_version_hash"]
+
+    bad = client.post("/api/ssot/save", json={**body, "base_hash": stale.json()["current_hash"],
+                                               "patch": [{"op": "remove", "path": "/nope"}]})
+    assert bad.status_code == 422
+
+def test_save_rejects_non_object_bodies(client):
+    for body in ([1], "x", {"ssot": [1]}):
+        assert client.post("/api/ssot/save", json=body).status_code == 400
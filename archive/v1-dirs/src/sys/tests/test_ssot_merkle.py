@@ -0,0 +1,76 @@
+"""Tests for Merkle SSOT version hashing"""
+import hashlib
+import json
+import random
+
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.blueprints.versioning import (
+    OMIT, _scrub, canonicalize, merkle_tree, stamp_version_hash, stamp_version_tree, subtree_digests,
+)
+
+client = TestClient(main.app)
+
+def random_ssot(rng, depth=0):
+    roll = rng.random()
+    if depth < 4 and roll < 0.3:
+        keys = ["meta", "stages", "x/y", "a~b", "é"] + sorted(OMIT)
+        return {rng.choice(keys) + str(rng.randint(0, 2)) if rng.random() < 0.8 else rng.choice(sorted(OMIT)):
+                random_ssot(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+    if depth < 4 and roll < 0.5:
+        return [random_ssot(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return rng.choice([0, 1, -2.5, True, False, None, "", "text", "snow ☃", 10 ** 20])
+
+def test_root_digest_matches_flat_hash():
+    rng = random.Random(7)
+    for _ in range(2000):
+        ssot = random_ssot(rng)
+        tree = merkle_tree(ssot)
+        assert tree.encoding() == canonicalize(ssot)
+        assert tree.digest == hashlib.sha256(canonicalize(ssot).encode("utf-8")).hexdigest()
+        legacy = json.dumps(_scrub(ssot))
+        assert merkle_tree(ssot, separators=(", ", ": ")).digest == hashlib.sha256(legacy.encode("utf-8")).hexdigest()
+
+def test_copy_on_write_edit_reuses_untouched_subtrees():
+    ssot = {"meta": {"app_name": "x"}, "buckets": {b: {"stages": [{"key": f"s{i}"} for i in range(3)]}
+                                                  for b in ("input", "middle", "output")}}
+    tree = merkle_tree(ssot)
+    before = subtree_digests(tree, depth=2)
+
+    middle = {"stages": [{"key": "changed"}] + ssot["buckets"]["middle"]["stages"][1:]}
+    edited = {**ssot, "buckets": {**ssot["buckets"], "middle": middle}}
+    edited_tree = merkle_tree(edited, tree)
+
+    assert edited_tree.children["meta"] is tree.children["meta"]
+    assert edited_tree.children["buckets"].children["input"] is tree.children["buckets"].children["input"]
+    assert edited_tree.digest == hashlib.sha256(canonicalize(edited).encode("utf-8")).hexdigest()
+    after = subtree_digests(edited_tree, depth=2)
+    assert {path for path in after if after[path] != before[path]} == {"", "/buckets", "/buckets/middle"}
+
+def test_stamped_tree_matches_stamped_ssot():
+    ssot = {"meta": {"app_name": "x"}, "doctrine": {"unique_id": "u-1"}}
+    stamped, tree = stamp_version_tree(ssot)
+    assert stamped == stamp_version_hash(ssot)
+    assert tree.value is stamped and tree.digest == stamped["doctrine"]["blueprint_version_hash"]
+    assert merkle_tree(stamped, tree) is tree
+
+def test_save_keeps_existing_hash_and_returns_digests():
+    ssot = {"meta": {"app_name": "IMO", "stage": "overview", "_created_at_ms": 1700000000000},
+            "doctrine": {"unique_id": "u-1", "process_id": "p-1", "schema_version": "HEIR/1.0"}}
+    data = client.post("/api/ssot/save", json={"ssot": ssot}).json()
+    legacy = hashlib.sha256(json.dumps(_scrub(ssot)).encode("utf-8")).hexdigest()
+    assert data["ssot"]["doctrine"]["blueprint_version_hash"] == legacy
+    assert data["digests"][""] == legacy
+    assert set(data["digests"]) == {"", "/meta", "/doctrine"}
+
+def test_full_save_streams_hash_without_tree(monkeypatch):
+    def no_tree(*args, **kwargs):
+        raise AssertionError("a full save must not build a Merkle tree")
+    monkeypatch.setattr(main, "stamp_version_tree", no_tree)
+    ssot = {"meta": {"app_name": "IMO", "stage": "overview"}, "stages": [{"key": "s1", "x/y": [1, 2]}],
+            "doctrine": {"unique_id": "u-stream", "process_id": "p-1", "schema_version": "HEIR/1.0"}}
+    data = client.post("/api/ssot/save", json={"ssot": ssot}).json()
+    expected = subtree_digests(merkle_tree(data["ssot"], separators=main.SSOT_HASH_SEPARATORS))
+    assert data["digests"] == expected
+    assert data["ssot"]["doctrine"]["blueprint_version_hash"] == expected[""]
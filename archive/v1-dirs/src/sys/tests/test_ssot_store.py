@@ -0,0 +1,79 @@
+"""Tests for the content-addressed SSOT version store"""
+import pytest
+from fastapi.testclient import TestClient
+
+import src.server.main as main
+from src.server.blueprints.ssot_store import SSOTStore
+from src.server.blueprints.versioning import VersionCache
+
+def ssot(stage="overview", uid="shq-03-imo-1"):
+    return {"meta": {"app_name": "IMO", "stage": stage, "_created_at_ms": 1700000000000},
+            "doctrine": {"unique_id": uid, "process_id": f"p-{uid}", "schema_version": "HEIR/1.0"}}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("SSOT_STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(main, "_ssot_store", None)
+    monkeypatch.setattr(main, "ssot_versions", VersionCache(8))
+    yield TestClient(main.app)
+    main._ssot_store.close()
+
+def test_store_dedupes_and_keeps_history(tmp_path):
+    store = SSOTStore(tmp_path)
+    v1 = main.stamp_version_hash(ssot("overview"))
+    v2 = main.stamp_version_hash(ssot("build"))
+    assert store.put(v1) is True
+    assert store.put(v1) is False  # identical re-save: same blob, no new history row
+    assert store.put(v2) is True
+    assert store.put(v1) is False  # reverting reuses the blob but is new history
+
+    h1, h2 = (v["doctrine"]["blueprint_version_hash"] for v in (v1, v2))
+    assert [item["hash"] for item in store.history(unique_id="shq-03-imo-1")] == [h1, h2, h1]
+    assert store.get(h2) == v2
+    assert store.get("f" * 64) is None
+    assert store.stats()["blobs"] == 2 and store.stats()["versions"] == 3
+
+    page = store.history(unique_id="shq-03-imo-1", limit=2)
+    assert [item["hash"] for item in store.history(unique_id="shq-03-imo-1", before=page[-1]["seq"])] == [h1]
+    with pytest.raises(ValueError):
+        store.put({"doctrine": {"blueprint_version_hash": "../../etc/passwd"}})
+
+def test_saves_are_stored_and_fetchable(client):
+    saved = client.post("/api/ssot/save", json={"ssot": ssot()}).json()["ssot"]
+    version_hash = saved["doctrine"]["blueprint_version_hash"]
+
+    r = client.get(f"/api/ssot/{version_hash}")
+    assert r.status_code == 200 and r.json() == saved
+    assert client.get(f"/api/ssot/{version_hash}", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+    assert client.get(f"/api/ssot/{'0' * 64}").status_code == 404
+
+    history = client.get("/api/ssot/history", params={"process_id": "p-shq-03-imo-1"}).json()
+    assert [item["hash"] for item in history["items"]] == [version_hash]
+
+def test_unknown_version_is_404_even_when_revalidated(client):
+    missing = "0" * 64
+    assert client.get(f"/api/ssot/{missing}", headers={"If-None-Match": f'"{missing}"'}).status_code == 404
+
+def test_history_pages_past_the_limit_clamp(client):
+    for i in range(502):
+        client.post("/api/ssot/save", json={"ssot": ssot(stage=f"s{i}")})
+    page = client.get("/api/ssot/history", params={"limit": 1000}).json()
+    assert len(page["items"]) == 500 and page["next_before"] == page["items"][-1]["seq"]
+    rest = client.get("/api/ssot/history", params={"limit": 1000, "before": page["next_before"]}).json()
+    assert len(rest["items"]) == 2 and rest["next_before"] is None
+
+def test_delta_base_loaded_from_store_after_restart(client, monkeypatch):
+    base = client.post("/api/ssot/save", json={"ssot": ssot()}).json()["ssot"]["doctrine"]["blueprint_version_hash"]
+    monkeypatch.setattr(main, "ssot_versions", VersionCache(8))  # cold cache
+
+    r = client.post("/api/ssot/save", json={"unique_id": "shq-03-imo-1", "base_hash": base,
+                                            "patch": [{"op": "replace", "path": "/meta/stage", "value": "build"}]})
+    assert r.status_code == 200
+    expected = main.stamp_version_hash(main.ensure_ids(ssot("build")))["doctrine"]["blueprint_version_hash"]
+    assert r.json()["blueprint_version_hash"] == expected
+    assert len(client.get("/api/ssot/history", params={"unique_id": "shq-03-imo-1"}).json()["items"]) == 2
+
+def test_store_disabled_without_dir(monkeypatch):
+    monkeypatch.delenv("SSOT_STORE_DIR", raising=False)
+    monkeypatch.setattr(main, "_ssot_store", None)
+    assert TestClient(main.app).get("/api/ssot/history").status_code == 503
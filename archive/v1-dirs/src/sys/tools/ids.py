@@ -10,7 +10,9 @@ checksum: 16400ba8
 
 """ID generation helpers for process, run, stage, and artifact identifiers"""
 from datetime import datetime
+import gzip
 import hashlib
+import re
 
 def _short_hash(text: str, length: int = 8) -> str:
     """Generate short hash from text"""
@@ -40,4 +42,239 @@ def stage_id(process_id: str, bucket: str, stage_key: str) -> str:
 def artifact_id(stage_id: str, fingerprint: str) -> str:
     """Generate artifact ID"""
     short_hash = _short_hash(f"{stage_id}{fingerprint}")
-    return f"ART::{stage_id}::{short_hash}"
\ No newline at end of file
+    return f"ART::{stage_id}::{short_hash}"
+
+# Token layout per kind after splitting on "::" (PRC is always 5 tokens)
+_PROCESS_START = {"PRC": 0, "RUN": 1, "STG": 1, "ART": 2}
+_TOKEN_COUNT = {"PRC": 5, "RUN": 8, "STG": 9, "ART": 11}
+
+class ParsedId:
+    """A parsed PRC/RUN/STG/ART identifier.
+
+    Holds the original string and the offsets of its "::" separators; fields
+    are sliced out on access, so parsing allocates one tuple per ID.
+    """
+    __slots__ = ("raw", "kind", "_cuts")
+
+    def __init__(self, raw: str, kind: str, cuts: tuple):
+        self.raw = raw
+        self.kind = kind
+        self._cuts = cuts
+
+    def _token(self, i: int) -> str:
+        cuts = self._cuts
+        start = cuts[i - 1] + 2 if i else 0
+        return self.raw[start:cuts[i]] if i < len(cuts) else self.raw[start:]
+
+    def _span(self, first: int, last: int) -> str:
+        cuts = self._cuts
+        start = cuts[first - 1] + 2 if first else 0
+        return self.raw[start:cuts[last]] if last < len(cuts) else self.raw[start:]
+
+    @property
+    def process_id(self) -> str:
+        p = _PROCESS_START[self.kind]
+        return self._span(p, p + 4)
+
+    @property
+    def slug(self) -> str:
+        return self._token(_PROCESS_START[self.kind] + 1)
+
+    @property
+    def semver(self) -> str:
+        return self._token(_PROCESS_START[self.kind] + 2)[1:]
+
+    @property
+    def date(self) -> str:
+        """Process date, YYYYMMDD"""
+        return self._token(_PROCESS_START[self.kind] + 3)
+
+    @property
+    def short(self) -> str:
+        return self._token(len(self._cuts))
+
+    @property
+    def run_timestamp(self):
+        return self._token(6) if self.kind == "RUN" else None
+
+    @property
+    def run_date(self):
+        return self._token(6)[:8] if self.kind == "RUN" else None
+
+    @property
+    def stage_id(self):
+        if self.kind == "STG":
+            return self.raw
+        return self._span(1, 9) if self.kind == "ART" else None
+
+    @property
+    def bucket(self):
+        s = {"STG": 6, "ART": 7}.get(self.kind)
+        return self._token(s) if s else None
+
+    @property
+    def stage_key(self):
+        s = {"STG": 7, "ART": 8}.get(self.kind)
+        return self._token(s) if s else None
+
+    def __repr__(self) -> str:
+        return f"ParsedId({self.raw!r})"
+
+def parse_id(raw: str) -> ParsedId:
+    """Parse an ID built by process_id()/run_id()/stage_id()/artifact_id(); raises ValueError"""
+    kind = raw[:3]
+    expected = _TOKEN_COUNT.get(kind)
+    if expected is None or raw[3:5] != "::":
+        raise ValueError(f"Not a PRC/RUN/STG/ART id: {raw!r}")
+    cuts = []
+    find = raw.find
+    at = find("::")
+    while at != -1:
+        cuts.append(at)
+        at = find("::", at + 2)
+    if len(cuts) != expected - 1:
+        raise ValueError(f"{kind} id needs {expected} '::'-separated parts: {raw!r}")
+    parsed = ParsedId(raw, kind, tuple(cuts))
+    p = _PROCESS_START[kind]
+    if parsed._token(p) != "PRC" or (kind == "ART" and parsed._token(1) != "STG"):
+        raise ValueError(f"Malformed {kind} id: {raw!r}")
+    return parsed
+
+ID_PATTERN = re.compile(r"\b(?:ART|STG|RUN|PRC)(?:::[\w.\-]+)+")
+
+class _ProcessNode:
+    __slots__ = ("process", "runs", "stages", "artifacts")
+
+    def __init__(self):
+        self.process = None
+        self.runs = {}        # run date -> [ParsedId]
+        self.stages = {}      # bucket -> stage_key -> [ParsedId]
+        self.artifacts = {}   # stage_id -> [ParsedId]
+
+class IdIndex:
+    """Prefix tree over process IDs (slug -> semver -> date -> short) whose leaves
+    hold that process's runs by date, stages by bucket/key and artifacts by stage.
+
+    Adding a RUN/STG/ART also registers the IDs it embeds. Lookups walk the tree
+    (or the by-date / by-bucket / by-stage-key / all-artifacts side tables)
+    instead of scanning every ID.
+    """
+
+    def __init__(self):
+        self._tree = {}
+        self._seen = {}
+        self._runs_by_date = {}
+        self._stages_by_bucket = {}
+        self._stages_by_key = {}
+        self._artifacts = []
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def get(self, raw: str):
+        return self._seen.get(raw)
+
+    def _node(self, process: ParsedId) -> _ProcessNode:
+        level = self._tree
+        for key in (process.slug, process.semver, process.date):
+            level = level.setdefault(key, {})
+        node = level.get(process.short)
+        if node is None:
+            node = level[process.short] = _ProcessNode()
+        return node
+
+    def add(self, raw) -> ParsedId:
+        parsed = raw if isinstance(raw, ParsedId) else parse_id(raw)
+        existing = self._seen.get(parsed.raw)
+        if existing is not None:
+            return existing
+        self._seen[parsed.raw] = parsed
+        if parsed.kind == "PRC":
+            self._node(parsed).process = parsed
+            return parsed
+        process = self.add(parsed.process_id)
+        node = self._node(process)
+        if parsed.kind == "RUN":
+            node.runs.setdefault(parsed.run_date, []).append(parsed)
+            self._runs_by_date.setdefault(parsed.run_date, []).append(parsed)
+        elif parsed.kind == "STG":
+            node.stages.setdefault(parsed.bucket, {}).setdefault(parsed.stage_key, []).append(parsed)
+            self._stages_by_bucket.setdefault(parsed.bucket, []).append(parsed)
+            self._stages_by_key.setdefault(parsed.stage_key, []).append(parsed)
+        else:
+            self.add(parsed.stage_id)
+            node.artifacts.setdefault(parsed.stage_id, []).append(parsed)
+            self._artifacts.append(parsed)
+        return parsed
+
+    def add_many(self, ids) -> int:
+        """Add every parsable ID; returns how many were new"""
+        before = len(self._seen)
+        for raw in ids:
+            try:
+                self.add(raw)
+            except ValueError:
+                continue
+        return len(self._seen) - before
+
+    def add_text(self, text: str) -> int:
+        """Index every ID mentioned in free text (an NDJSON line, an SSOT blob)"""
+        return self.add_many(ID_PATTERN.findall(text))
+
+    def load_ndjson(self, source) -> int:
+        """Index an NDJSON file (plain or .gz), or any sidecar log with scan()
+        (SegmentLog, StreamReader, MergedLog), which also reads sealed segments"""
+        if hasattr(source, "scan"):
+            return sum(self.add_text(line.decode("utf-8", "replace")) for line in source.scan() if b"::" in line)
+        opener = gzip.open if str(source).endswith(".gz") else open
+        with opener(source, "rt", encoding="utf-8", errors="replace") as f:
+            return sum(self.add_text(line) for line in f if "::" in line)
+
+    def _nodes(self, slug=None, semver=None, date=None):
+        """Process nodes under a (slug, semver, date) prefix of the tree"""
+        levels = [self._tree]
+        for key in (slug, semver, date):
+            if key is None:
+                levels = [child for level in levels for child in level.values()]
+            else:
+                levels = [level[key] for level in levels if key in level]
+        return [node for level in levels for node in level.values()]
+
+    def _process_nodes(self, process_id=None, slug=None, semver=None, date=None):
+        if process_id is not None:
+            p = parse_id(process_id)
+            node = self._tree.get(p.slug, {}).get(p.semver, {}).get(p.date, {}).get(p.short)
+            return [node] if node is not None else []
+        return self._nodes(slug.upper() if slug else None, semver, date)
+
+    def processes(self, slug=None, semver=None, date=None):
+        return [n.process for n in self._nodes(slug.upper() if slug else None, semver, date) if n.process]
+
+    def runs(self, process_id=None, date=None):
+        if process_id is None:
+            if date is not None:
+                return list(self._runs_by_date.get(date, ()))
+            return [r for runs in self._runs_by_date.values() for r in runs]
+        return [r for node in self._process_nodes(process_id) for d, runs in node.runs.items()
+                if date is None or d == date for r in runs]
+
+    def stages(self, process_id=None, bucket=None, stage_key=None):
+        bucket = bucket.upper() if bucket else None
+        if process_id is None:
+            if stage_key is not None:
+                return [s for s in self._stages_by_key.get(stage_key, ()) if bucket is None or s.bucket == bucket]
+            if bucket is not None:
+                return list(self._stages_by_bucket.get(bucket, ()))
+            return [s for stages in self._stages_by_bucket.values() for s in stages]
+        nodes = self._process_nodes(process_id)
+        return [s for node in nodes for b, keys in node.stages.items() if bucket is None or b == bucket
+                for k, stages in keys.items() if stage_key is None or k == stage_key for s in stages]
+
+    def artifacts(self, process_id=None, stage_id=None):
+        if stage_id is not None:
+            node = self._process_nodes(parse_id(stage_id).process_id)
+            return list(node[0].artifacts.get(stage_id, ())) if node else []
+        if process_id is None:
+            return list(self._artifacts)
+        nodes = self._process_nodes(process_id)
+        return [a for node in nodes for arts in node.artifacts.values() for a in arts]
@@ -0,0 +1,22 @@
+"""Strong ETag helpers for conditional blueprint requests"""
+
+import hashlib
+from typing import Optional
+
+def etag_for(data: bytes) -> str:
+    return '"' + hashlib.sha256(data).hexdigest() + '"'
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """True if an If-None-Match / If-Match header value names etag (or is "*").
+
+    If-None-Match uses weak comparison; pass weak=False for If-Match.
+    """
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag:
+            return True
+        if weak and tag.startswith("W/") and tag[2:] == etag:
+            return True
+    return False
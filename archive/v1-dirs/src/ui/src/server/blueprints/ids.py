@@ -8,30 +8,78 @@ created: 2025-10-23T16:37:02.032154
 checksum: a586ea7e
 """
 
-import os, time, hashlib, base64
-from typing import Dict
+import os, time, base64, threading
+from typing import Dict, List, Optional
 
 def _ts_ms() -> int:
     return int(time.time() * 1000)
 
-def _rand16(seed: str) -> str:
-    h = hashlib.sha256(seed.encode("utf-8")).digest()
-    return base64.b32encode(h[:10]).decode("utf-8").rstrip("=")
-
 def _compact_ts(ts_ms: int) -> str:
     import datetime as dt
     t = dt.datetime.fromtimestamp(ts_ms/1000.0, dt.timezone.utc)
     return t.strftime("%Y%m%d-%H%M%S")
 
+_MASK40 = (1 << 40) - 1
+_SCRAMBLE = 0x9E3779B97F & _MASK40 | 1  # odd, so multiplying is a bijection mod 2**40
+_B32 = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+_B32_PAIRS = [a + b for a in _B32 for b in _B32]  # 10 bits -> 2 characters
+
+class IdAllocator:
+    """Mints unique_id suffixes from per-process entropy and a monotonic counter.
+
+    The 16-character suffix is base32 of 40 bits of process entropy followed by
+    the 40-bit counter, scrambled by an invertible mix so consecutive IDs do
+    not look sequential. IDs from one process never repeat (for 2**40 mints);
+    two processes collide only if they drew the same entropy (2**-40) and
+    minted the same counter within the same second. Entropy and the counter
+    are redrawn in a forked child.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._head_cache = (None, "")
+        self._reseed()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reseed)
+
+    def _reseed(self) -> None:
+        self._entropy = base64.b32encode(os.urandom(5)).decode("ascii")
+        self._mix = int.from_bytes(os.urandom(5), "big")
+        self._counter = 0
+
+    def _reserve(self, n: int) -> int:
+        with self._lock:
+            start = self._counter
+            if start + n > _MASK40:
+                raise OverflowError("IdAllocator counter exhausted")
+            self._counter = start + n
+        return start
+
+    def _head(self, ts_ms: Optional[int]) -> str:
+        """db-subhive-app-YYYYMMDD-HHMMSS-<entropy>, recomputed once per second"""
+        key = (os.getenv("DOCTRINE_DB", "shq"), os.getenv("DOCTRINE_SUBHIVE", "03"),
+               os.getenv("DOCTRINE_APP", "imo"), int(ts_ms or _ts_ms()) // 1000, self._entropy)
+        cached_key, head = self._head_cache
+        if key != cached_key:
+            db, subhive, app, seconds, entropy = key
+            head = f"{db}-{subhive}-{app}-{_compact_ts(seconds * 1000)}-{entropy}"
+            self._head_cache = (key, head)
+        return head
+
+    def mint_many(self, n: int, ts_ms: Optional[int] = None) -> List[str]:
+        """n distinct unique_ids sharing one timestamp (now, unless given)"""
+        head = self._head(ts_ms)
+        start, mix, pairs = self._reserve(n), self._mix, _B32_PAIRS
+        return [f"{head}{pairs[v >> 30]}{pairs[v >> 20 & 1023]}{pairs[v >> 10 & 1023]}{pairs[v & 1023]}"
+                for v in [(i * _SCRAMBLE & _MASK40) ^ mix for i in range(start, start + n)]]
+
+    def mint(self, ts_ms: Optional[int] = None) -> str:
+        return self.mint_many(1, ts_ms)[0]
+
+id_allocator = IdAllocator()
+
 def generate_unique_id(ssot: Dict) -> str:
-    db        = os.getenv("DOCTRINE_DB", "shq")
-    subhive   = os.getenv("DOCTRINE_SUBHIVE", "03")
-    app       = os.getenv("DOCTRINE_APP", "imo")
-    ts_ms     = int(ssot.get("meta", {}).get("_created_at_ms") or _ts_ms())
-    app_name  = (ssot.get("meta", {}).get("app_name") or "imo-creator").strip()
-    seed      = f"{db}|{subhive}|{app}|{app_name}|{ts_ms}"
-    r = _rand16(seed)
-    return f"{db}-{subhive}-{app}-{_compact_ts(ts_ms)}-{r}"
+    return id_allocator.mint(ssot.get("meta", {}).get("_created_at_ms"))
 
 def generate_process_id(ssot: Dict) -> str:
     db      = os.getenv("DOCTRINE_DB", "shq")
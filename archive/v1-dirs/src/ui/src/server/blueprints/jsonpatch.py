@@ -0,0 +1,135 @@
+"""RFC 6902 JSON Patch, applied copy-on-write.
+
+Only the containers along each patched path are copied; every other subtree is
+shared with the input document, which is what lets merkle_tree() reuse their
+encodings. Neither the input document nor the patch values are mutated.
+"""
+
+from typing import Any, Iterable, List, Mapping
+
+class PatchError(ValueError):
+    """The patch is malformed, points at a missing location, or a test op failed"""
+
+def parse_pointer(pointer: Any) -> List[str]:
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer.split("/")[1:]]
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    i = int(token)
+    if i > len(container) or (i == len(container) and not allow_end):
+        raise PatchError(f"Array index out of range: {i}")
+    return i
+
+def _child(node: Any, token: str) -> Any:
+    if isinstance(node, dict):
+        if token not in node:
+            raise PatchError(f"Missing member: {token!r}")
+        return node[token]
+    if isinstance(node, list):
+        return node[_index(node, token)]
+    raise PatchError(f"Cannot descend into a scalar at {token!r}")
+
+def resolve(doc: Any, tokens: List[str]) -> Any:
+    for token in tokens:
+        doc = _child(doc, token)
+    return doc
+
+def _edit(node: Any, tokens: List[str], fn) -> Any:
+    """Copy the containers along tokens[:-1] and let fn(parent_copy, last_token) edit the last one"""
+    if isinstance(node, dict):
+        node = dict(node)
+    elif isinstance(node, list):
+        node = list(node)
+    else:
+        raise PatchError(f"Cannot descend into a scalar at {tokens[0]!r}")
+    if len(tokens) == 1:
+        fn(node, tokens[0])
+    else:
+        key = tokens[0] if isinstance(node, dict) else _index(node, tokens[0])
+        node[key] = _edit(_child(node, tokens[0]), tokens[1:], fn)
+    return node
+
+def _add(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    def fn(parent, token):
+        if isinstance(parent, dict):
+            parent[token] = value
+        else:
+            parent.insert(_index(parent, token, allow_end=True), value)
+    return _edit(doc, tokens, fn)
+
+def _remove(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise PatchError("Cannot remove the document root")
+    def fn(parent, token):
+        if isinstance(parent, dict):
+            if token not in parent:
+                raise PatchError(f"Missing member: {token!r}")
+            del parent[token]
+        else:
+            del parent[_index(parent, token)]
+    return _edit(doc, tokens, fn)
+
+def _replace(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    def fn(parent, token):
+        if isinstance(parent, dict):
+            if token not in parent:
+                raise PatchError(f"Missing member: {token!r}")
+            parent[token] = value
+        else:
+            parent[_index(parent, token)] = value
+    return _edit(doc, tokens, fn)
+
+def json_equal(a: Any, b: Any) -> bool:
+    """Equality by JSON type: unlike ==, true is not 1 and 1 is not "1" """
+    if isinstance(a, bool) or isinstance(b, bool) or a is None or b is None:
+        return a is b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+def apply_patch(doc: Any, patch: Iterable[Mapping[str, Any]]) -> Any:
+    """Return doc with every operation applied in order; raises PatchError"""
+    if not isinstance(patch, list):
+        raise PatchError("A JSON Patch must be an array of operations")
+    for operation in patch:
+        if not isinstance(operation, dict) or "path" not in operation:
+            raise PatchError(f"Invalid operation: {operation!r}")
+        op = operation.get("op")
+        tokens = parse_pointer(operation["path"])
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f"{op} requires a value")
+        if op == "add":
+            doc = _add(doc, tokens, operation["value"])
+        elif op == "remove":
+            doc = _remove(doc, tokens)
+        elif op == "replace":
+            doc = _replace(doc, tokens, operation["value"])
+        elif op in ("move", "copy"):
+            source = parse_pointer(operation.get("from"))
+            value = resolve(doc, source)
+            if op == "move":
+                if tokens[:len(source)] == source and len(tokens) > len(source):
+                    raise PatchError("Cannot move a value into one of its own children")
+                if tokens == source:
+                    continue
+                doc = _remove(doc, source)
+            doc = _add(doc, tokens, value)
+        elif op == "test":
+            if not json_equal(resolve(doc, tokens), operation["value"]):
+                raise PatchError(f"Test failed at {operation['path']}")
+        else:
+            raise PatchError(f"Unknown op: {op!r}")
+    return doc
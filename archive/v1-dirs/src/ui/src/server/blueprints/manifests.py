@@ -0,0 +1,87 @@
+"""Cached manifest.yaml reads and atomic, ETag-guarded writes"""
+
+import os, tempfile, threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .etags import etag_for, etag_matches
+
+class PreconditionFailed(Exception):
+    """If-Match did not name the manifest's current ETag"""
+
+    def __init__(self, current_etag: Optional[str]):
+        super().__init__("Manifest was modified by another writer")
+        self.current_etag = current_etag
+
+def _stat_key(st: os.stat_result) -> Tuple[int, int, int, int]:
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+class ManifestStore:
+    """Keeps (bytes, etag) per manifest path, revalidated by device/inode/mtime/size.
+
+    An external edit or an atomic replace changes the inode or mtime, so a single
+    os.stat() per request is enough to know whether the cached bytes are current.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int, int, int], bytes, str]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def read(self, path: Path) -> Optional[Tuple[bytes, str]]:
+        """Return (bytes, etag), or None if the manifest does not exist"""
+        key = str(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(key, None)
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == _stat_key(st):
+            return entry[1], entry[2]
+        with open(path, "rb") as f:
+            data = f.read()
+            st = os.fstat(f.fileno())
+        etag = etag_for(data)
+        self._entries[key] = (_stat_key(st), data, etag)
+        return data, etag
+
+    def write(self, path: Path, data: bytes, if_match: Optional[str] = None) -> str:
+        """Atomically replace the manifest (temp file + rename); returns the new ETag.
+
+        Raises PreconditionFailed when if_match is given and does not match the
+        manifest currently on disk.
+        """
+        path = Path(path)
+        with self._lock_for(str(path)):
+            if if_match is not None:
+                current = self.read(path)
+                current_etag = current[1] if current else None
+                if current_etag is None or not etag_matches(if_match, current_etag, weak=False):
+                    raise PreconditionFailed(current_etag)
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                mode = os.stat(path).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o644
+            fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(tmp, mode)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+
+            etag = etag_for(data)
+            self._entries[str(path)] = (_stat_key(os.stat(path)), data, etag)
+            return etag
@@ -0,0 +1,68 @@
+"""In-process blueprint scoring memoized by manifest content hash"""
+
+import hashlib, json, os
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import yaml
+
+from ..infra.lru import LRUCache
+
+def manifest_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class ScoreCache:
+    """LRU of slug -> (manifest sha256, parsed manifest, progress).
+
+    A hit requires the manifest bytes to hash to the same digest that produced
+    the cached progress, so edits are picked up without any explicit invalidation.
+    """
+
+    def __init__(self, score_fn: Callable[[dict, str], dict], max_entries: Optional[int] = None,
+                 reader: Callable[[Path], bytes] = lambda p: Path(p).read_bytes()):
+        self.score_fn = score_fn
+        self.reader = reader
+        self.max_entries = max_entries or int(os.getenv("BLUEPRINT_SCORE_CACHE_SIZE", "128"))
+        self._entries = LRUCache(max_entries=self.max_entries)
+
+    def get(self, slug: str, digest: str) -> Optional[Tuple[dict, dict]]:
+        entry = self._entries.get(slug, lambda e: e[0] == digest)
+        return None if entry is None else (entry[1], entry[2])
+
+    def put(self, slug: str, digest: str, manifest: dict, progress: dict) -> None:
+        self._entries.put(slug, (digest, manifest, progress))
+
+    def load_bytes(self, slug: str, data: bytes) -> Tuple[dict, dict, bool]:
+        """Parse and score raw manifest bytes; returns (manifest, progress, cache_hit)"""
+        digest = manifest_digest(data)
+        entry = self.get(slug, digest)
+        if entry is not None:
+            return entry[0], entry[1], True
+        manifest = yaml.safe_load(data.decode()) or {}
+        progress = self.score_fn(manifest, slug)
+        self.put(slug, digest, manifest, progress)
+        return manifest, progress, False
+
+    def load_path(self, slug: str, manifest_path: Path) -> Tuple[dict, dict, bool]:
+        """Like load_bytes, reading manifest.yaml; writes nothing"""
+        return self.load_bytes(slug, self.reader(manifest_path))
+
+    def score_bytes(self, slug: str, data: bytes) -> Tuple[dict, bool]:
+        """Score raw manifest bytes; returns (progress, cache_hit)"""
+        _, progress, hit = self.load_bytes(slug, data)
+        return progress, hit
+
+    def score_path(self, slug: str, manifest_path: Path) -> Tuple[dict, bool]:
+        """Score manifest.yaml and refresh the sibling progress.json on a miss, or if
+        it has gone missing; returns (progress, cache_hit)"""
+        _, progress, hit = self.load_path(slug, manifest_path)
+        progress_path = Path(manifest_path).parent / "progress.json"
+        if not hit or not progress_path.exists():
+            tmp = progress_path.with_name(progress_path.name + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(progress, f, indent=2)
+            os.replace(tmp, progress_path)
+        return progress, hit
+
+    def stats(self) -> Dict[str, int]:
+        return self._entries.stats()
@@ -0,0 +1,151 @@
+"""Content-addressed SSOT versions: zlib blobs named by blueprint_version_hash,
+plus a SQLite index of save history by unique_id / process_id"""
+
+import json, os, re, sqlite3, tempfile, threading, time, zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    created_ms INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    unique_id TEXT NOT NULL,
+    process_id TEXT,
+    hash TEXT NOT NULL REFERENCES blobs(hash),
+    saved_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS versions_by_unique_id ON versions (unique_id, seq);
+CREATE INDEX IF NOT EXISTS versions_by_process_id ON versions (process_id, seq);
+"""
+
+class SSOTStore:
+    """Stamped SSOTs stored once per version hash under objects/ab/cdef...json.z.
+
+    The blob path is derived from the hash, so fetch-by-hash is a single open
+    with no index lookup. A blob is written (atomically) before its index row,
+    so the index never names a missing blob. Saving a version identical to the
+    unique_id's latest one adds no history row; versions that differ only in
+    scrubbed fields (timestamps) share a hash and therefore a blob.
+    """
+
+    def __init__(self, root: Union[str, Path], level: int = 6):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.level = level
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def _path(self, version_hash: str) -> Path:
+        if not HASH_RE.fullmatch(version_hash or ""):
+            raise ValueError(f"Not a blueprint_version_hash: {version_hash!r}")
+        return self.objects / version_hash[:2] / f"{version_hash[2:]}.json.z"
+
+    def put(self, ssot: Dict[str, Any]) -> bool:
+        """Store a stamped SSOT and record it in its history; True if the blob is new"""
+        doctrine = ssot.get("doctrine") or {}
+        version_hash = doctrine.get("blueprint_version_hash")
+        path = self._path(version_hash)
+        created = not path.exists()
+        if created:
+            data = json.dumps(ssot, separators=(",", ":"), sort_keys=True).encode("utf-8")
+            blob = zlib.compress(data, self.level)
+            path.parent.mkdir(exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(blob)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        now = int(time.time() * 1000)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if created:
+                    self._db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                                     (version_hash, len(data), len(blob), now))
+                elif self._db.execute("SELECT 1 FROM blobs WHERE hash = ?", (version_hash,)).fetchone() is None:
+                    # Blob left behind by a save that died before its index row
+                    blob = path.read_bytes()
+                    self._db.execute("INSERT INTO blobs VALUES (?, ?, ?, ?)",
+                                     (version_hash, len(zlib.decompress(blob)), len(blob), now))
+                unique_id = doctrine.get("unique_id") or ""
+                row = self._db.execute("SELECT hash FROM versions WHERE unique_id = ? ORDER BY seq DESC LIMIT 1",
+                                       (unique_id,)).fetchone()
+                if row is None or row[0] != version_hash:
+                    self._db.execute("INSERT INTO versions (unique_id, process_id, hash, saved_ms) VALUES (?, ?, ?, ?)",
+                                     (unique_id, doctrine.get("process_id"), version_hash, now))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return created
+
+    def get_bytes(self, version_hash: str) -> Optional[bytes]:
+        """Compact JSON of a stored version, or None"""
+        try:
+            with open(self._path(version_hash), "rb") as f:
+                return zlib.decompress(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def has(self, version_hash: str) -> bool:
+        try:
+            return self._path(version_hash).exists()
+        except ValueError:
+            return False
+
+    def get(self, version_hash: str) -> Optional[Dict[str, Any]]:
+        data = self.get_bytes(version_hash)
+        return json.loads(data) if data is not None else None
+
+    def latest(self, unique_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT hash FROM versions WHERE unique_id = ? ORDER BY seq DESC LIMIT 1",
+                                   (unique_id,)).fetchone()
+        return row[0] if row else None
+
+    def history(self, unique_id: Optional[str] = None, process_id: Optional[str] = None,
+                limit: int = 50, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest-first saves, optionally for one unique_id / process_id; page with before=<seq>"""
+        where, params = [], []
+        for column, value in (("unique_id", unique_id), ("process_id", process_id)):
+            if value is not None:
+                where.append(f"v.{column} = ?")
+                params.append(value)
+        if before is not None:
+            where.append("v.seq < ?")
+            params.append(before)
+        sql = ("SELECT v.seq, v.hash, v.unique_id, v.process_id, v.saved_ms, b.size, b.stored_size "
+               "FROM versions v JOIN blobs b ON b.hash = v.hash")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY v.seq DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit)).fetchall()
+        keys = ("seq", "hash", "unique_id", "process_id", "saved_ms", "size", "stored_size")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            blobs, size, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+            versions = self._db.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+        return {"root": str(self.root), "blobs": blobs, "versions": versions,
+                "bytes": size, "stored_bytes": stored}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,22 @@
+"""Load blueprint CLI tools (blueprint_score.py, blueprint_visual.py) in-process"""
+
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+from typing import Dict
+
+_loaded: Dict[str, ModuleType] = {}
+
+def load_tool(tools_dir: Path, name: str) -> ModuleType:
+    """Import tools_dir/<name>.py once and reuse the module for every request"""
+    path = Path(tools_dir) / f"{name}.py"
+    key = str(path.resolve())
+    mod = _loaded.get(key)
+    if mod is None:
+        spec = importlib.util.spec_from_file_location(name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot load blueprint tool {path}")
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        _loaded[key] = mod
+    return mod
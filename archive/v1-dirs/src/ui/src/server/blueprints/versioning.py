@@ -9,6 +9,10 @@ checksum: 7ab2dc21
 """
 
 import json, hashlib
+from json.encoder import encode_basestring_ascii
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from ..infra.lru import LRUCache
 
 OMIT = {"timestamp_last_touched", "_created_at_ms", "blueprint_version_hash"}
 
@@ -22,11 +26,201 @@ def _scrub(o):
 def canonicalize(ssot: dict) -> str:
     return json.dumps(_scrub(ssot), separators=(",", ":"), sort_keys=True)
 
-def stamp_version_hash(ssot: dict) -> dict:
-    canon = canonicalize(ssot)
-    h = hashlib.sha256(canon.encode("utf-8")).hexdigest()
+_CHUNK = 1 << 16
+
+def _flat(o) -> bool:
+    """A container holding only scalars (and no huge strings) can be dumped in one C call"""
+    for v in (o.values() if isinstance(o, dict) else o):
+        if isinstance(v, (dict, list)) or (isinstance(v, str) and len(v) > _CHUNK):
+            return False
+    return isinstance(o, list) or OMIT.isdisjoint(o)
+
+def iter_canonical(o: Any, separators: Tuple[str, str] = (",", ":")) -> Iterator[str]:
+    """canonicalize(o) in pieces, without building the scrubbed copy or the whole string"""
+    item_sep, key_sep = separators
+    if isinstance(o, str) and len(o) > _CHUNK:
+        yield '"'
+        for i in range(0, len(o), _CHUNK):
+            yield encode_basestring_ascii(o[i:i + _CHUNK])[1:-1]
+        yield '"'
+    elif isinstance(o, (dict, list)) and not _flat(o):
+        if isinstance(o, dict):
+            yield "{"
+            first = True
+            for k in sorted(o):
+                if k in OMIT:
+                    continue
+                prefix = "" if first else item_sep
+                first = False
+                yield prefix + json.dumps(k if isinstance(k, str) else json.dumps(k)) + key_sep
+                yield from iter_canonical(o[k], separators)
+            yield "}"
+        else:
+            yield "["
+            for i, v in enumerate(o):
+                if i:
+                    yield item_sep
+                yield from iter_canonical(v, separators)
+            yield "]"
+    else:
+        yield json.dumps(o, separators=separators, sort_keys=True)
+
+def canonical_hash(o: Any, separators: Tuple[str, str] = (",", ":")) -> str:
+    """sha256(canonicalize(o)) fed from iter_canonical() in ~64 KiB blocks"""
+    h = hashlib.sha256()
+    buf, size = [], 0
+    for piece in iter_canonical(o, separators):
+        buf.append(piece)
+        size += len(piece)
+        if size >= _CHUNK:
+            h.update("".join(buf).encode("utf-8"))
+            buf, size = [], 0
+    h.update("".join(buf).encode("utf-8"))
+    return h.hexdigest()
+
+class MerkleNode:
+    """A dict/list subtree: its canonical encoding as byte chunks interleaved with
+    child nodes, so a digest can be taken at any level without re-encoding"""
+    __slots__ = ("value", "parts", "children", "_digest")
+
+    def __init__(self, value: Any, parts: list, children: Dict[Any, "MerkleNode"]):
+        self.value = value
+        self.parts = parts
+        self.children = children
+        self._digest: Optional[str] = None
+
+    def feed(self, h) -> None:
+        for part in self.parts:
+            if isinstance(part, bytes):
+                h.update(part)
+            else:
+                part.feed(h)
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            h = hashlib.sha256()
+            self.feed(h)
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def encoding(self) -> str:
+        return b"".join(p if isinstance(p, bytes) else p.encoding().encode("utf-8") for p in self.parts).decode("utf-8")
+
+def merkle_tree(o: Any, previous: Optional[MerkleNode] = None,
+                separators: Tuple[str, str] = (",", ":")) -> MerkleNode:
+    """Per-subtree canonical encodings of `o`; the root digest equals
+    sha256(canonicalize(o)) for the same separators.
+
+    Subtrees that are the same object as in `previous` (built with the same
+    separators) are reused with their cached digests, so a copy-on-write edit
+    only re-encodes the containers along the edited path. Hashed objects must
+    not be mutated in place afterwards.
+    """
+    if previous is not None and previous.value is o:
+        return previous
+    old = previous.children if previous is not None else {}
+    item_sep, key_sep = separators
+    if isinstance(o, (dict, list)) and _flat(o):
+        # Flat container: one C-level dump instead of one per leaf
+        return MerkleNode(o, [json.dumps(o, separators=separators, sort_keys=True).encode("utf-8")], {})
+    if isinstance(o, dict):
+        items = ((k, o[k]) for k in sorted(o) if k not in OMIT)
+        buf, close = ["{"], "}"
+    elif isinstance(o, list):
+        items = enumerate(o)
+        buf, close = ["["], "]"
+    else:
+        return MerkleNode(o, [json.dumps(o, separators=separators, sort_keys=True).encode("utf-8")], {})
+    parts: list = []
+    children: Dict[Any, MerkleNode] = {}
+    for i, (k, v) in enumerate(items):
+        if i:
+            buf.append(item_sep)
+        if close == "}":
+            buf.append(json.dumps(k if isinstance(k, str) else json.dumps(k)))
+            buf.append(key_sep)
+        if isinstance(v, (dict, list)):
+            parts.append("".join(buf).encode("utf-8"))
+            buf = []
+            child = children[k] = merkle_tree(v, old.get(k), separators)
+            parts.append(child)
+        else:
+            buf.append(json.dumps(v, separators=separators, sort_keys=True))
+    buf.append(close)
+    parts.append("".join(buf).encode("utf-8"))
+    return MerkleNode(o, parts, children)
+
+def _pointer(path: str, key: Any) -> str:
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+def canonical_digests(o: Any, depth: int = 2, separators: Tuple[str, str] = (",", ":"),
+                      path: str = "", root: Optional[str] = None) -> Dict[str, str]:
+    """subtree_digests() without a tree: each subtree is hashed with canonical_hash(),
+    so no encoding is kept (at the cost of re-encoding each level once more).
+    `root` is the digest of `o` when it is already known."""
+    digests = {path: root or canonical_hash(o, separators)}
+    if depth > 0:
+        if isinstance(o, dict):
+            items = ((k, o[k]) for k in sorted(o) if k not in OMIT)
+        else:
+            items = enumerate(o) if isinstance(o, list) else iter(())
+        for k, v in items:
+            if isinstance(v, (dict, list)):
+                digests.update(canonical_digests(v, depth - 1, separators, _pointer(path, k)))
+    return digests
+
+def subtree_digests(tree: MerkleNode, depth: int = 2, path: str = "") -> Dict[str, str]:
+    """JSON-pointer path -> digest for every subtree down to `depth` ("" is the root)"""
+    digests = {path: tree.digest}
+    if depth > 0:
+        for k, child in tree.children.items():
+            digests.update(subtree_digests(child, depth - 1, _pointer(path, k)))
+    return digests
+
+def stamp_version_tree(ssot: dict, previous: Optional[MerkleNode] = None,
+                       separators: Tuple[str, str] = (",", ":")) -> Tuple[dict, MerkleNode]:
+    """stamp_version_hash() that also returns the Merkle tree of the stamped SSOT"""
+    tree = merkle_tree(ssot, previous, separators)
+    had_doctrine = isinstance(ssot.get("doctrine"), dict)
+    ssot = _stamp(ssot, tree.digest)
+    if had_doctrine:
+        # The hash key is scrubbed, so the encodings still hold: rebind the copies
+        tree.value = ssot
+        tree.children["doctrine"].value = ssot["doctrine"]
+    else:
+        tree = merkle_tree(ssot, tree, separators)
+    return ssot, tree
+
+def _stamp(ssot: dict, h: str) -> dict:
     ssot = dict(ssot)
     doctrine = dict(ssot.get("doctrine") or {})
     doctrine["blueprint_version_hash"] = h
     ssot["doctrine"] = doctrine
-    return ssot
\ No newline at end of file
+    return ssot
+
+def stamp_version_hash(ssot: dict, separators: Tuple[str, str] = (",", ":")) -> dict:
+    return _stamp(ssot, canonical_hash(ssot, separators))
+
+class VersionCache:
+    """Latest stamped SSOT and its Merkle tree per doctrine.unique_id (LRU).
+
+    A delta save is applied to the cached copy, so only the patched path is
+    re-encoded before the version hash is recomputed. A full save caches no
+    tree (None); the first delta against it builds one.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = LRUCache(max_entries=max_entries)
+
+    def get(self, unique_id: str) -> Optional[Tuple[dict, Optional[MerkleNode]]]:
+        return self._entries.get(unique_id)
+
+    def put(self, ssot: dict, tree: Optional[MerkleNode] = None) -> None:
+        unique_id = (ssot.get("doctrine") or {}).get("unique_id")
+        if unique_id:
+            self._entries.put(unique_id, (ssot, tree))
+
+    def discard(self, unique_id: str) -> None:
+        self._entries.discard(unique_id)
@@ -0,0 +1,77 @@
+"""In-process Mermaid rendering with a content-addressed diagram cache"""
+
+import hashlib, json, os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..infra.lru import LRUCache
+from .etags import etag_for
+
+TREE_FILE = "tree_overview.mmd"
+
+def _input_digest(*parts) -> str:
+    canon = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canon.encode("utf-8")).hexdigest()
+
+class VisualCache:
+    """Renders tree_overview.mmd and ladder_<bucket>.mmd, memoizing each diagram
+    by the hash of the inputs its generator actually reads.
+
+    render() returns {filename: (body, etag)}; sync() writes only the files whose
+    content differs from what is already on disk.
+    """
+
+    def __init__(self, tree_fn: Callable[[dict, dict], str],
+                 ladder_fn: Callable[[str, dict, dict], str],
+                 max_entries: Optional[int] = None):
+        self.tree_fn = tree_fn
+        self.ladder_fn = ladder_fn
+        self.max_entries = max_entries or int(os.getenv("BLUEPRINT_VISUAL_CACHE_SIZE", "512"))
+        self._diagrams = LRUCache(max_entries=self.max_entries)
+        self._on_disk: Dict[str, str] = {}
+
+    def _cached(self, key: str, build: Callable[[], str]) -> Tuple[str, str]:
+        entry = self._diagrams.get(key)
+        if entry is None:
+            body = build()
+            entry = (body, etag_for(body.encode("utf-8")))
+            self._diagrams.put(key, entry)
+        return entry
+
+    def render(self, manifest: dict, progress: dict) -> Dict[str, Tuple[str, str]]:
+        buckets = manifest.get("buckets", {}) or {}
+        buckets_progress = progress.get("buckets", {}) or {}
+
+        out = {TREE_FILE: self._cached(
+            _input_digest("tree", buckets, buckets_progress),
+            lambda: self.tree_fn(manifest, progress),
+        )}
+        for bucket_name, bucket_data in buckets.items():
+            bucket_progress = buckets_progress.get(bucket_name, {})
+            out[f"ladder_{bucket_name}.mmd"] = self._cached(
+                _input_digest("ladder", bucket_name, bucket_data, bucket_progress),
+                lambda: self.ladder_fn(bucket_name, bucket_data, bucket_progress),
+            )
+        return out
+
+    def sync(self, blueprint_dir: Path, diagrams: Dict[str, Tuple[str, str]]) -> List[str]:
+        """Write changed diagrams to blueprint_dir; returns the filenames written"""
+        written = []
+        for name, (body, etag) in diagrams.items():
+            path = Path(blueprint_dir) / name
+            key = str(path)
+            if self._on_disk.get(key) == etag and path.exists():
+                continue
+            data = body.encode("utf-8")
+            if path.exists() and etag_for(path.read_bytes()) == etag:
+                self._on_disk[key] = etag
+                continue
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            self._on_disk[key] = etag
+            written.append(name)
+        return written
+
+    def stats(self) -> Dict[str, int]:
+        return self._diagrams.stats()
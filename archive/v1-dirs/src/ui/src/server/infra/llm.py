@@ -0,0 +1,302 @@
+"""Shared async HTTP clients and request/response shaping for the /llm proxy"""
+
+import asyncio, json, logging, os, time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_MODELS = {
+    "anthropic": "claude-3-5-sonnet-20240620",
+    "openai": "gpt-4o-mini",
+}
+
+BASE_URLS = {
+    "anthropic": ("ANTHROPIC_BASE_URL", "https://api.anthropic.com"),
+    "openai": ("OPENAI_BASE_URL", "https://api.openai.com"),
+}
+
+PATHS = {
+    "anthropic": "/v1/messages",
+    "openai": "/v1/chat/completions",
+}
+
+logger = logging.getLogger(__name__)
+
+class LLMProviderError(Exception):
+    """Upstream provider returned an error response"""
+
+    def __init__(self, message: str, provider: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+
+def build_request(provider: str, model: str, system: Optional[str], prompt: str,
+                  json_mode: bool, max_tokens: int) -> Dict[str, Any]:
+    """Provider-specific request body for a single-turn completion"""
+    if provider == "anthropic":
+        body = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        if system:
+            body["system"] = system
+        if json_mode:
+            body["tools"] = [{
+                "name": "json_response",
+                "description": "Return the response as valid JSON",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "response": {"type": "object", "description": "The JSON response"}
+                    },
+                    "required": ["response"]
+                }
+            }]
+            body["tool_choice"] = {"type": "tool", "name": "json_response"}
+        return body
+
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": prompt})
+    body = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "messages": messages
+    }
+    if json_mode:
+        body["response_format"] = {"type": "json_object"}
+        # Ensure JSON instruction
+        json_instruction = "You must respond with valid JSON only."
+        if system:
+            messages[0]["content"] += " " + json_instruction
+        else:
+            messages.insert(0, {"role": "system", "content": json_instruction})
+    return body
+
+def auth_headers(provider: str, api_key: str) -> Dict[str, str]:
+    if provider == "anthropic":
+        return {
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json"
+        }
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+def parse_response(provider: str, model: str, json_mode: bool, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a provider response into the /llm {text|json, model, provider} shape"""
+    if provider == "anthropic":
+        content = result.get("content") or [{}]
+        if json_mode and result.get("content") and content[0].get("type") == "tool_use":
+            tool_input = content[0].get("input")
+            if not isinstance(tool_input, dict) or "response" not in tool_input:
+                raise LLMProviderError('Anthropic tool_use result has no "response" field', provider)
+            return {"json": tool_input["response"], "model": model, "provider": provider}
+        text = content[0].get("text", "")
+    else:
+        text = (result.get("choices") or [{}])[0].get("message", {}).get("content", "")
+
+    if json_mode:
+        try:
+            return {"json": json.loads(text), "model": model, "provider": provider}
+        except json.JSONDecodeError:
+            pass
+    return {"text": text, "model": model, "provider": provider}
+
+def _error_message(provider: str, response: httpx.Response) -> str:
+    fallback = "Anthropic API error" if provider == "anthropic" else "OpenAI API error"
+    try:
+        error = response.json().get("error", {})
+    except ValueError:
+        return f"{fallback} (HTTP {response.status_code})"
+    if isinstance(error, dict):
+        return error.get("message", fallback)
+    return str(error) or fallback
+
+def stream_delta(provider: str, event: Dict[str, Any]) -> Tuple[str, str]:
+    """Classify one provider stream event as ("text" | "json", fragment); ("", "") if none"""
+    if provider == "anthropic":
+        if event.get("type") == "error":
+            raise LLMProviderError(event.get("error", {}).get("message", "Anthropic stream error"), provider)
+        if event.get("type") != "content_block_delta":
+            return "", ""
+        delta = event.get("delta", {})
+        if delta.get("type") == "input_json_delta":
+            return "json", delta.get("partial_json", "")
+        return "text", delta.get("text", "")
+    choice = (event.get("choices") or [{}])[0]
+    return "text", (choice.get("delta") or {}).get("content") or ""
+
+def stream_result(provider: str, model: str, json_mode: bool, text: str, tool_json: str) -> Dict[str, Any]:
+    """Rebuild a non-streaming provider result from accumulated deltas and normalize it"""
+    if provider == "anthropic":
+        if tool_json:
+            content = [{"type": "tool_use", "input": json.loads(tool_json)}]
+        else:
+            content = [{"type": "text", "text": text}]
+        return parse_response(provider, model, json_mode, {"content": content})
+    return parse_response(provider, model, json_mode, {"choices": [{"message": {"content": text}}]})
+
+def sse_event(name: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+class LatencySamples:
+    """Recent latency samples (ms) per provider for the /llm/stats route"""
+
+    def __init__(self, size: int = 512):
+        self.size = size
+        self._samples: Dict[str, Deque[float]] = {}
+        self.count: Dict[str, int] = {}
+
+    def record(self, provider: str, ms: float) -> None:
+        self._samples.setdefault(provider, deque(maxlen=self.size)).append(ms)
+        self.count[provider] = self.count.get(provider, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for provider, samples in self._samples.items():
+            ordered = sorted(samples)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            out[provider] = {"count": self.count[provider], "last": samples[-1],
+                             "p50": pick(0.50), "p95": pick(0.95), "max": ordered[-1]}
+        return out
+
+def _limits(provider: str) -> httpx.Limits:
+    prefix = f"LLM_{provider.upper()}"
+    return httpx.Limits(
+        max_connections=int(os.getenv(f"{prefix}_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv(f"{prefix}_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60")),
+    )
+
+class LLMClient:
+    """One pooled keep-alive httpx.AsyncClient per provider.
+
+    Clients are bound to the event loop that created them; if a request arrives
+    on a different loop (e.g. a test client) a fresh pool is built for it, and
+    the old pools are closed: on their own loop if it still runs, else on this one.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, timeout: float = 30.0):
+        self.transport = transport
+        self.timeout = timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: Set[asyncio.Task] = set()
+        self.ttft = LatencySamples()
+
+    def client(self, provider: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._retire(self._loop, list(self._clients.values()))
+            self._clients = {}
+            self._loop = loop
+        c = self._clients.get(provider)
+        if c is None:
+            env, default = BASE_URLS[provider]
+            c = httpx.AsyncClient(
+                base_url=os.getenv(env, default),
+                timeout=self.timeout,
+                limits=_limits(provider),
+                http2=HTTP2_AVAILABLE,
+                transport=self.transport,
+            )
+            self._clients[provider] = c
+        return c
+
+    def _retire(self, loop: Optional[asyncio.AbstractEventLoop], clients: List[httpx.AsyncClient]) -> None:
+        if not clients:
+            return
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(_aclose_all(clients), loop)
+            return
+        task = asyncio.get_running_loop().create_task(_aclose_all(clients))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def post(self, provider: str, api_key: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = await self.client(provider).post(PATHS[provider], headers=auth_headers(provider, api_key), json=body)
+        except httpx.HTTPError as e:
+            raise LLMProviderError(f"{provider} request failed: {type(e).__name__}: {e}", provider) from e
+        if response.is_error:
+            raise LLMProviderError(_error_message(provider, response), provider, response.status_code)
+        return response.json()
+
+    async def complete(self, provider: str, api_key: str, model: Optional[str], system: Optional[str],
+                       prompt: str, json_mode: bool = False, max_tokens: int = 1024) -> Dict[str, Any]:
+        """Run one completion and return the normalized /llm payload"""
+        model = model or DEFAULT_MODELS[provider]
+        body = build_request(provider, model, system, prompt, json_mode, max_tokens)
+        result = await self.post(provider, api_key, body)
+        return parse_response(provider, model, json_mode, result)
+
+    async def stream(self, provider: str, api_key: str, model: Optional[str], system: Optional[str],
+                     prompt: str, json_mode: bool = False,
+                     max_tokens: int = 1024) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield unified ("start" | "delta" | "done", data) events from a provider stream.
+
+        "start" is only yielded once the provider has accepted the request, so
+        HTTP-level errors surface as LLMProviderError before any event. The
+        upstream body is read as the consumer pulls events, which gives
+        back-pressure all the way to the client socket.
+        """
+        model = model or DEFAULT_MODELS[provider]
+        body = build_request(provider, model, system, prompt, json_mode, max_tokens)
+        body["stream"] = True
+        started = time.perf_counter()
+        ttft_ms = None
+        text, tool_json = [], []
+
+        try:
+            async with self.client(provider).stream("POST", PATHS[provider], headers=auth_headers(provider, api_key), json=body) as response:
+                if response.is_error:
+                    await response.aread()
+                    raise LLMProviderError(_error_message(provider, response), provider, response.status_code)
+                yield "start", {"provider": provider, "model": model}
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    kind, fragment = stream_delta(provider, json.loads(data))
+                    if not fragment:
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                        self.ttft.record(provider, ttft_ms)
+                    (tool_json if kind == "json" else text).append(fragment)
+                    yield "delta", {"text": fragment}
+        except httpx.HTTPError as e:
+            raise LLMProviderError(f"{provider} request failed: {type(e).__name__}: {e}", provider) from e
+
+        payload = stream_result(provider, model, json_mode, "".join(text), "".join(tool_json))
+        yield "done", {**payload, "ttft_ms": ttft_ms, "total_ms": (time.perf_counter() - started) * 1000}
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        await _aclose_all(clients.values())
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+async def _aclose_all(clients: Iterable[httpx.AsyncClient]) -> None:
+    for c in clients:
+        try:
+            await c.aclose()
+        except Exception:
+            # A pool whose loop has closed cannot shut its connections down cleanly;
+            # they are released when the client is collected
+            logger.warning("Failed to close LLM client pool", exc_info=True)
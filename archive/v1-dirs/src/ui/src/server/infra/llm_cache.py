@@ -0,0 +1,125 @@
+"""Deterministic /llm response cache: byte-bounded in-memory LRU plus optional disk tier"""
+
+import asyncio, hashlib, json, logging, os, tempfile, time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+def request_key(provider: str, model: str, system: Optional[str], prompt: str,
+                json_mode: bool, max_tokens: int) -> str:
+    """SHA-256 of the canonical (provider, model, system, prompt, json, max_tokens) tuple"""
+    canon = json.dumps(
+        {"provider": provider, "model": model, "system": system or None, "prompt": prompt,
+         "json": bool(json_mode), "max_tokens": int(max_tokens)},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(canon.encode("utf-8")).hexdigest()
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+class LLMResponseCache:
+    """Caches encoded /llm response bodies by request_key().
+
+    Memory entries are evicted least-recently-used once their summed size passes
+    max_bytes; every entry expires ttl seconds after it was stored. When disk_dir
+    is set, entries are also written there (one JSON file per key) so a restart
+    starts warm; disk reads and writes run off the event loop.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, ttl: Optional[float] = None,
+                 disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("LLM_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL_S", "3600"))
+        disk_dir = disk_dir if disk_dir is not None else os.getenv("LLM_CACHE_DIR")
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries = LRUCache(max_bytes=self.max_bytes, size_of=lambda entry: len(entry[1]))
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    @property
+    def bytes(self) -> int:
+        return self._entries.bytes
+
+    @property
+    def evictions(self) -> int:
+        return self._entries.evictions
+
+    # memory tier
+
+    def _get_memory(self, key: str, now: float) -> Optional[bytes]:
+        entry = self._entries.get(key, lambda entry: entry[0] > now)
+        return None if entry is None else entry[1]
+
+    def _put_memory(self, key: str, data: bytes, expires_at: float) -> None:
+        self._entries.put(key, (expires_at, data))
+
+    # disk tier
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, bytes]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if record.get("expires_at", 0) <= now:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            return None
+        return record["expires_at"], encode_payload(record["payload"])
+
+    def _write_disk(self, key: str, data: bytes, expires_at: float) -> None:
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        record = b'{"expires_at":' + repr(expires_at).encode() + b',"payload":' + data + b"}"
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(record)
+        os.replace(tmp, path)
+
+    # public API
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """Return (encoded body, tier) or None"""
+        now = time.time()
+        data = self._get_memory(key, now)
+        if data is not None:
+            self.hits["memory"] += 1
+            return data, "memory"
+        if self.disk_dir is not None:
+            record = await asyncio.to_thread(self._read_disk, key, now)
+            if record is not None:
+                self._put_memory(key, record[1], record[0])
+                self.hits["disk"] += 1
+                return record[1], "disk"
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, payload: Dict[str, Any]) -> bytes:
+        """Store payload and return its encoded body"""
+        data = encode_payload(payload)
+        if self.ttl <= 0:
+            return data
+        expires_at = time.time() + self.ttl
+        self._put_memory(key, data, expires_at)
+        if self.disk_dir is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, key, data, expires_at)
+            except OSError:
+                # The entry is still served from memory; only the warm restart loses it
+                logger.warning("LLM cache disk write failed for %s", key, exc_info=True)
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "ttl": self.ttl, "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+                "hits": dict(self.hits), "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,116 @@
+"""Latency/error tracking per provider+model for routing and hedging /llm calls"""
+
+import os, time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+class RouteStats:
+    __slots__ = ("ewma_ms", "error_rate", "samples", "count", "errors", "last_error_at")
+
+    def __init__(self, size: int):
+        self.ewma_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.errors = 0
+        self.last_error_at = 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class LatencyRouter:
+    """EWMA latency and error rate per (provider, model).
+
+    choose() keeps the statically selected provider unless it is unhealthy or an
+    alternative is faster by more than `margin`, so a cold start behaves exactly
+    like the env-var selection. A provider whose error-rate EWMA is above
+    `error_threshold` is skipped until `cooldown` seconds after its last error,
+    after which it is probed again.
+    """
+
+    def __init__(self, alpha: Optional[float] = None, error_threshold: Optional[float] = None,
+                 margin: Optional[float] = None, cooldown: Optional[float] = None, window: int = 256):
+        self.alpha = alpha if alpha is not None else float(os.getenv("LLM_ROUTING_ALPHA", "0.2"))
+        self.error_threshold = error_threshold if error_threshold is not None else float(os.getenv("LLM_ROUTING_ERROR_THRESHOLD", "0.5"))
+        self.margin = margin if margin is not None else float(os.getenv("LLM_ROUTING_MARGIN", "0.2"))
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("LLM_ROUTING_COOLDOWN_S", "30"))
+        self.hedge_default_ms = float(os.getenv("LLM_HEDGE_DELAY_MS", "2000"))
+        self.hedge_min_ms = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "50"))
+        self.window = window
+        self._stats: Dict[Tuple[str, str], RouteStats] = {}
+        self.hedges = {"fired": 0, "won": 0}
+
+    def _get(self, provider: str, model: str) -> RouteStats:
+        key = (provider, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = RouteStats(self.window)
+        return stats
+
+    def record(self, provider: str, model: str, latency_ms: float, ok: bool) -> None:
+        stats = self._get(provider, model)
+        stats.count += 1
+        stats.error_rate += self.alpha * ((0.0 if ok else 1.0) - stats.error_rate)
+        if ok:
+            stats.samples.append(latency_ms)
+            if stats.ewma_ms is None:
+                stats.ewma_ms = latency_ms
+            else:
+                stats.ewma_ms += self.alpha * (latency_ms - stats.ewma_ms)
+        else:
+            stats.errors += 1
+            stats.last_error_at = time.monotonic()
+
+    def healthy(self, provider: str, model: str) -> bool:
+        stats = self._stats.get((provider, model))
+        if stats is None or stats.error_rate <= self.error_threshold:
+            return True
+        return time.monotonic() - stats.last_error_at >= self.cooldown
+
+    def choose(self, candidates: List[Tuple[str, str]]) -> Tuple[str, str]:
+        """Pick from candidates; candidates[0] is the static default"""
+        healthy = [c for c in candidates if self.healthy(*c)] or candidates[:1]
+        best = healthy[0]
+        best_ms = self._ewma(best)
+        if best_ms is None:
+            return best  # nothing measured yet: keep the static choice
+        for candidate in healthy[1:]:
+            ms = self._ewma(candidate)
+            if ms is not None and ms < best_ms * (1 - self.margin):
+                best, best_ms = candidate, ms
+        return best
+
+    def _ewma(self, candidate: Tuple[str, str]) -> Optional[float]:
+        stats = self._stats.get(candidate)
+        return stats.ewma_ms if stats else None
+
+    def hedge_delay(self, provider: str, model: str) -> float:
+        """Seconds to wait on the primary before hedging: its p95 latency, or the default"""
+        stats = self._stats.get((provider, model))
+        p95 = stats.quantile(0.95) if stats else None
+        ms = self.hedge_default_ms if p95 is None else max(self.hedge_min_ms, p95)
+        return ms / 1000
+
+    def snapshot(self) -> Dict[str, Any]:
+        routes = {}
+        for (provider, model), stats in self._stats.items():
+            routes[f"{provider}/{model}"] = {
+                "ewma_ms": stats.ewma_ms,
+                "error_rate": round(stats.error_rate, 4),
+                "p50_ms": stats.quantile(0.50),
+                "p95_ms": stats.quantile(0.95),
+                "count": stats.count,
+                "errors": stats.errors,
+                "healthy": self.healthy(provider, model),
+                "hedge_delay_ms": self.hedge_delay(provider, model) * 1000,
+            }
+        return {
+            "config": {"alpha": self.alpha, "error_threshold": self.error_threshold, "margin": self.margin,
+                       "cooldown_s": self.cooldown, "hedge_default_ms": self.hedge_default_ms,
+                       "hedge_min_ms": self.hedge_min_ms},
+            "routes": routes,
+            "hedges": dict(self.hedges),
+        }
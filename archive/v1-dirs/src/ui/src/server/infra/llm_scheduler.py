@@ -0,0 +1,218 @@
+"""Per-provider token-bucket admission with interactive/batch priority lanes"""
+
+import asyncio, os, time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+LANES = ("interactive", "batch")
+
+def estimate_tokens(prompt: str, system: Optional[str], max_tokens: int) -> int:
+    """Rough request cost: ~4 characters per prompt token plus the completion budget"""
+    return (len(prompt or "") + len(system or "")) // 4 + int(max_tokens or 0)
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (amounts above capacity wait for a full bucket)"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate) if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+class RateLimited(Exception):
+    """Request rejected by admission control; retry_after is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+Charge = Tuple[TokenBucket, float]
+
+class _Waiter:
+    __slots__ = ("charges", "deadline", "event")
+
+    def __init__(self, charges: List[Charge], deadline: Optional[float]):
+        self.charges = charges
+        self.deadline = deadline
+        self.event = asyncio.Event()
+
+class ProviderScheduler:
+    """Requests-per-minute and tokens-per-minute buckets for one provider.
+
+    Waiters are served strictly in order, interactive lane first; the batch lane
+    only moves when no interactive request is queued. Each lane is bounded, and a
+    request whose estimated start time is past its deadline is rejected up front
+    instead of waiting to time out.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_queue: int = 256):
+        self.requests = TokenBucket(rpm / 60, rpm) if rpm else None
+        self.tokens = TokenBucket(tpm / 60, tpm) if tpm else None
+        self.max_queue = max_queue
+        self.lanes: Dict[str, Deque[_Waiter]] = {lane: deque() for lane in LANES}
+        self.admitted = {lane: 0 for lane in LANES}
+        self.rejected = {lane: 0 for lane in LANES}
+        self.waited_s = {lane: 0.0 for lane in LANES}
+
+    def _head(self) -> Optional[_Waiter]:
+        for lane in LANES:
+            if self.lanes[lane]:
+                return self.lanes[lane][0]
+        return None
+
+    def _wake_head(self) -> None:
+        head = self._head()
+        if head is not None:
+            head.event.set()
+
+    def _estimate(self, waiter: _Waiter, lane: str, now: float) -> float:
+        """Rough wait for a queued waiter from the shared buckets and everyone ahead of it"""
+        ahead: List[_Waiter] = []
+        for l in LANES:
+            for w in self.lanes[l]:
+                ahead.append(w)
+                if w is waiter:
+                    break
+            if l == lane:
+                break
+        estimate = 0.0
+        for bucket in (self.requests, self.tokens):
+            if bucket is None:
+                continue
+            need = sum(amount for w in ahead for b, amount in w.charges if b is bucket)
+            estimate = max(estimate, bucket.wait(need, now) if need <= bucket.capacity
+                           else (need - bucket.tokens) / bucket.rate)
+        return estimate
+
+    async def acquire(self, cost: float, lane: str = "interactive", deadline: Optional[float] = None,
+                      extra: Sequence[Charge] = ()) -> float:
+        """Wait for capacity; returns seconds spent queued. deadline is a time.monotonic() value."""
+        charges = [(b, a) for b, a in ((self.requests, 1), (self.tokens, cost)) if b is not None]
+        charges.extend(extra)
+        if not charges:
+            return 0.0
+
+        queue = self.lanes[lane]
+        if len(queue) >= self.max_queue:
+            self.rejected[lane] += 1
+            raise RateLimited(f"{lane} queue is full", self._retry_after(charges))
+
+        waiter = _Waiter(charges, deadline)
+        queue.append(waiter)
+        self._wake_head()
+        started = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                if self._head() is waiter:
+                    wait = max(b.wait(a, now) for b, a in charges)
+                    if wait <= 0:
+                        for b, a in charges:
+                            b.take(a, now)
+                        self.admitted[lane] += 1
+                        self.waited_s[lane] += now - started
+                        return now - started
+                    timeout = wait
+                else:
+                    wait = self._estimate(waiter, lane, now)
+                    timeout = None
+                if deadline is not None:
+                    if now + wait > deadline:
+                        self.rejected[lane] += 1
+                        raise RateLimited("Rate limit wait would exceed the request deadline", wait)
+                    timeout = min(timeout, deadline - now) if timeout is not None else deadline - now
+                waiter.event.clear()
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if waiter in queue:
+                queue.remove(waiter)
+            self._wake_head()
+
+    def _retry_after(self, charges: List[Charge]) -> float:
+        now = time.monotonic()
+        return max([b.wait(a, now) for b, a in charges] + [1.0])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.requests.capacity if self.requests else None,
+            "tpm": self.tokens.capacity if self.tokens else None,
+            "queued": {lane: len(q) for lane, q in self.lanes.items()},
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "waited_s": {lane: round(s, 3) for lane, s in self.waited_s.items()},
+        }
+
+class LLMScheduler:
+    """Provider schedulers configured from LLM_<PROVIDER>_RPM / _TPM, plus per-blueprint
+    buckets derived from a manifest's universals.limits (qps, budget_usd)"""
+
+    def __init__(self):
+        self.providers: Dict[str, ProviderScheduler] = {}
+        self._blueprints: Dict[str, Tuple[Tuple[Any, Any], Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        self.usd_per_1k_tokens = float(os.getenv("LLM_USD_PER_1K_TOKENS", "0.01"))
+        self.budget_window_s = float(os.getenv("LLM_BUDGET_WINDOW_S", "86400"))
+
+    def provider(self, name: str) -> ProviderScheduler:
+        scheduler = self.providers.get(name)
+        if scheduler is None:
+            prefix = f"LLM_{name.upper()}"
+            scheduler = self.providers[name] = ProviderScheduler(
+                rpm=float(os.getenv(f"{prefix}_RPM", "0")),
+                tpm=float(os.getenv(f"{prefix}_TPM", "0")),
+                max_queue=int(os.getenv("LLM_SCHEDULER_MAX_QUEUE", "256")),
+            )
+        return scheduler
+
+    def blueprint_charges(self, slug: str, qps: Any, budget_usd: Any, tokens: int) -> List[Charge]:
+        """Charges for a blueprint's own limits: one request against qps, and the
+        estimated USD cost against budget_usd refilled over LLM_BUDGET_WINDOW_S.
+
+        An exhausted budget is rejected immediately rather than queued, so it can
+        never hold up the provider lane for other callers.
+        """
+        signature = (qps, budget_usd)
+        entry = self._blueprints.get(slug)
+        if entry is None or entry[0] != signature:
+            qps_bucket = TokenBucket(float(qps), max(1.0, float(qps))) if qps else None
+            budget_bucket = TokenBucket(float(budget_usd) / self.budget_window_s, float(budget_usd)) if budget_usd else None
+            entry = self._blueprints[slug] = (signature, qps_bucket, budget_bucket)
+        charges: List[Charge] = []
+        if entry[1] is not None:
+            charges.append((entry[1], 1))
+        if entry[2] is not None:
+            cost_usd = tokens / 1000 * self.usd_per_1k_tokens
+            wait = entry[2].wait(cost_usd, time.monotonic())
+            if wait > 0:
+                raise RateLimited(f"Blueprint {slug} LLM budget of ${budget_usd} is exhausted", wait)
+            charges.append((entry[2], cost_usd))
+        return charges
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "providers": {name: s.stats() for name, s in self.providers.items()},
+            "blueprints": {
+                slug: {
+                    "qps": sig[0], "budget_usd": sig[1],
+                    "budget_remaining_usd": round(budget.tokens, 6) if budget else None,
+                }
+                for slug, (sig, _, budget) in self._blueprints.items()
+            },
+        }
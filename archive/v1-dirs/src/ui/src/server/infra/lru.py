@@ -0,0 +1,75 @@
+"""Thread-safe LRU map for the in-process caches"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class LRUCache:
+    """Least-recently-used map with hit/miss/eviction counters.
+
+    Bounded by entry count (max_entries) and, when max_bytes is set, by the
+    summed size_of(value) of its entries; a value larger than max_bytes on its
+    own is not stored. get() can be given a predicate: an entry failing it is
+    dropped and counted as a miss.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 size_of: Callable[[Any], int] = len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, valid: Optional[Callable[[Any], bool]] = None) -> Any:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None and valid is not None and not valid(value):
+                self._drop(key)
+                value = None
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self.size_of(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            while ((self.max_entries is not None and len(self._entries) > self.max_entries)
+                   or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def _drop(self, key: Hashable) -> None:
+        del self._entries[key]
+        self.bytes -= self._sizes.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+        if self.max_entries is not None:
+            stats["max_entries"] = self.max_entries
+        if self.max_bytes is not None:
+            stats.update(bytes=self.bytes, max_bytes=self.max_bytes, evictions=self.evictions)
+        return stats
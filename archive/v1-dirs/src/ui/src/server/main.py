@@ -9,19 +9,36 @@ checksum: 22105c7b
 """
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi.responses import PlainTextResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 import yaml
 import json
-import subprocess
-import sys
+import logging
+import math
 import os
+import re
 import requests
-import hashlib
 import time
-import base64
-from typing import Optional, Dict, Any
+import asyncio
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple
+
+from .blueprints.etags import etag_matches
+from .blueprints.ids import id_allocator
+from .blueprints.manifests import ManifestStore, PreconditionFailed
+from .blueprints.scoring import ScoreCache
+from .blueprints.ssot_store import SSOTStore
+from .blueprints.jsonpatch import PatchError, apply_patch
+from .blueprints.tools import load_tool
+from .blueprints import versioning
+from .blueprints.versioning import VersionCache, canonical_digests, merkle_tree, stamp_version_tree, subtree_digests
+from .blueprints.visuals import VisualCache
+from .infra.llm import DEFAULT_MODELS, LLMClient, LLMProviderError, sse_event
+from .infra.llm_cache import LLMResponseCache, request_key
+from .infra.llm_routing import LatencyRouter
+from .infra.llm_scheduler import LANES, LLMScheduler, RateLimited, estimate_tokens
+from .infra.singleflight import SingleFlight
 
 app = FastAPI(title="Blueprint API")
 
@@ -35,329 +52,639 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+logger = logging.getLogger(__name__)
+
 BASE_DIR = Path(__file__).parent.parent.parent
 BLUEPRINTS_DIR = BASE_DIR / "docs" / "blueprints"
+# A slug names one directory under BLUEPRINTS_DIR, as the /blueprints/{slug} routes take it
+BLUEPRINT_SLUG_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+TOOLS_DIR = Path(os.getenv("BLUEPRINT_TOOLS_DIR", BASE_DIR.parent / "sys" / "tools"))
+
+manifest_store = ManifestStore()
+
+def read_manifest_bytes(path: Path) -> bytes:
+    result = manifest_store.read(path)
+    if result is None:
+        raise FileNotFoundError(f"Manifest not found at {path}")
+    return result[0]
+
+_score_cache: Optional[ScoreCache] = None
+
+def get_score_cache() -> ScoreCache:
+    """Get or create the in-process scorer cache"""
+    global _score_cache
+    if _score_cache is None:
+        scorer = load_tool(TOOLS_DIR, "blueprint_score")
+        _score_cache = ScoreCache(scorer.score_manifest, reader=read_manifest_bytes)
+    return _score_cache
+
+_visual_cache: Optional[VisualCache] = None
+
+def get_visual_cache() -> VisualCache:
+    """Get or create the in-process Mermaid render cache"""
+    global _visual_cache
+    if _visual_cache is None:
+        visual = load_tool(TOOLS_DIR, "blueprint_visual")
+        _visual_cache = VisualCache(visual.generate_tree_overview, visual.generate_ladder)
+    return _visual_cache
+
+def render_visuals(slug: str) -> Dict[str, Any]:
+    """Score and render all diagrams for slug from the current manifest, without writing anything"""
+    manifest, progress, _ = get_score_cache().load_path(slug, BLUEPRINTS_DIR / slug / "manifest.yaml")
+    return get_visual_cache().render(manifest, progress)
 
 @app.get("/blueprints/{slug}/manifest", response_class=PlainTextResponse)
-async def get_manifest(slug: str):
-    """Get manifest YAML for a blueprint"""
+async def get_manifest(slug: str, request: Request):
+    """Get manifest YAML for a blueprint (ETag / If-None-Match aware)"""
     manifest_path = BLUEPRINTS_DIR / slug / "manifest.yaml"
-    if not manifest_path.exists():
+    result = await run_in_threadpool(manifest_store.read, manifest_path)
+    if result is None:
         return PlainTextResponse(f"Manifest not found for {slug}. Create it at {manifest_path}", status_code=404)
     
-    with open(manifest_path, 'r') as f:
-        return f.read()
+    data, etag = result
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return PlainTextResponse(status_code=304, headers={"ETag": etag})
+    return PlainTextResponse(data.decode(), headers={"ETag": etag})
 
 @app.put("/blueprints/{slug}/manifest")
-async def put_manifest(slug: str, body: bytes):
-    """Update manifest YAML for a blueprint"""
-    blueprint_dir = BLUEPRINTS_DIR / slug
-    blueprint_dir.mkdir(parents=True, exist_ok=True)
-    
-    manifest_path = blueprint_dir / "manifest.yaml"
+async def put_manifest(slug: str, request: Request):
+    """Update manifest YAML for a blueprint; honours If-Match for optimistic concurrency"""
+    manifest_path = BLUEPRINTS_DIR / slug / "manifest.yaml"
+    body = await request.body()
     
     try:
-        yaml.safe_load(body.decode())
+        await run_in_threadpool(yaml.safe_load, body.decode())
     except yaml.YAMLError as e:
         raise HTTPException(status_code=400, detail=f"Invalid YAML: {e}")
     
-    with open(manifest_path, 'wb') as f:
-        f.write(body)
+    try:
+        etag = await run_in_threadpool(manifest_store.write, manifest_path, body, request.headers.get("if-match"))
+    except PreconditionFailed as e:
+        return JSONResponse({
+            "error": f"Manifest for {slug} was modified since it was read",
+            "etag": e.current_etag
+        }, status_code=412, headers={"ETag": e.current_etag} if e.current_etag else None)
     
-    return {"message": f"Manifest saved for {slug}", "path": str(manifest_path)}
+    return JSONResponse(
+        {"message": f"Manifest saved for {slug}", "path": str(manifest_path), "etag": etag},
+        headers={"ETag": etag}
+    )
 
 @app.post("/blueprints/{slug}/score")
 async def score_blueprint(slug: str):
-    """Run scorer and return progress JSON"""
+    """Score manifest in-process and return progress JSON"""
     blueprint_dir = BLUEPRINTS_DIR / slug
-    if not (blueprint_dir / "manifest.yaml").exists():
+    manifest_path = blueprint_dir / "manifest.yaml"
+    if not manifest_path.exists():
         return JSONResponse({"error": f"No manifest found for {slug}"}, status_code=404)
     
     try:
-        result = subprocess.run(
-            [sys.executable, str(BASE_DIR / "tools" / "blueprint_score.py"), slug],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        
-        if result.returncode != 0:
-            return JSONResponse({"error": result.stderr}, status_code=500)
-        
-        progress_path = blueprint_dir / "progress.json"
-        if progress_path.exists():
-            with open(progress_path, 'r') as f:
-                return json.load(f)
-        else:
-            return JSONResponse({"error": "Progress file not generated"}, status_code=500)
-            
+        progress, hit = await run_in_threadpool(get_score_cache().score_path, slug, manifest_path)
+        return JSONResponse(progress, headers={"X-Score-Cache": "hit" if hit else "miss"})
+    except yaml.YAMLError as e:
+        return JSONResponse({"error": f"Invalid YAML: {e}"}, status_code=500)
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
 @app.post("/blueprints/{slug}/visuals")
 async def generate_visuals(slug: str):
-    """Run visual generator and return paths"""
+    """Render visuals in-process, write changed files and return the diagrams"""
     blueprint_dir = BLUEPRINTS_DIR / slug
     if not (blueprint_dir / "manifest.yaml").exists():
         return JSONResponse({"error": f"No manifest found for {slug}"}, status_code=404)
     
     try:
-        result = subprocess.run(
-            [sys.executable, str(BASE_DIR / "tools" / "blueprint_visual.py"), slug],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        
-        if result.returncode != 0:
-            return JSONResponse({"error": result.stderr}, status_code=500)
-        
-        files = [
-            "tree_overview.mmd",
-            "ladder_input.mmd",
-            "ladder_middle.mmd",
-            "ladder_output.mmd"
-        ]
-        
-        paths = {}
-        for file in files:
-            file_path = blueprint_dir / file
-            if file_path.exists():
-                paths[file] = str(file_path)
+        diagrams = await run_in_threadpool(render_visuals, slug)
+        written = await run_in_threadpool(get_visual_cache().sync, blueprint_dir, diagrams)
         
-        return {"message": "Visuals generated", "paths": paths}
+        return {
+            "message": "Visuals generated",
+            "paths": {name: str(blueprint_dir / name) for name in diagrams},
+            "written": written,
+            "diagrams": {name: body for name, (body, _) in diagrams.items()},
+            "etags": {name: etag for name, (_, etag) in diagrams.items()},
+        }
         
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
-@app.post("/llm")
-async def llm_endpoint(request: Request):
-    """LLM endpoint with concurrent provider support"""
+@app.get("/blueprints/{slug}/visuals/{name}", response_class=PlainTextResponse)
+async def get_visual(slug: str, name: str, request: Request):
+    """Serve one rendered Mermaid diagram with a strong ETag"""
+    if not (BLUEPRINTS_DIR / slug / "manifest.yaml").exists():
+        return PlainTextResponse(f"No manifest found for {slug}", status_code=404)
+    if not name.endswith(".mmd"):
+        name += ".mmd"
+    
     try:
-        body = await request.json()
-        
-        requested_provider = body.get("provider")
-        model = body.get("model")
-        system = body.get("system")
-        prompt = body.get("prompt")
-        json_mode = body.get("json", False)
-        max_tokens = body.get("max_tokens", 1024)
-        
-        if not prompt:
-            return JSONResponse({"error": "Prompt is required"}, status_code=400)
-        
-        # Provider selection algorithm
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        openai_key = os.getenv("OPENAI_API_KEY")
-        default_provider = os.getenv("LLM_DEFAULT_PROVIDER", "openai")
-        
-        # 1. If provider explicitly requested
-        if requested_provider:
-            provider = requested_provider
-            if provider == "anthropic" and not anthropic_key:
-                return JSONResponse({
-                    "error": "Anthropic API key not configured",
-                    "help": "Configure ANTHROPIC_API_KEY in Doppler",
-                    "provider": "anthropic"
-                }, status_code=502)
-            if provider == "openai" and not openai_key:
-                return JSONResponse({
-                    "error": "OpenAI API key not configured",
-                    "help": "Configure OPENAI_API_KEY in Doppler",
-                    "provider": "openai"
-                }, status_code=502)
-        # 2. Infer from model name
-        elif model:
-            if "claude" in model.lower():
-                provider = "anthropic"
-            elif "gpt" in model.lower() or model.lower().startswith("o"):
-                provider = "openai"
-            else:
-                provider = default_provider
-        # 3. Use default provider
-        elif default_provider == "anthropic" and anthropic_key:
-            provider = "anthropic"
-        elif default_provider == "openai" and openai_key:
-            provider = "openai"
-        # 4. Use whichever single key is available
-        elif anthropic_key and not openai_key:
+        diagrams = await run_in_threadpool(render_visuals, slug)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    
+    if name not in diagrams:
+        return PlainTextResponse(f"Unknown diagram {name} for {slug}", status_code=404)
+    
+    body, etag = diagrams[name]
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return PlainTextResponse(status_code=304, headers=headers)
+    return PlainTextResponse(body, headers=headers)
+
+_llm_client: Optional[LLMClient] = None
+
+def get_llm_client() -> LLMClient:
+    """Get or create the shared pooled provider client"""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+    return _llm_client
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+def get_llm_cache() -> LLMResponseCache:
+    """Get or create the /llm response cache (configured from LLM_CACHE_* env vars)"""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMResponseCache()
+    return _llm_cache
+
+llm_flight = SingleFlight()
+llm_router = LatencyRouter()
+llm_scheduler = LLMScheduler()
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Streaming time-to-first-token, response cache and coalescing statistics"""
+    return {
+        "ttft_ms": get_llm_client().ttft.summary(),
+        "cache": get_llm_cache().stats(),
+        "coalescing": llm_flight.stats(),
+        "scheduler": llm_scheduler.stats()
+    }
+
+@app.get("/llm/routing")
+async def llm_routing():
+    """Per provider/model EWMA latency, error rate, health and hedge delays"""
+    return llm_router.snapshot()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    if _llm_client is not None:
+        await _llm_client.aclose()
+
+async def stream_llm(provider, api_key, model, system, prompt, json_mode, max_tokens, key, cached, admission=None):
+    """SSE frames for /llm stream mode: start, delta*, done (or error).
+    
+    A cache hit is replayed as a single delta; a completed stream is stored in
+    the response cache like a regular completion.
+    """
+    if cached is not None:
+        payload = json.loads(cached[0])
+        text = payload.get("text")
+        if text is None:
+            text = json.dumps(payload.get("json"))
+        yield sse_event("start", {"provider": payload["provider"], "model": payload["model"]})
+        yield sse_event("delta", {"text": text})
+        yield sse_event("done", {**payload, "ttft_ms": 0.0, "total_ms": 0.0})
+        return
+    
+    await admit({"provider": provider, "prompt": prompt, "system": system, "max_tokens": max_tokens}, admission)
+    events = get_llm_client().stream(provider, api_key, model, system, prompt, json_mode, max_tokens)
+    started = False
+    try:
+        async for name, data in events:
+            if name == "done":
+                await get_llm_cache().put(key, {k: v for k, v in data.items() if k not in ("ttft_ms", "total_ms")})
+            started = True
+            yield sse_event(name, data)
+    except (LLMProviderError, json.JSONDecodeError) as error:
+        if not started:
+            raise
+        logger.warning("LLM stream from %s failed after it started", provider, exc_info=True)
+        yield sse_event("error", {"error": str(error), "provider": provider})
+
+class LLMRequestError(Exception):
+    """A /llm request answered with an error payload instead of a completion"""
+    
+    def __init__(self, payload: Dict[str, Any], status_code: int = 502):
+        super().__init__(payload.get("error"))
+        self.payload = payload
+        self.status_code = status_code
+
+def select_provider(requested_provider: Optional[str], model: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Provider selection algorithm; returns (provider, api_key)"""
+    anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+    openai_key = os.getenv("OPENAI_API_KEY")
+    default_provider = os.getenv("LLM_DEFAULT_PROVIDER", "openai")
+    
+    # 1. If provider explicitly requested
+    if requested_provider:
+        provider = requested_provider
+    # 2. Infer from model name
+    elif model:
+        if "claude" in model.lower():
             provider = "anthropic"
-        elif openai_key and not anthropic_key:
+        elif "gpt" in model.lower() or model.lower().startswith("o"):
             provider = "openai"
-        # 5. No provider available - graceful degradation
         else:
-            return JSONResponse({
-                "error": "No API keys configured yet. Configure ANTHROPIC_API_KEY and/or OPENAI_API_KEY in Doppler.",
-                "help": "Use doppler setup and add your API keys"
-            }, status_code=502)
+            provider = default_provider
+    # 3. Use default provider
+    elif default_provider == "anthropic" and anthropic_key:
+        provider = "anthropic"
+    elif default_provider == "openai" and openai_key:
+        provider = "openai"
+    # 4. Use whichever single key is available
+    elif anthropic_key and not openai_key:
+        provider = "anthropic"
+    elif openai_key and not anthropic_key:
+        provider = "openai"
+    # 5. No provider available - graceful degradation
+    else:
+        raise LLMRequestError({
+            "error": "No API keys configured yet. Configure ANTHROPIC_API_KEY and/or OPENAI_API_KEY in Doppler.",
+            "help": "Use doppler setup and add your API keys"
+        })
+    
+    # Validate selected provider has key - with helpful messages
+    if provider == "anthropic" and not anthropic_key:
+        raise LLMRequestError({
+            "error": "Anthropic API key not configured",
+            "help": "Configure ANTHROPIC_API_KEY in Doppler",
+            "provider": "anthropic"
+        })
+    if provider == "openai" and not openai_key:
+        raise LLMRequestError({
+            "error": "OpenAI API key not configured",
+            "help": "Configure OPENAI_API_KEY in Doppler",
+            "provider": "openai"
+        })
+    
+    # Anything other than anthropic is proxied to OpenAI
+    if provider != "anthropic":
+        provider = "openai"
+    return provider, anthropic_key if provider == "anthropic" else openai_key
+
+def resolve_llm_request(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a /llm request body and resolve it to LLMClient.complete() arguments"""
+    prompt = body.get("prompt")
+    if not prompt:
+        raise LLMRequestError({"error": "Prompt is required"}, status_code=400)
+    
+    model = body.get("model")
+    provider, api_key = select_provider(body.get("provider"), model)
+    call = {
+        "provider": provider,
+        "api_key": api_key,
+        "model": model,
+        "system": body.get("system"),
+        "prompt": prompt,
+        "json_mode": body.get("json", False),
+        "max_tokens": body.get("max_tokens", 1024),
+    }
+    
+    # Nothing pinned: let measured latency/health override the static choice
+    if not body.get("provider") and not model:
+        alternate = alternate_call(call)
+        if alternate is not None:
+            chosen = llm_router.choose([
+                (provider, DEFAULT_MODELS[provider]),
+                (alternate["provider"], DEFAULT_MODELS[alternate["provider"]]),
+            ])
+            if chosen[0] != provider:
+                call = alternate
+    return call
+
+def alternate_call(call: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The same call against the other provider (default model), if its key is configured"""
+    other = "openai" if call["provider"] == "anthropic" else "anthropic"
+    api_key = os.getenv("ANTHROPIC_API_KEY" if other == "anthropic" else "OPENAI_API_KEY")
+    if not api_key:
+        return None
+    return {**call, "provider": other, "api_key": api_key, "model": None}
+
+def hedge_target(body: Dict[str, Any], call: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Alternate call to hedge with, when hedging is requested and nothing is pinned"""
+    wanted = body.get("hedge", os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes"))
+    if not wanted or body.get("provider") or body.get("model"):
+        return None
+    return alternate_call(call)
+
+def limit_number(value: Any, name: str) -> Optional[float]:
+    """A non-negative number (or numeric string) for an admission limit, None if unset; else a 400"""
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if isinstance(value, bool) or not math.isfinite(number) or number < 0:
+        raise LLMRequestError({"error": f"{name} must be a non-negative number"}, status_code=400)
+    return number
+
+def admission_for(body: Dict[str, Any], default_lane: str) -> Dict[str, Any]:
+    """Scheduler lane, deadline and blueprint for a /llm request body"""
+    lane = body.get("priority", default_lane)
+    if lane not in LANES:
+        raise LLMRequestError({"error": f"priority must be one of {', '.join(LANES)}"}, status_code=400)
+    deadline_ms = limit_number(body.get("deadline_ms", os.getenv(f"LLM_{lane.upper()}_DEADLINE_MS", "30000" if lane == "interactive" else "0")), "deadline_ms")
+    blueprint = body.get("blueprint")
+    if blueprint is not None and not (isinstance(blueprint, str) and BLUEPRINT_SLUG_RE.fullmatch(blueprint)):
+        raise LLMRequestError({"error": "blueprint must be a blueprint slug"}, status_code=400)
+    return {
+        "lane": lane,
+        "deadline": time.monotonic() + deadline_ms / 1000 if deadline_ms else None,
+        "blueprint": blueprint,
+    }
+
+_blueprint_limits: Dict[str, Tuple[str, Dict[str, Optional[float]]]] = {}  # manifest path -> (etag, limits)
+
+def blueprint_limits(slug: str) -> Dict[str, Optional[float]]:
+    """qps and budget_usd from a blueprint manifest's universals.limits ({} without a manifest).
+    Parsed once per manifest ETag; reads the file, so call it off the event loop."""
+    path = BLUEPRINTS_DIR / slug / "manifest.yaml"
+    result = manifest_store.read(path)
+    if result is None:
+        return {}
+    data, etag = result
+    cached = _blueprint_limits.get(str(path))
+    if cached is not None and cached[0] == etag:
+        return cached[1]
+    manifest = yaml.safe_load(data.decode())
+    universals = manifest.get("universals") if isinstance(manifest, dict) else None
+    raw = (universals.get("limits") if isinstance(universals, dict) else None) or {}
+    if not isinstance(raw, dict):
+        raise LLMRequestError({"error": f"{slug}: universals.limits must be a mapping"}, status_code=400)
+    limits = {name: limit_number(raw.get(name), f"{slug}: universals.limits.{name}") for name in ("qps", "budget_usd")}
+    _blueprint_limits[str(path)] = (etag, limits)
+    return limits
+
+async def admit(call: Dict[str, Any], admission: Optional[Dict[str, Any]]) -> None:
+    """Wait for the provider's rate-limit buckets (and the blueprint's own limits)"""
+    if admission is None:
+        return
+    tokens = estimate_tokens(call["prompt"], call["system"], call["max_tokens"])
+    extra = []
+    if admission.get("blueprint"):
+        limits = await run_in_threadpool(blueprint_limits, admission["blueprint"])
+        extra = llm_scheduler.blueprint_charges(admission["blueprint"], limits.get("qps"), limits.get("budget_usd"), tokens)
+    await llm_scheduler.provider(call["provider"]).acquire(tokens, admission["lane"], admission["deadline"], extra)
+
+async def timed_complete(call: Dict[str, Any], admission: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Admission, then LLMClient.complete(), feeding the latency router"""
+    await admit(call, admission)
+    model = call["model"] or DEFAULT_MODELS[call["provider"]]
+    started = time.perf_counter()
+    try:
+        payload = await get_llm_client().complete(**call)
+    except LLMProviderError as error:
+        # 4xx other than 429 is a bad request, not an unhealthy provider
+        if error.status_code is None or error.status_code >= 500 or error.status_code == 429:
+            llm_router.record(call["provider"], model, (time.perf_counter() - started) * 1000, ok=False)
+        raise
+    llm_router.record(call["provider"], model, (time.perf_counter() - started) * 1000, ok=True)
+    return payload
+
+async def hedged_complete(primary: Dict[str, Any], alternate: Dict[str, Any],
+                          admission: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run primary; if it has not answered within its p95 latency (or fails), race the
+    alternate provider against it and cancel whichever loses.
+    
+    The blueprint's limits are charged once, by the primary; the alternate only
+    waits for its own provider's rate limits.
+    """
+    delay = llm_router.hedge_delay(primary["provider"], primary["model"] or DEFAULT_MODELS[primary["provider"]])
+    first = asyncio.ensure_future(timed_complete(primary, admission))
+    racers = [first]
+    try:
+        done, _ = await asyncio.wait(racers, timeout=delay)
+        if done and first.exception() is None:
+            return first.result()
         
-        # Validate selected provider has key - with helpful messages
-        if provider == "anthropic" and not anthropic_key:
-            return JSONResponse({
-                "error": "Anthropic API key not configured",
-                "help": "Configure ANTHROPIC_API_KEY in Doppler",
-                "provider": "anthropic"
-            }, status_code=502)
-        if provider == "openai" and not openai_key:
-            return JSONResponse({
-                "error": "OpenAI API key not configured",
-                "help": "Configure OPENAI_API_KEY in Doppler",
-                "provider": "openai"
-            }, status_code=502)
+        error = first.exception() if done else None
+        if done:
+            racers.remove(first)
+        second = asyncio.ensure_future(timed_complete(alternate, admission and {**admission, "blueprint": None}))
+        racers.append(second)
+        llm_router.hedges["fired"] += 1
         
-        if provider == "anthropic":
-            default_model = "claude-3-5-sonnet-20240620"
-            anthropic_model = model or default_model
-            
-            anthropic_body = {
-                "model": anthropic_model,
-                "max_tokens": max_tokens,
-                "messages": [{"role": "user", "content": prompt}]
-            }
-            
-            if system:
-                anthropic_body["system"] = system
-            
-            if json_mode:
-                anthropic_body["tools"] = [{
-                    "name": "json_response",
-                    "description": "Return the response as valid JSON",
-                    "input_schema": {
-                        "type": "object",
-                        "properties": {
-                            "response": {"type": "object", "description": "The JSON response"}
-                        },
-                        "required": ["response"]
-                    }
-                }]
-                anthropic_body["tool_choice"] = {"type": "tool", "name": "json_response"}
-            
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": anthropic_key,
-                    "anthropic-version": "2023-06-01",
-                    "content-type": "application/json"
-                },
-                json=anthropic_body,
-                timeout=30
-            )
-            
-            if not response.ok:
-                error_data = response.json()
-                raise Exception(error_data.get("error", {}).get("message", "Anthropic API error"))
-            
-            result = response.json()
-            
-            if json_mode and result.get("content") and result["content"][0].get("type") == "tool_use":
-                return JSONResponse({
-                    "json": result["content"][0]["input"]["response"],
-                    "model": anthropic_model,
-                    "provider": "anthropic"
-                })
-            else:
-                text = result.get("content", [{}])[0].get("text", "")
-                if json_mode:
-                    try:
-                        parsed_json = json.loads(text)
-                        return JSONResponse({
-                            "json": parsed_json,
-                            "model": anthropic_model,
-                            "provider": "anthropic"
-                        })
-                    except json.JSONDecodeError:
-                        pass
-                
-                return JSONResponse({
-                    "text": text,
-                    "model": anthropic_model,
-                    "provider": "anthropic"
-                })
+        while racers:
+            done, _ = await asyncio.wait(racers, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                racers.remove(task)
+                if task.exception() is None:
+                    if task is second:
+                        llm_router.hedges["won"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in racers:
+            task.cancel()
+
+def llm_call_key(call: Dict[str, Any]) -> str:
+    return request_key(call["provider"], call["model"] or DEFAULT_MODELS[call["provider"]],
+                       call["system"], call["prompt"], call["json_mode"], call["max_tokens"])
+
+async def lookup_llm_cache(call: Dict[str, Any], bypass: bool):
+    """Returns (key, cached (body, tier) or None, response headers)"""
+    key = llm_call_key(call)
+    cached = None if bypass else await get_llm_cache().get(key)
+    headers = {"X-LLM-Cache": "bypass" if bypass else ("hit" if cached else "miss")}
+    if cached is not None:
+        headers["X-LLM-Cache-Tier"] = cached[1]
+    return key, cached, headers
+
+async def complete_llm(call: Dict[str, Any], bypass: bool = False,
+                       hedge: Optional[Dict[str, Any]] = None,
+                       admission: Optional[Dict[str, Any]] = None) -> Tuple[bytes, Dict[str, str]]:
+    """Non-streaming completion through the response cache and single-flight; returns (JSON body, headers)"""
+    key, cached, headers = await lookup_llm_cache(call, bypass)
+    if cached is not None:
+        return cached[0], headers
+    
+    # Identical concurrent requests share one upstream call (and its error)
+    async def fetch():
+        if hedge is not None:
+            payload = await hedged_complete(call, hedge, admission)
+        else:
+            payload = await timed_complete(call, admission)
+        # A hedge win is the alternate provider's answer: store it under that call's key
+        answered = call if payload["provider"] == call["provider"] else hedge
+        return await get_llm_cache().put(llm_call_key(answered), payload), answered["provider"]
+    
+    (data, provider), shared = await llm_flight.do(key, fetch)
+    if shared and provider != call["provider"]:
+        # Joined a flight its hedge won; a caller that may be pinned still needs its own provider
+        (data, provider), shared = await fetch(), False
+    if shared:
+        headers["X-LLM-Coalesced"] = "true"
+    return data, headers
+
+def cache_bypassed(body: Dict[str, Any], request: Request) -> bool:
+    # "cache": false or Cache-Control: no-cache skips the lookup but still
+    # refreshes the stored entry with the new completion
+    return body.get("cache") is False or "no-cache" in request.headers.get("cache-control", "")
+
+@app.post("/llm")
+async def llm_endpoint(request: Request):
+    """LLM endpoint with concurrent provider support"""
+    try:
+        body = await request.json()
+        call = resolve_llm_request(body)
+        bypass = cache_bypassed(body, request)
+        admission = admission_for(body, "interactive")
         
-        else:  # OpenAI
-            default_model = "gpt-4o-mini"
-            openai_model = model or default_model
-            
-            messages = []
-            if system:
-                messages.append({"role": "system", "content": system})
-            messages.append({"role": "user", "content": prompt})
-            
-            openai_body = {
-                "model": openai_model,
-                "max_tokens": max_tokens,
-                "messages": messages
-            }
-            
-            if json_mode:
-                openai_body["response_format"] = {"type": "json_object"}
-                # Ensure JSON instruction
-                json_instruction = "You must respond with valid JSON only."
-                if system:
-                    messages[0]["content"] += " " + json_instruction
-                else:
-                    messages.insert(0, {"role": "system", "content": json_instruction})
+        if body.get("stream"):
+            key, cached, headers = await lookup_llm_cache(call, bypass)
+            events = stream_llm(**call, key=key, cached=cached, admission=admission)
+            # Pull the first event here so provider HTTP errors still map to a 502 JSON response
+            first = await events.__anext__()
             
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json=openai_body,
-                timeout=30
-            )
+            async def relay():
+                yield first
+                async for chunk in events:
+                    yield chunk
             
-            if not response.ok:
-                error_data = response.json()
-                raise Exception(error_data.get("error", {}).get("message", "OpenAI API error"))
-            
-            result = response.json()
-            text = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-            
-            if json_mode:
-                try:
-                    parsed_json = json.loads(text)
-                    return JSONResponse({
-                        "json": parsed_json,
-                        "model": openai_model,
-                        "provider": "openai"
-                    })
-                except json.JSONDecodeError:
-                    pass
-            
-            return JSONResponse({
-                "text": text,
-                "model": openai_model,
-                "provider": "openai"
+            return StreamingResponse(relay(), media_type="text/event-stream", headers={
+                **headers, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"
             })
+        
+        data, headers = await complete_llm(call, bypass, hedge=hedge_target(body, call), admission=admission)
+        return Response(data, media_type="application/json", headers=headers)
     
+    except LLMRequestError as error:
+        return JSONResponse(error.payload, status_code=error.status_code)
+    except RateLimited as error:
+        return JSONResponse({"error": str(error), "retry_after": round(error.retry_after, 3)},
+                            status_code=429, headers={"Retry-After": str(max(1, int(error.retry_after + 0.999)))})
     except Exception as error:
         print(f"LLM API error: {error}")
         return JSONResponse({"error": str(error)}, status_code=502)
 
+async def ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Non-blank lines of a streamed body; only each new chunk is split"""
+    partial: List[bytes] = []  # chunks of a line not yet ended
+    async for chunk in request.stream():
+        if b"\n" not in chunk:
+            partial.append(chunk)
+            continue
+        first, *lines, rest = chunk.split(b"\n")
+        partial.append(first)
+        lines.insert(0, b"".join(partial))
+        partial = [rest]
+        for line in lines:
+            if line.strip():
+                yield line
+    rest = b"".join(partial)
+    if rest.strip():
+        yield rest
+
+@app.post("/llm/batch")
+async def llm_batch(request: Request):
+    """Fan out many /llm requests with a per-provider concurrency limit.
+    
+    The body is a JSON array of /llm request objects (or {"requests": [...]}),
+    or NDJSON (Content-Type: application/x-ndjson) parsed line by line while it
+    uploads; each item is dispatched as soon as it is parsed. The response is
+    NDJSON in completion order: one {"index", "status", "result" | "error"}
+    line per item, then a {"done": true, "total", "failed"} summary. A failing
+    item never aborts the rest of the batch; a batch of more than
+    LLM_BATCH_MAX_ITEMS is refused with 413 before anything is dispatched.
+    """
+    default_limit = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))
+    max_items = int(os.getenv("LLM_BATCH_MAX_ITEMS", "1000"))
+    bypass_all = "no-cache" in request.headers.get("cache-control", "")
+    semaphores: Dict[str, asyncio.Semaphore] = {}
+    results: asyncio.Queue = asyncio.Queue()
+    tasks = []
+    
+    def semaphore_for(provider: str) -> asyncio.Semaphore:
+        if provider not in semaphores:
+            limit = int(os.getenv(f"LLM_BATCH_CONCURRENCY_{provider.upper()}", default_limit))
+            semaphores[provider] = asyncio.Semaphore(max(1, limit))
+        return semaphores[provider]
+    
+    async def run_item(index: int, item: Any):
+        try:
+            if isinstance(item, (bytes, str)):
+                item = json.loads(item)
+            if not isinstance(item, dict):
+                raise LLMRequestError({"error": "Batch item must be a JSON object"}, status_code=400)
+            call = resolve_llm_request(item)
+            admission = admission_for(item, "batch")
+            async with semaphore_for(call["provider"]):
+                data, _ = await complete_llm(call, bypass_all or item.get("cache") is False,
+                                             hedge=hedge_target(item, call), admission=admission)
+            line = b'{"index":%d,"status":200,"result":%s}' % (index, data)
+            ok = True
+        except LLMRequestError as error:
+            line = json.dumps({"index": index, "status": error.status_code, **error.payload}).encode()
+            ok = False
+        except RateLimited as error:
+            line = json.dumps({"index": index, "status": 429, "error": str(error),
+                               "retry_after": round(error.retry_after, 3)}).encode()
+            ok = False
+        except json.JSONDecodeError as error:
+            line = json.dumps({"index": index, "status": 400, "error": f"Invalid JSON: {error}"}).encode()
+            ok = False
+        except Exception as error:
+            line = json.dumps({"index": index, "status": 502, "error": str(error)}).encode()
+            ok = False
+        await results.put((line, ok))
+    
+    def dispatch(item: Any):
+        tasks.append(asyncio.ensure_future(run_item(len(tasks), item)))
+    
+    def too_large() -> JSONResponse:
+        for task in tasks:
+            task.cancel()
+        return JSONResponse({"error": f"Batch limit of {max_items} items exceeded"}, status_code=413)
+    
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        async for line in ndjson_lines(request):
+            if len(tasks) >= max_items:
+                return too_large()
+            dispatch(line)
+    else:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError as error:
+            return JSONResponse({"error": f"Invalid JSON: {error}"}, status_code=400)
+        items = body.get("requests") if isinstance(body, dict) else body
+        if not isinstance(items, list):
+            return JSONResponse({"error": "Expected a JSON array of /llm requests"}, status_code=400)
+        if len(items) > max_items:
+            return too_large()
+        for item in items:
+            dispatch(item)
+    
+    async def emit():
+        failed = 0
+        try:
+            for _ in range(len(tasks)):
+                line, ok = await results.get()
+                failed += not ok
+                yield line + b"\n"
+            yield json.dumps({"done": True, "total": len(tasks), "failed": failed}).encode() + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(emit(), media_type="application/x-ndjson")
+
 # SSOT processing utilities
 def _ts_ms() -> int:
     return int(time.time() * 1000)
 
-def _rand16(seed: str) -> str:
-    h = hashlib.sha256(seed.encode('utf8')).digest()
-    return base64.b64encode(h[:10]).decode().replace('=', '').replace('+', '-').replace('/', '_')
-
 def _compact_ts(ts_ms: int) -> str:
     import datetime
     t = datetime.datetime.utcfromtimestamp(ts_ms / 1000)
     return f"{t.year:04d}{t.month:02d}{t.day:02d}-{t.hour:02d}{t.minute:02d}{t.second:02d}"
 
 def generate_unique_id(ssot: Dict[str, Any]) -> str:
-    db = os.getenv("DOCTRINE_DB", "shq")
-    subhive = os.getenv("DOCTRINE_SUBHIVE", "03")
-    app = os.getenv("DOCTRINE_APP", "imo")
-    ts_ms = ssot.get("meta", {}).get("_created_at_ms", _ts_ms())
-    app_name = (ssot.get("meta", {}).get("app_name", "imo-creator") or "").strip()
-    seed = f"{db}|{subhive}|{app}|{app_name}|{ts_ms}"
-    r = _rand16(seed)
-    return f"{db}-{subhive}-{app}-{_compact_ts(ts_ms)}-{r}"
+    # Counter + per-process entropy: SSOTs saved in the same millisecond still get distinct IDs
+    return id_allocator.mint(ssot.get("meta", {}).get("_created_at_ms"))
 
 def generate_process_id(ssot: Dict[str, Any]) -> str:
     db = os.getenv("DOCTRINE_DB", "shq")
@@ -389,45 +716,145 @@ def ensure_ids(ssot: Dict[str, Any]) -> Dict[str, Any]:
     
     return ssot
 
-def _scrub(o):
-    OMIT = {"timestamp_last_touched", "_created_at_ms", "blueprint_version_hash"}
-    
-    if isinstance(o, dict):
-        result = {}
-        for k in sorted(o.keys()):
-            if k not in OMIT:
-                result[k] = _scrub(o[k])
-        return result
-    elif isinstance(o, list):
-        return [_scrub(v) for v in o]
-    else:
-        return o
+# json.dumps() default separators: existing blueprint_version_hash values were stamped with these
+SSOT_HASH_SEPARATORS = (", ", ": ")
 
 def stamp_version_hash(ssot: Dict[str, Any]) -> Dict[str, Any]:
-    canon = json.dumps(_scrub(ssot))
-    h = hashlib.sha256(canon.encode('utf8')).hexdigest()
+    return versioning.stamp_version_hash(ssot, SSOT_HASH_SEPARATORS)
+
+# Last saved version per unique_id, the base for delta saves
+ssot_versions = VersionCache(int(os.getenv("SSOT_CACHE_SIZE", "64")))
+
+_ssot_store: Optional[SSOTStore] = None
+
+def get_ssot_store() -> Optional[SSOTStore]:
+    """Content-addressed version store under SSOT_STORE_DIR; None when unset"""
+    global _ssot_store
+    if _ssot_store is None and os.getenv("SSOT_STORE_DIR"):
+        _ssot_store = SSOTStore(os.getenv("SSOT_STORE_DIR"))
+    return _ssot_store
+
+async def load_ssot_base(unique_id: str) -> Optional[Tuple[Dict[str, Any], Any]]:
+    """Latest version of unique_id from the cache, else from the store (then cached)"""
+    entry = ssot_versions.get(unique_id)
+    store = get_ssot_store()
+    if entry is None and store is not None:
+        latest = await run_in_threadpool(store.latest, unique_id)
+        ssot = await run_in_threadpool(store.get, latest) if latest else None
+        # A concurrent save may have cached a newer version while we were reading
+        entry = ssot_versions.get(unique_id)
+        if entry is None and ssot is not None:
+            entry = (ssot, await run_in_threadpool(merkle_tree, ssot, None, SSOT_HASH_SEPARATORS))
+            ssot_versions.put(*entry)
+    return entry
+
+async def record_ssot_version(ssot: Dict[str, Any], tree=None) -> None:
+    ssot_versions.put(ssot, tree)
+    store = get_ssot_store()
+    if store is not None:
+        await run_in_threadpool(store.put, ssot)
+
+def ssot_digests(tree) -> Dict[str, str]:
+    # Per-section digests let the client see which subtrees changed between saves
+    return subtree_digests(tree, int(os.getenv("SSOT_DIGEST_DEPTH", "2")))
+
+def save_full_ssot(ssot: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Stamp a full save with the streaming hasher; returns (ssot, digests).
     
-    ssot = dict(ssot)
-    doctrine = dict(ssot.get("doctrine", {}))
-    doctrine["blueprint_version_hash"] = h
-    ssot["doctrine"] = doctrine
+    No encoding is kept: a Merkle tree is only built if a delta save follows.
+    """
+    ssot = stamp_version_hash(ensure_ids(ssot))
+    digests = canonical_digests(ssot, int(os.getenv("SSOT_DIGEST_DEPTH", "2")), SSOT_HASH_SEPARATORS,
+                                root=ssot["doctrine"]["blueprint_version_hash"])
+    return ssot, digests
+
+def apply_ssot_delta(entry: Tuple[Dict[str, Any], Any], patch: Any) -> Tuple[Dict[str, Any], Any, Dict[str, str]]:
+    """Patch the cached version and re-stamp it, re-hashing only the edited paths;
+    returns (ssot, tree, digests). Raises PatchError."""
+    ssot = apply_patch(entry[0], patch)
+    if not isinstance(ssot, dict):
+        raise PatchError("The patched SSOT must be an object")
+    ssot, tree = stamp_version_tree(ensure_ids(ssot), entry[1], SSOT_HASH_SEPARATORS)
+    return ssot, tree, ssot_digests(tree)
+
+async def save_ssot_delta(body: Dict[str, Any]) -> JSONResponse:
+    """Apply an RFC 6902 patch to the cached copy of the version named by base_hash"""
+    unique_id = body.get("unique_id")
+    entry = await load_ssot_base(unique_id) if unique_id else None
+    current_hash = entry[0]["doctrine"]["blueprint_version_hash"] if entry else None
+    if current_hash is None or body.get("base_hash") != current_hash:
+        # Unknown document or a stale base: the client re-syncs with a full save
+        return JSONResponse({"error": "base_hash is not the current version of this SSOT",
+                             "current_hash": current_hash}, status_code=409)
+    try:
+        ssot, tree, digests = await run_in_threadpool(apply_ssot_delta, entry, body["patch"])
+    except PatchError as error:
+        return JSONResponse({"error": f"Invalid patch: {error}"}, status_code=422)
     
-    return ssot
+    if ssot["doctrine"]["unique_id"] != unique_id:
+        ssot_versions.discard(unique_id)
+    await record_ssot_version(ssot, tree)
+    
+    result = {"ok": True, "blueprint_version_hash": ssot["doctrine"]["blueprint_version_hash"],
+              "digests": digests}
+    if body.get("return_ssot"):
+        result["ssot"] = ssot
+    return JSONResponse(result)
 
 @app.post("/api/ssot/save")
 async def save_ssot(request: Request):
-    """SSOT processing with doctrine-safe IDs"""
+    """SSOT processing with doctrine-safe IDs.
+    
+    Takes either the full document, {"ssot": {...}}, or a delta,
+    {"unique_id", "base_hash", "patch": [RFC 6902 ops]}, against the last version
+    saved here. A delta answers with the new hash and digests only (plus the
+    SSOT if "return_ssot" is set); a stale or unknown base gets 409.
+    """
     try:
         body = await request.json()
-        ssot = body.get("ssot", {})
-        ssot = ensure_ids(ssot)
-        ssot = stamp_version_hash(ssot)
+        if not isinstance(body, dict):
+            return JSONResponse({"error": "Expected a JSON object"}, status_code=400)
+        if "patch" in body:
+            return await save_ssot_delta(body)
+        if not isinstance(body.get("ssot", {}), dict):
+            return JSONResponse({"error": "ssot must be a JSON object"}, status_code=400)
+        ssot, digests = await run_in_threadpool(save_full_ssot, body.get("ssot", {}))
+        await record_ssot_version(ssot)
         
-        return JSONResponse({"ok": True, "ssot": ssot})
+        return JSONResponse({"ok": True, "ssot": ssot, "digests": digests})
     except Exception as error:
         print(f"SSOT processing error: {error}")
         return JSONResponse({"error": f"Failed to process SSOT: {str(error)}"}, status_code=500)
 
+@app.get("/api/ssot/history")
+async def ssot_history(unique_id: Optional[str] = None, process_id: Optional[str] = None,
+                       limit: int = 50, before: Optional[int] = None):
+    """Newest-first saved versions; page with before=<seq of the last item>"""
+    store = get_ssot_store()
+    if store is None:
+        return JSONResponse({"error": "SSOT store is not configured (set SSOT_STORE_DIR)"}, status_code=503)
+    limit = max(1, min(limit, 500))
+    items = await run_in_threadpool(store.history, unique_id, process_id, limit, before)
+    return {"items": items, "next_before": items[-1]["seq"] if len(items) == limit else None}
+
+@app.get("/api/ssot/{version_hash}")
+async def get_ssot_version(version_hash: str, request: Request):
+    """A stored SSOT version by blueprint_version_hash (immutable, so cacheable forever)"""
+    store = get_ssot_store()
+    if store is None:
+        return JSONResponse({"error": "SSOT store is not configured (set SSOT_STORE_DIR)"}, status_code=503)
+    etag = f'"{version_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        # Validate the hash before confirming a cached copy of it
+        if not await run_in_threadpool(store.has, version_hash):
+            return JSONResponse({"error": f"Unknown SSOT version {version_hash}"}, status_code=404)
+        return Response(status_code=304, headers=headers)
+    data = await run_in_threadpool(store.get_bytes, version_hash)
+    if data is None:
+        return JSONResponse({"error": f"Unknown SSOT version {version_hash}"}, status_code=404)
+    return Response(data, media_type="application/json", headers=headers)
+
 @app.get("/api/subagents")
 async def get_subagents():
     """Subagent registry with garage-mcp integration"""
@@ -482,7 +909,13 @@ async def root():
         "/blueprints/{slug}/manifest",
         "/blueprints/{slug}/score",
         "/blueprints/{slug}/visuals",
+        "/blueprints/{slug}/visuals/{name}",
         "/llm",
+        "/llm/batch",
+        "/llm/stats",
+        "/llm/routing",
         "/api/ssot/save",
+        "/api/ssot/history",
+        "/api/ssot/{version_hash}",
         "/api/subagents"
     ]}
\ No newline at end of file